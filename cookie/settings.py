@@ -49,7 +49,6 @@ INTERNAL_IPS = ["127.0.0.1"]
 # Application definition
 
 INSTALLED_APPS = [
-    "servestatic.runserver_nostatic",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -57,12 +56,14 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.forms",
-    "django_browser_reload",
     "django_htmx",
+    "django_tasks_db",
     "cookie.trails",
 ]
 
 MIDDLEWARE = [
+    # First, so its timings include the rest of the stack.
+    "cookie.trails.metrics.metrics_middleware",
     "django.middleware.security.SecurityMiddleware",
     "servestatic.middleware.ServeStaticMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -71,10 +72,21 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "django_browser_reload.middleware.BrowserReloadMiddleware",
     "django_htmx.middleware.HtmxMiddleware",
 ]
 
+# Development tooling. Production workers never import it, which keeps their
+# boot (and every gunicorn worker recycle) a little faster and takes the
+# browser-reload middleware out of every request.
+if DEBUG:
+    # Must come before django.contrib.staticfiles to take over runserver.
+    INSTALLED_APPS.insert(0, "servestatic.runserver_nostatic")
+    INSTALLED_APPS.append("django_browser_reload")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django_htmx.middleware.HtmxMiddleware"),
+        "django_browser_reload.middleware.BrowserReloadMiddleware",
+    )
+
 ROOT_URLCONF = "cookie.urls"
 
 TEMPLATES = [
@@ -112,6 +124,82 @@ if env.bool("DATABASE_DISABLE_SSL", default=False):  # type: ignore
         DATABASES["default"].setdefault("OPTIONS", {})
         DATABASES["default"]["OPTIONS"]["sslmode"] = "disable"
 
+# SQLite's default in-memory test database fails at once on a locked table
+# instead of waiting its turn, so tests that write from several threads at
+# once need a file. Transactions take the write lock up front: one that read
+# first and tried to write later could otherwise fail with "database is
+# locked" when another writer got in between.
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}
+    DATABASES["default"].setdefault("OPTIONS", {})["transaction_mode"] = "IMMEDIATE"
+
+# Optional read replica for reports, exports and API reads; see
+# cookie/trails/routers.py. To try it locally with SQLite, copy db.sqlite3 to
+# reports.sqlite3 and set REPORTS_DATABASE_URL=sqlite:///reports.sqlite3.
+if env("REPORTS_DATABASE_URL", default=""):  # type: ignore
+    DATABASES["reports"] = env.db("REPORTS_DATABASE_URL")
+    DATABASES["reports"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["cookie.trails.routers.ReportsRouter"]
+
+# How far behind, in seconds, the replica may be before reads go back to the
+# primary.
+REPORTS_DATABASE_MAX_LAG = env.float("REPORTS_DATABASE_MAX_LAG", default=30.0)  # type: ignore
+
+
+# Caches
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# Local memory by default, which is also what the test suite runs against.
+# In production, point CACHE_URL at something shared by all gunicorn workers:
+# filecache:///var/tmp/cookietrails, redis://..., or pymemcache://...
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://cookietrails")  # type: ignore
+}
+
+# Aggregate reports (troop totals, order summaries, exports) are memoized in
+# each process until the next write to the tables they read; this bounds how
+# many are kept. See cookie/trails/report_cache.py.
+REPORT_CACHE_MAX_ENTRIES = env.int("REPORT_CACHE_MAX_ENTRIES", default=128)  # type: ignore
+
+# Family sign-in is rate limited per client address and per email, with
+# token buckets in the cache; see cookie/trails/ratelimit.py. Behind a proxy
+# or CDN, every request arrives from the proxy's address, so set
+# CLIENT_IP_HEADER to the header it puts the client's address in (for
+# Cloudflare, CF-Connecting-IP). Turn limiting off for local load tests.
+FAMILY_LOGIN_RATE_LIMIT = env.bool("FAMILY_LOGIN_RATE_LIMIT", default=True)  # type: ignore
+CLIENT_IP_HEADER = env("CLIENT_IP_HEADER", default="")  # type: ignore
+
+
+# Background tasks
+# https://docs.djangoproject.com/en/6.0/topics/tasks/
+
+# Tasks are stored in the database and run by `manage.py db_worker`, the
+# `worker` process in the Procfile. Set TASKS_BACKEND to
+# django.tasks.backends.immediate.ImmediateBackend to run them in-request.
+TASKS = {
+    "default": {
+        "BACKEND": env(
+            "TASKS_BACKEND",
+            default="django_tasks_db.DatabaseBackend",  # type: ignore
+        ),
+    }
+}
+
+
+# Sessions
+# https://docs.djangoproject.com/en/6.0/topics/http/sessions/
+
+# Family sessions only hold a family id, so serve them from the cache and only
+# fall back to the database on a miss. Set SESSION_ENGINE to
+# django.contrib.sessions.backends.signed_cookies to skip the database entirely.
+# Expired rows are removed by the scheduled `clearsessions` job in app.json.
+SESSION_ENGINE = env(
+    "SESSION_ENGINE",
+    default="django.contrib.sessions.backends.cached_db",  # type: ignore
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -150,7 +238,9 @@ STATICFILES_DIRS = [BASE_DIR / "cookie" / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATIC_URL = "static/"
 
-# Enable ServeStatic's GZip compression of static assets.
+# Enable ServeStatic's GZip compression of static assets. Collected files get
+# content-hashed names, which ServeStatic serves with immutable, far-future
+# cache headers.
 STORAGES = {
     "staticfiles": {
         "BACKEND": "servestatic.storage.CompressedManifestStaticFilesStorage"
@@ -0,0 +1,173 @@
+/**
+ * CookieTrails offline cupboard entry
+ *
+ * Progressive enhancement for the staff pickup/return page. Instead of
+ * posting each event and waiting for a slow (or absent) connection, events
+ * are queued in localStorage with a client-generated idempotency key and
+ * synced to the bulk endpoint in batches whenever the device is online.
+ * The server deduplicates on the key, so re-sending a batch is always safe.
+ */
+
+(function () {
+  const QUEUE_KEY = "cookietrails:pending-events";
+  const BATCH_SIZE = 50;
+  const SYNC_INTERVAL_MS = 30000;
+
+  const form = document.getElementById("event-form");
+  if (!form || !form.dataset.bulkUrl) {
+    return;
+  }
+  const statusEl = document.getElementById("offline-queue-status");
+  let syncing = false;
+
+  /**
+   * @typedef {Object} QueuedEvent
+   * @property {string} key - Idempotency key (UUID)
+   * @property {string} family - Family primary key
+   * @property {string} family_label - Family name, for display only
+   * @property {string} event_type - "pickup" or "return"
+   * @property {string} location - Location primary key, or "" if none
+   * @property {Object<string, number>} counts - Box counts by variety code
+   * @property {string} recorded_at - ISO timestamp of local entry
+   * @property {Object} [errors] - Validation errors reported by the server
+   */
+
+  /** @returns {QueuedEvent[]} */
+  function loadQueue() {
+    try {
+      return JSON.parse(localStorage.getItem(QUEUE_KEY) || "[]");
+    } catch {
+      return [];
+    }
+  }
+
+  /** @param {QueuedEvent[]} queue */
+  function saveQueue(queue) {
+    localStorage.setItem(QUEUE_KEY, JSON.stringify(queue));
+    renderStatus(queue);
+  }
+
+  /** @param {QueuedEvent[]} queue */
+  function renderStatus(queue) {
+    if (!statusEl) {
+      return;
+    }
+    const pending = queue.filter((item) => !item.errors);
+    const failed = queue.filter((item) => item.errors);
+    const parts = [];
+    if (pending.length) {
+      parts.push(`${pending.length} event(s) waiting to sync`);
+    }
+    if (failed.length) {
+      const names = failed.map((item) => item.family_label).join(", ");
+      parts.push(`${failed.length} event(s) rejected, please re-enter: ${names}`);
+    }
+    statusEl.hidden = false;
+    statusEl.textContent = parts.length ? parts.join(" · ") : "All events synced";
+    statusEl.dataset.state = failed.length ? "error" : pending.length ? "pending" : "synced";
+  }
+
+  /** @returns {QueuedEvent} */
+  function eventFromForm() {
+    const data = new FormData(form);
+    /** @type {Object<string, number>} */
+    const counts = {};
+    for (const [name, value] of data.entries()) {
+      if (name.startsWith("count_")) {
+        counts[name.slice("count_".length)] = parseInt(String(value)) || 0;
+      }
+    }
+    const familySelect = /** @type {HTMLSelectElement} */ (form.elements.namedItem("family"));
+    return {
+      key: crypto.randomUUID(),
+      family: String(data.get("family")),
+      family_label: familySelect.selectedOptions[0]?.textContent || "",
+      event_type: String(data.get("event_type")),
+      location: String(data.get("location") || ""),
+      counts,
+      recorded_at: new Date().toISOString(),
+    };
+  }
+
+  async function sync() {
+    if (syncing || !navigator.onLine) {
+      return;
+    }
+    const batch = loadQueue()
+      .filter((item) => !item.errors)
+      .slice(0, BATCH_SIZE);
+    if (!batch.length) {
+      return;
+    }
+
+    syncing = true;
+    let synced = false;
+    try {
+      const csrf = /** @type {HTMLInputElement} */ (form.elements.namedItem("csrfmiddlewaretoken"));
+      const response = await fetch(form.dataset.bulkUrl, {
+        method: "POST",
+        credentials: "same-origin",
+        headers: { "Content-Type": "application/json", "X-CSRFToken": csrf.value },
+        body: JSON.stringify({ events: batch }),
+      });
+      if (!response.ok) {
+        return;
+      }
+      const { results } = await response.json();
+      /** @type {Map<string, {status: string, errors?: Object}>} */
+      const byKey = new Map(results.map((result) => [result.key, result]));
+      const queue = loadQueue().flatMap((item) => {
+        const result = byKey.get(item.key);
+        if (!result) {
+          return [item];
+        }
+        if (result.status === "error") {
+          return [{ ...item, errors: result.errors }];
+        }
+        return [];
+      });
+      saveQueue(queue);
+      synced = true;
+    } catch {
+      // Still offline, or the connection dropped mid-request. The queue is
+      // untouched, and the keys make the retry safe.
+    } finally {
+      syncing = false;
+    }
+
+    if (synced && loadQueue().some((item) => !item.errors)) {
+      setTimeout(sync, 0);
+    }
+  }
+
+  form.addEventListener("submit", (e) => {
+    e.preventDefault();
+    if (!form.reportValidity()) {
+      return;
+    }
+    const queue = loadQueue();
+    queue.push(eventFromForm());
+    saveQueue(queue);
+    form.reset();
+    if (typeof updateTotal === "function") {
+      updateTotal();
+    }
+    sync();
+  });
+
+  statusEl?.addEventListener("click", () => {
+    const queue = loadQueue();
+    if (queue.some((item) => item.errors) && confirm("Discard the rejected events?")) {
+      saveQueue(queue.filter((item) => !item.errors));
+    }
+  });
+
+  window.addEventListener("online", sync);
+  setInterval(sync, SYNC_INTERVAL_MS);
+  renderStatus(loadQueue());
+  sync();
+
+  if ("serviceWorker" in navigator && form.dataset.serviceWorkerUrl) {
+    navigator.serviceWorker.register(form.dataset.serviceWorkerUrl);
+  }
+})();
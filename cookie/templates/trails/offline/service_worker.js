@@ -0,0 +1,65 @@
+/**
+ * CookieTrails staff service worker
+ * Keeps the pickup/return entry page and its assets available offline so
+ * that cupboard volunteers can keep queueing events without a signal.
+ */
+
+const CACHE_NAME = "cookietrails-staff-{{ cache_version }}";
+const ENTRY_URL = "{% url 'pickup_return_event' %}";
+const PRECACHE_URLS = [
+  ENTRY_URL,
+  {% for url in static_urls %}"{{ url }}",{% endfor %}
+];
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(caches.open(CACHE_NAME).then((cache) => cache.addAll(PRECACHE_URLS)));
+  self.skipWaiting();
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches
+      .keys()
+      .then((names) =>
+        Promise.all(
+          names
+            .filter((name) => name.startsWith("cookietrails-staff-") && name !== CACHE_NAME)
+            .map((name) => caches.delete(name)),
+        ),
+      ),
+  );
+  self.clients.claim();
+});
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET") {
+    return;
+  }
+
+  const url = new URL(request.url);
+
+  // The entry page: always try the network first so the family list stays
+  // fresh, but fall back to the last copy we saw when the cupboard is offline.
+  if (request.mode === "navigate" && url.pathname === ENTRY_URL) {
+    event.respondWith(
+      fetch(request)
+        .then((response) => {
+          if (response.ok) {
+            const copy = response.clone();
+            caches.open(CACHE_NAME).then((cache) => cache.put(ENTRY_URL, copy));
+          }
+          return response;
+        })
+        .catch(() => caches.match(ENTRY_URL)),
+    );
+    return;
+  }
+
+  // Static assets are content-hashed, so the cached copy is always good.
+  if (PRECACHE_URLS.includes(url.pathname)) {
+    event.respondWith(
+      caches.match(request.url).then((cached) => cached || fetch(request)),
+    );
+  }
+});
@@ -1,21 +1,72 @@
+import copy
 from typing import Any
 
-from django.contrib import admin
-from django.contrib.admin.decorators import display
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.decorators import action, display
+from django.contrib.admin.helpers import ActionForm
+from django.db import transaction
 from django.http import HttpRequest
+from django.urls import reverse
+from django.utils.html import format_html
 
 from cookie.admin import admin_site
 
+from .bulk import reattribute_events, set_event_unit, void_events
 from .cookies import COOKIE_COLORS, CookieVariety
 from .forms import CookieCountWidget
-from .models import Event, Family
+from .models import (
+    ApiToken,
+    CountUnit,
+    Event,
+    Family,
+    Location,
+    LocationStock,
+    SeasonBalance,
+    StockTransfer,
+)
+from .routers import reading_from_reports
+from .stock import (
+    StockError,
+    adjust_stock,
+    check_stock,
+    stock_at,
+    stock_changes_between,
+    transfer_stock,
+)
 
 
-class FamilyAdmin(admin.ModelAdmin):
-    list_display = ("scout_name", "grade", "email")
+class ReportsChangeListMixin:
+    """Serve changelist pages (but not actions) from the reports database.
+
+    The page an admin lands on right after a change (or an action) stays on
+    the primary, so it shows what was just written rather than a replica
+    that may not have caught up. Those redirects always carry a message.
+    """
+
+    def changelist_view(self, request: HttpRequest, extra_context: dict | None = None):
+        # len() loads pending messages without marking them as shown.
+        if request.method != "GET" or len(messages.get_messages(request)):
+            return super().changelist_view(request, extra_context)  # type: ignore[misc]
+        with reading_from_reports():
+            response = super().changelist_view(request, extra_context)  # type: ignore[misc]
+            # Render now, while reads still go to the reports database.
+            if hasattr(response, "render"):
+                response.render()
+        return response
+
+
+class FamilyAdmin(ReportsChangeListMixin, admin.ModelAdmin):
+    list_display = ("scout_name", "grade", "email", "ledger")
     search_fields = ("scout_name", "email")
     search_help_text = "Search by scout name or parent email"
 
+    @display(description="ledger")
+    def ledger(self, obj: Family) -> str:
+        return format_html(
+            '<a href="{}">Ledger</a>', reverse("family_ledger", args=[obj.pk])
+        )
+
     def change_view(
         self,
         request: HttpRequest,
@@ -42,7 +93,46 @@ def make_variety_column(variety: CookieVariety) -> Any:
     return column
 
 
-class EventAdmin(admin.ModelAdmin):
+class EventActionForm(ActionForm):
+    family = forms.ModelChoiceField(
+        queryset=Family.objects.order_by("scout_name"),
+        required=False,
+        label="Move to",
+    )
+
+
+class EventAdminForm(forms.ModelForm):
+    class Meta:
+        model = Event
+        fields = "__all__"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        # The instance still holds the stored event; fields are copied onto
+        # it only after cleaning.
+        edited = copy.copy(self.instance)
+        for name, value in cleaned_data.items():
+            setattr(edited, name, value)
+        before = [self.instance] if self.instance.pk is not None else []
+        self.stock_changes = stock_changes_between(before, [edited])
+        try:
+            # A friendly early check; save_model checks again under lock.
+            check_stock(self.stock_changes)
+        except StockError as error:
+            self.add_error(None, str(error))
+        return cleaned_data
+
+
+class EventAdmin(ReportsChangeListMixin, admin.ModelAdmin):
+    """Events, with adds and edits moving location stock as the pickup page does.
+
+    Events can't be deleted here; void them instead, which gives back their
+    boxes and leaves a trail for API syncs.
+    """
+
+    form = EventAdminForm
     list_display = [
         "created_at",
         "event_type",
@@ -54,6 +144,10 @@ class EventAdmin(admin.ModelAdmin):
     search_fields = ["family__scout_name", "family__email"]
     search_help_text = "Search by scout name or parent email"
     # list_filter = ["event_type"]
+    date_hierarchy = "created_at"
+    # Corrections for a bad day: each runs as one UPDATE; see bulk.py.
+    action_form = EventActionForm
+    actions = ["void", "move_to_family", "mark_as_cases", "mark_as_boxes"]
 
     def formfield_for_dbfield(self, db_field, request, **kwargs):
         if db_field.name == "count_data":
@@ -71,5 +165,168 @@ class EventAdmin(admin.ModelAdmin):
     def total(self, obj: Event) -> int:
         return obj.total_count
 
+    def has_delete_permission(self, request: HttpRequest, obj=None) -> bool:
+        return False
+
+    def save_model(self, request: HttpRequest, obj: Event, form, change: bool):
+        with transaction.atomic():
+            adjust_stock(form.stock_changes)
+            super().save_model(request, obj, form, change)
+
+    def _bulk(self, request: HttpRequest, verb: str, change) -> None:
+        try:
+            count = change()
+        except StockError as error:
+            self.message_user(request, str(error), messages.ERROR)
+            return
+        self.message_user(request, f"{verb} {count} events.", messages.SUCCESS)
+
+    @action(description="Void selected events")
+    def void(self, request: HttpRequest, queryset) -> None:
+        self._bulk(request, "Voided", lambda: void_events(queryset, request.user))
+
+    @action(description="Move selected events to another family")
+    def move_to_family(self, request: HttpRequest, queryset) -> None:
+        form = self.action_form(request.POST)
+        form.fields["action"].choices = self.get_action_choices(request)
+        family = form.cleaned_data.get("family") if form.is_valid() else None
+        if family is None:
+            self.message_user(
+                request, "Choose a family to move the events to.", messages.ERROR
+            )
+            return
+        self._bulk(
+            request,
+            f"Moved to {family}:",
+            lambda: reattribute_events(queryset, family, request.user),
+        )
+
+    @action(description="Mark selected events' counts as cases")
+    def mark_as_cases(self, request: HttpRequest, queryset) -> None:
+        self._bulk(
+            request,
+            "Marked as cases:",
+            lambda: set_event_unit(queryset, CountUnit.CASE, request.user),
+        )
+
+    @action(description="Mark selected events' counts as boxes")
+    def mark_as_boxes(self, request: HttpRequest, queryset) -> None:
+        self._bulk(
+            request,
+            "Marked as boxes:",
+            lambda: set_event_unit(queryset, CountUnit.BOX, request.user),
+        )
+
 
 admin_site.register(Event, EventAdmin)
+
+
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ("name", "created_at")
+    readonly_fields = ("created_at",)
+
+    def save_model(self, request: HttpRequest, obj: ApiToken, form, change: bool):
+        key = None if change else obj.generate_key()
+        super().save_model(request, obj, form, change)
+        if key is not None:
+            self.message_user(
+                request,
+                f"Copy this token now; it won't be shown again: {key}",
+                messages.WARNING,
+            )
+
+
+admin_site.register(ApiToken, ApiTokenAdmin)
+
+
+class SeasonBalanceAdmin(ReportsChangeListMixin, admin.ModelAdmin):
+    """Final figures for closed seasons; written only by `close_season`."""
+
+    list_display = ("season", "family", "ordered_cents", "held_cents", "closed_at")
+    list_filter = ("season",)
+    search_fields = ("family__scout_name", "family__email")
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj=None) -> bool:
+        return False
+
+
+admin_site.register(SeasonBalance, SeasonBalanceAdmin)
+
+
+class LocationStockInline(admin.TabularInline):
+    """Current stock; changed only by pickups, returns and transfers."""
+
+    model = LocationStock
+    fields = ("variety", "boxes")
+    readonly_fields = ("variety", "boxes")
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request: HttpRequest, obj=None) -> bool:
+        return False
+
+
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ("name",)
+    inlines = [LocationStockInline]
+
+
+admin_site.register(Location, LocationAdmin)
+
+
+class StockTransferForm(forms.ModelForm):
+    class Meta:
+        model = StockTransfer
+        fields = ("source", "destination", "count_data", "note")
+        widgets = {"count_data": CookieCountWidget}
+        labels = {"count_data": "Boxes"}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        source = cleaned_data.get("source")
+        destination = cleaned_data.get("destination")
+        boxes = cleaned_data.get("count_data") or {}
+        if any(count < 0 for count in boxes.values()):
+            self.add_error("count_data", "Box counts can't be negative.")
+        if not any(boxes.values()):
+            self.add_error("count_data", "Enter the boxes to move.")
+        if source is not None and source == destination:
+            self.add_error("destination", "Choose a different location.")
+        if source is not None and not self.errors:
+            # A friendly early check; transfer_stock checks again under lock.
+            on_hand = stock_at(source)
+            short = [
+                f"{on_hand[code]} {CookieVariety(code).label}"
+                for code, count in boxes.items()
+                if count > on_hand[code]
+            ]
+            if short:
+                self.add_error(None, f"{source} only has " + ", ".join(short) + ".")
+        return cleaned_data
+
+
+class StockTransferAdmin(admin.ModelAdmin):
+    """Transfers are a ledger: add new ones, never edit old ones."""
+
+    form = StockTransferForm
+    list_display = ("created_at", "source", "destination", "note")
+    list_filter = ("source", "destination")
+
+    def has_change_permission(self, request: HttpRequest, obj=None) -> bool:
+        return False
+
+    def has_delete_permission(self, request: HttpRequest, obj=None) -> bool:
+        return False
+
+    def save_model(self, request: HttpRequest, obj: StockTransfer, form, change: bool):
+        transfer = transfer_stock(
+            obj.source, obj.destination, obj.count_data, note=obj.note
+        )
+        obj.pk = transfer.pk
+        obj.created_at = transfer.created_at
+
+
+admin_site.register(StockTransfer, StockTransferAdmin)
@@ -0,0 +1,318 @@
+"""
+Analytics snapshots: a season's data in a standalone SQLite file.
+
+The treasurer can open the file in a notebook (pandas, DuckDB, or the
+sqlite3 shell) and query it as much as they like without touching the live
+database. It holds:
+
+- **families**: every family.
+- **events**: the season's events, live and archived, with `count_data`
+  flattened to one column per variety code, in boxes.
+- **orders**: each family's initial order (the latest one), as entered
+  (usually in cases).
+- **balances**: each family's holdings in boxes, and what it ordered,
+  holds and owes in cents, as in the money report, for the season.
+- **season_balances**: final figures saved for closed seasons.
+- **varieties** and **snapshot**: prices, and when the file was taken.
+
+Everything is read inside one repeatable-read transaction (on SQLite, a
+deferred one, which doesn't take the write lock), from the reporting
+replica when there is one, so the tables agree with each other even while
+events keep arriving. Rows are streamed through in batches and
+balances are tallied on the way past, so the whole export is a handful of
+sequential reads.
+"""
+
+import itertools
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .cookies import BOXES_PER_CASE, CookieVariety
+from .models import (
+    ArchivedEvent,
+    CountUnit,
+    Event,
+    EventType,
+    Family,
+    SeasonBalance,
+    current_season,
+)
+from .money import PRICE_CENTS
+from .routers import reading_from_reports
+
+ANALYTICS_BATCH_SIZE = 2000
+ANALYTICS_CONTENT_TYPE = "application/vnd.sqlite3"
+
+_CODES = [variety.value for variety in CookieVariety]
+_EVENT_FIELDS = (
+    "pk",
+    "family_id",
+    "created_at",
+    "season",
+    "event_type",
+    "unit",
+    "location_id",
+    "count_data",
+)
+
+
+def _columns() -> str:
+    return ", ".join(f'"{code}" INTEGER NOT NULL' for code in _CODES)
+
+
+_SCHEMA = f"""
+CREATE TABLE snapshot (
+    taken_at TEXT NOT NULL, season INTEGER NOT NULL,
+    families INTEGER NOT NULL, events INTEGER NOT NULL
+);
+CREATE TABLE varieties (
+    code TEXT PRIMARY KEY, label TEXT NOT NULL, price_cents INTEGER NOT NULL
+);
+CREATE TABLE families (
+    id INTEGER PRIMARY KEY, scout_name TEXT NOT NULL, email TEXT NOT NULL,
+    grade INTEGER NOT NULL
+);
+CREATE TABLE events (
+    id INTEGER PRIMARY KEY, family_id INTEGER NOT NULL, created_at TEXT NOT NULL,
+    season INTEGER NOT NULL, event_type TEXT NOT NULL, unit TEXT NOT NULL,
+    location_id INTEGER, archived INTEGER NOT NULL, {_columns()},
+    total INTEGER NOT NULL
+);
+CREATE TABLE orders (
+    family_id INTEGER PRIMARY KEY, event_id INTEGER NOT NULL,
+    ordered_at TEXT NOT NULL, unit TEXT NOT NULL, {_columns()},
+    total INTEGER NOT NULL
+);
+CREATE TABLE balances (
+    family_id INTEGER PRIMARY KEY, {_columns()}, ordered_cents INTEGER NOT NULL,
+    held_cents INTEGER NOT NULL, owed_cents INTEGER NOT NULL
+);
+CREATE TABLE season_balances (
+    season INTEGER NOT NULL, family_id INTEGER NOT NULL, {_columns()},
+    ordered_cents INTEGER NOT NULL, held_cents INTEGER NOT NULL,
+    closed_at TEXT NOT NULL, PRIMARY KEY (season, family_id)
+);
+CREATE INDEX events_family_idx ON events (family_id, created_at);
+"""
+
+
+def _insert(out: sqlite3.Connection, table: str, rows: list[tuple]) -> None:
+    if rows:
+        placeholders = ", ".join("?" * len(rows[0]))
+        out.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+
+@dataclass(frozen=True)
+class AnalyticsSnapshot:
+    taken_at: datetime
+    season: int
+    families: int
+    events: int
+
+
+@dataclass
+class _Tally:
+    """One family's running balances, built up as its events stream past."""
+
+    holdings: dict[str, int] = field(default_factory=lambda: dict.fromkeys(_CODES, 0))
+    # The latest order: (created_at, event id, unit, counts, boxes).
+    order: tuple[datetime, int, str, dict[str, int], dict[str, int]] | None = None
+
+
+def _value_cents(boxes: dict[str, int]) -> int:
+    return sum(boxes[v.value] * PRICE_CENTS.get(v, 0) for v in CookieVariety)
+
+
+@contextmanager
+def _read_snapshot(alias: str) -> Iterator[None]:
+    """Make every read inside the block see the same moment."""
+    connection = connections[alias]
+    if connection.vendor == "sqlite" and not connection.in_atomic_block:
+        # atomic() would BEGIN IMMEDIATE (see settings.py) and hold the write
+        # lock for the whole export. A deferred transaction already sees a
+        # single snapshot, and only takes a shared lock at its first read.
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute("BEGIN DEFERRED")
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("ROLLBACK")
+        return
+    with transaction.atomic(using=alias):
+        # Postgres needs asking, before the transaction's first query.
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"
+                )
+        yield
+
+
+def _event_rows(alias: str, season: int):
+    for model, archived in ((Event, 0), (ArchivedEvent, 1)):
+        rows = (
+            model.objects.using(alias)
+            .filter(season=season)
+            .order_by("created_at", "pk")
+            .values_list(*_EVENT_FIELDS)
+            .iterator(chunk_size=ANALYTICS_BATCH_SIZE)
+        )
+        for row in rows:
+            yield *row, archived
+
+
+def write_analytics(path: str | Path, season: int | None = None) -> AnalyticsSnapshot:
+    """Write a snapshot of a season (by default, this one) to a file.
+
+    The file is built alongside and moved into place when it's complete, so
+    an existing file at `path` is only replaced by a finished snapshot.
+    """
+    if season is None:
+        season = current_season()
+    with reading_from_reports():
+        alias = router.db_for_read(Event)
+
+    path = Path(path)
+    partial = path.with_name(path.name + ".partial")
+    partial.unlink(missing_ok=True)
+    out = sqlite3.connect(partial, isolation_level=None)
+    try:
+        # The file is thrown away if anything goes wrong, so skip the
+        # journal and fsyncs.
+        out.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;")
+        out.executescript(_SCHEMA)
+        out.execute("BEGIN")
+        with _read_snapshot(alias):
+            taken_at = timezone.now()
+            snapshot = _copy(out, alias, season, taken_at)
+        out.execute("COMMIT")
+    except BaseException:
+        out.close()
+        partial.unlink(missing_ok=True)
+        raise
+    out.close()
+    partial.replace(path)
+    return snapshot
+
+
+def _copy(
+    out: sqlite3.Connection, alias: str, season: int, taken_at: datetime
+) -> AnalyticsSnapshot:
+    _insert(
+        out,
+        "varieties",
+        [(v.value, v.label, PRICE_CENTS.get(v, 0)) for v in CookieVariety],
+    )
+
+    family_ids: list[int] = []
+    families = (
+        Family.objects.using(alias)
+        .order_by("pk")
+        .values_list("pk", "scout_name", "email", "grade")
+        .iterator(chunk_size=ANALYTICS_BATCH_SIZE)
+    )
+    for batch in itertools.batched(families, ANALYTICS_BATCH_SIZE):
+        _insert(out, "families", list(batch))
+        family_ids += [row[0] for row in batch]
+
+    event_count = 0
+    tallies: dict[int, _Tally] = {}
+    for batch in itertools.batched(_event_rows(alias, season), ANALYTICS_BATCH_SIZE):
+        flattened = []
+        for row in batch:
+            pk, family_id, created_at, event_season, event_type, unit = row[:6]
+            location_id, count_data, archived = row[6:]
+            counts = {code: int(count_data.get(code) or 0) for code in _CODES}
+            multiplier = BOXES_PER_CASE if unit == CountUnit.CASE else 1
+            boxes = {code: count * multiplier for code, count in counts.items()}
+            tally = tallies.setdefault(family_id, _Tally())
+            if event_type in (EventType.PICKUP, EventType.RETURN):
+                sign = 1 if event_type == EventType.PICKUP else -1
+                for code in _CODES:
+                    tally.holdings[code] += sign * boxes[code]
+            elif event_type == EventType.COOKIE_ORDER:
+                if tally.order is None or (created_at, pk) > tally.order[:2]:
+                    tally.order = (created_at, pk, unit, counts, boxes)
+            flattened.append(
+                (
+                    pk,
+                    family_id,
+                    created_at.isoformat(),
+                    event_season,
+                    event_type,
+                    unit,
+                    location_id,
+                    archived,
+                    *(boxes[code] for code in _CODES),
+                    sum(boxes.values()),
+                )
+            )
+        _insert(out, "events", flattened)
+        event_count += len(batch)
+
+    orders = []
+    balances = []
+    for family_id in family_ids:
+        tally = tallies.get(family_id, _Tally())
+        ordered_cents = 0
+        if tally.order is not None:
+            ordered_at, event_id, unit, counts, boxes = tally.order
+            orders.append(
+                (
+                    family_id,
+                    event_id,
+                    ordered_at.isoformat(),
+                    unit,
+                    *(counts[code] for code in _CODES),
+                    sum(counts.values()),
+                )
+            )
+            ordered_cents = _value_cents(boxes)
+        held_cents = _value_cents(tally.holdings)
+        balances.append(
+            (
+                family_id,
+                *(tally.holdings[code] for code in _CODES),
+                ordered_cents,
+                held_cents,
+                ordered_cents + held_cents,
+            )
+        )
+    _insert(out, "orders", orders)
+    _insert(out, "balances", balances)
+
+    season_balances = SeasonBalance.objects.using(alias).order_by("season", "family_id")
+    _insert(
+        out,
+        "season_balances",
+        [
+            (
+                balance.season,
+                balance.family_id,
+                *(int(balance.holdings.get(code) or 0) for code in _CODES),
+                balance.ordered_cents,
+                balance.held_cents,
+                balance.closed_at.isoformat(),
+            )
+            for balance in season_balances
+        ],
+    )
+
+    snapshot = AnalyticsSnapshot(
+        taken_at=taken_at, season=season, families=len(family_ids), events=event_count
+    )
+    _insert(
+        out,
+        "snapshot",
+        [(taken_at.isoformat(), season, snapshot.families, snapshot.events)],
+    )
+    return snapshot
@@ -0,0 +1,157 @@
+import sqlite3
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from . import analytics
+from .analytics import write_analytics
+from .models import (
+    CountUnit,
+    Event,
+    EventType,
+    Family,
+    Report,
+    ReportKind,
+    ReportStatus,
+    current_season,
+)
+from .money import family_money
+from .reports import build_report
+from .seasons import close_season
+
+
+@pytest.fixture
+def families():
+    ada = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    bea = Family.objects.create(scout_name="Bea", email="bea@example.com", grade=5)
+    Event.objects.create(
+        family=ada,
+        event_type=EventType.COOKIE_ORDER,
+        unit=CountUnit.CASE,
+        count_data={"TMint": 2, "Sam": 1},
+    )
+    Event.objects.create(
+        family=ada, event_type=EventType.PICKUP, count_data={"TMint": 10, "Sam": 3}
+    )
+    Event.objects.create(
+        family=ada, event_type=EventType.RETURN, count_data={"TMint": 4}
+    )
+    Event.objects.create(family=ada, event_type=EventType.COUNT, count_data={"Tre": 1})
+    Event.objects.create(family=bea, event_type=EventType.PICKUP, count_data={"Sam": 6})
+    return ada, bea
+
+
+def _query(path, sql, *params):
+    with sqlite3.connect(path) as db:
+        return db.execute(sql, params).fetchall()
+
+
+@pytest.mark.django_db
+def test_snapshot_flattens_events_and_matches_money(families, tmp_path):
+    ada, bea = families
+    path = tmp_path / "season.sqlite3"
+    snapshot = write_analytics(path)
+
+    assert (snapshot.season, snapshot.families, snapshot.events) == (
+        current_season(),
+        2,
+        5,
+    )
+    assert _query(path, "SELECT scout_name FROM families ORDER BY id") == [
+        ("Ada",),
+        ("Bea",),
+    ]
+    # Orders in cases are flattened to boxes in events, as entered in orders.
+    assert _query(
+        path,
+        'SELECT "TMint", "Sam", total FROM events WHERE event_type = ?',
+        EventType.COOKIE_ORDER.value,
+    ) == [(24, 12, 36)]
+    assert _query(path, 'SELECT unit, "TMint", "Sam", total FROM orders') == [
+        ("case", 2, 1, 3)
+    ]
+    assert _query(
+        path, 'SELECT family_id, "TMint", "Sam" FROM balances ORDER BY family_id'
+    ) == [(ada.pk, 6, 3), (bea.pk, 0, 6)]
+    money = {
+        row.family_id: (row.ordered_cents, row.held_cents, row.owed_cents)
+        for row in family_money()
+    }
+    balances = _query(
+        path, "SELECT family_id, ordered_cents, held_cents, owed_cents FROM balances"
+    )
+    assert {row[0]: row[1:] for row in balances} == money
+    assert _query(path, "SELECT season, families, events FROM snapshot") == [
+        (current_season(), 2, 5)
+    ]
+
+
+@pytest.mark.django_db
+def test_snapshot_of_a_closed_season_reads_the_archive(families, tmp_path):
+    last = current_season() - 1
+    Event.objects.update(season=last)
+    close_season(last)
+
+    path = tmp_path / "last.sqlite3"
+    snapshot = write_analytics(path, season=last)
+
+    assert snapshot.events == 5
+    assert _query(path, "SELECT DISTINCT archived FROM events") == [(1,)]
+    assert _query(path, "SELECT COUNT(*) FROM season_balances") == [(2,)]
+
+
+@pytest.mark.django_db
+def test_failed_snapshot_leaves_the_previous_file(families, tmp_path, monkeypatch):
+    path = tmp_path / "season.sqlite3"
+    write_analytics(path)
+
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(analytics, "_copy", fail)
+    with pytest.raises(RuntimeError):
+        write_analytics(path)
+    assert _query(path, "SELECT events FROM snapshot") == [(5,)]
+    assert list(tmp_path.iterdir()) == [path]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_snapshot_doesnt_hold_the_write_lock(families, tmp_path, monkeypatch):
+    real = analytics._copy
+    writes = []
+
+    def copy_while_writing(*args):
+        snapshot = real(*args)
+        # Another process writing mid-export gets the lock at once.
+        with sqlite3.connect(connection.settings_dict["NAME"], timeout=0) as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("UPDATE trails_family SET grade = grade + 1")
+            db.rollback()
+            writes.append("ok")
+        return snapshot
+
+    monkeypatch.setattr(analytics, "_copy", copy_while_writing)
+    assert write_analytics(tmp_path / "season.sqlite3").events == 5
+    assert writes == ["ok"]
+
+
+@pytest.mark.django_db
+def test_export_analytics_command(families, tmp_path):
+    out = StringIO()
+    call_command("export_analytics", str(tmp_path / "s.sqlite3"), stdout=out)
+    assert "2 families, 5 events" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_analytics_report(families, tmp_path):
+    report = Report.objects.create(kind=ReportKind.ANALYTICS)
+    build_report(report)
+
+    report.refresh_from_db()
+    assert report.status == ReportStatus.SUCCEEDED
+    assert report.filename == "analytics.sqlite3"
+    path = tmp_path / report.filename
+    path.write_bytes(bytes(report.content))
+    assert _query(path, "SELECT COUNT(*) FROM events") == [(5,)]
@@ -0,0 +1,316 @@
+"""
+Read-only JSON API for volunteer spreadsheets and scripts.
+
+Every request needs an `Authorization: Bearer <token>` header carrying a
+token created in the admin. Responses have a strong ETag derived from the
+change generations of the tables they read, so a poll that sends it back in
+If-None-Match gets a 304 without the event tables being queried at all.
+"""
+
+import base64
+import binascii
+import hashlib
+from collections.abc import Callable
+from datetime import datetime
+from functools import wraps
+from typing import Any
+
+from django.db.models import Q
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition
+
+from .cookies import CookieVariety
+from .generations import EVENTS, FAMILIES, generation_key
+from .inventory import empty_holdings, family_holdings
+from .models import ApiToken, Event, EventType, Family
+from .money import troop_money
+from .report_cache import generation_cached
+from .routers import reading_from_reports
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class ApiError(Exception):
+    pass
+
+
+def has_api_token(request: HttpRequest) -> bool:
+    """Whether the request carries a valid bearer token."""
+    scheme, _, key = request.headers.get("Authorization", "").partition(" ")
+    return (
+        scheme.lower() == "bearer"
+        and bool(key)
+        and ApiToken.objects.filter(key_digest=ApiToken.digest(key)).exists()
+    )
+
+
+def token_required(view_func: Any) -> Any:
+    """Decorator for API views that require a valid bearer token."""
+
+    @wraps(view_func)
+    def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if not has_api_token(request):
+            response = JsonResponse({"error": "A valid API token is required."})
+            response.status_code = 401
+            response["WWW-Authenticate"] = "Bearer"
+            return response
+        return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def generation_etag(*tables: str) -> Callable[..., str]:
+    """Build an ETag function for a view that reads the given tables."""
+
+    def etag(request: HttpRequest, *args: Any, **kwargs: Any) -> str:
+        key = f"{request.get_full_path()}|{generation_key(*tables)}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    return etag
+
+
+class ApiView(View):
+    def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any):
+        try:
+            # The API is read-only, so it can be served from the replica.
+            with reading_from_reports():
+                response = super().dispatch(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        # Clients may keep a copy, but must revalidate it every time.
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
+def _encode_token(*parts: object) -> str:
+    raw = "|".join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_token(value: str) -> list[str]:
+    try:
+        return (
+            base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+            .decode()
+            .split("|")
+        )
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ApiError("Invalid cursor.") from e
+
+
+def encode_cursor(timestamp: datetime, pk: int) -> str:
+    return _encode_token(timestamp.isoformat(), pk)
+
+
+def decode_cursor(value: str) -> tuple[datetime, int]:
+    try:
+        timestamp, pk = _decode_token(value)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except ValueError as e:
+        raise ApiError("Invalid cursor.") from e
+
+
+def encode_since(sync_seq: int, pk: int) -> str:
+    return _encode_token("seq", sync_seq, pk)
+
+
+def decode_since(value: str) -> tuple[int, int]:
+    parts = _decode_token(value)
+    if len(parts) == 2:
+        # A (timestamp, id) token from before syncs ran in commit order:
+        # start over, and let the client's upserts absorb the repeats.
+        decode_cursor(value)
+        return 0, 0
+    try:
+        tag, sync_seq, pk = parts
+        if tag != "seq":
+            raise ValueError(tag)
+        return int(sync_seq), int(pk)
+    except ValueError as e:
+        raise ApiError("Invalid cursor.") from e
+
+
+def _page_size(request: HttpRequest) -> int:
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        raise ApiError("limit must be an integer.") from e
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _serialize_family(family: Family) -> dict[str, Any]:
+    return {
+        "id": family.pk,
+        "scout_name": family.scout_name,
+        "email": family.email,
+        "grade": family.grade,
+    }
+
+
+def _serialize_event(event: Event) -> dict[str, Any]:
+    return {
+        "id": event.pk,
+        "family": event.family_id,
+        "event_type": event.event_type,
+        "unit": event.unit,
+        "counts": event.count_data,
+        "created_at": event.created_at,
+        "updated_at": event.updated_at,
+        "voided_at": event.voided_at,
+    }
+
+
+@method_decorator(token_required, name="dispatch")
+@method_decorator(condition(etag_func=generation_etag(FAMILIES)), name="get")
+class FamiliesApiView(ApiView):
+    def get(self, request: HttpRequest) -> HttpResponse:
+        families = Family.objects.order_by("scout_name", "pk")
+        return JsonResponse({"results": [_serialize_family(f) for f in families]})
+
+
+@method_decorator(token_required, name="dispatch")
+@method_decorator(condition(etag_func=generation_etag(EVENTS)), name="get")
+class EventsApiView(ApiView):
+    """Events, in pages.
+
+    With `cursor`, pages run in (created_at, id) order and each response has
+    a `next` cursor until the last page. With `since`, pages run in
+    (sync_seq, id) order so edits are picked up too, and each response has
+    a `since` token to send on the next poll; pass an empty `since` to start
+    a sync from the beginning. Syncs also see voided events, with their
+    `voided_at` set, so clients can drop them.
+
+    Every write stamps its events with a sync_seq that is handed out in
+    commit order (see generations.next_generation), so a write that commits
+    after a poll always sorts after that poll's token: a client that keeps
+    polling sees every committed change, none of them skipped. It may see
+    an event again after a later edit, so clients should upsert by id.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        limit = _page_size(request)
+        syncing = "since" in request.GET
+        field = "sync_seq" if syncing else "created_at"
+        token = request.GET.get("since" if syncing else "cursor")
+
+        events = Event.all_objects.all() if syncing else Event.objects.all()
+        if token:
+            position, pk = decode_since(token) if syncing else decode_cursor(token)
+            events = events.filter(
+                Q(**{f"{field}__gt": position}) | Q(**{field: position, "pk__gt": pk})
+            )
+        page = list(events.order_by(field, "pk")[: limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        encode = encode_since if syncing else encode_cursor
+        last_token = encode(getattr(page[-1], field), page[-1].pk) if page else None
+        data: dict[str, Any] = {"results": [_serialize_event(e) for e in page]}
+        if syncing:
+            data["since"] = last_token or token or ""
+            data["has_more"] = has_more
+        else:
+            data["next"] = last_token if has_more else None
+        return JsonResponse(data)
+
+
+@method_decorator(token_required, name="dispatch")
+@method_decorator(condition(etag_func=generation_etag(EVENTS, FAMILIES)), name="get")
+class BalancesApiView(ApiView):
+    """Troop-owned boxes held by each family (pickups minus returns)."""
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        holdings = family_holdings()
+        return JsonResponse(
+            {
+                "results": [
+                    {
+                        "family": family.pk,
+                        "scout_name": family.scout_name,
+                        "holdings": holdings.get(family.pk, empty_holdings()),
+                    }
+                    for family in Family.objects.order_by("scout_name", "pk")
+                ]
+            }
+        )
+
+
+@generation_cached(EVENTS, FAMILIES)
+def orders_summary() -> dict[str, Any]:
+    """Each family's initial order with troop totals, as the API serves it."""
+    # Latest order wins, matching the initial orders CSV.
+    orders = {
+        order.family_id: order
+        for order in Event.objects.filter(event_type=EventType.COOKIE_ORDER).order_by(
+            "created_at", "pk"
+        )
+    }
+    totals = {variety.value: 0 for variety in CookieVariety}
+    results = []
+    for family in Family.objects.order_by("scout_name", "pk"):
+        order = orders.get(family.pk)
+        cases = {
+            variety.value: order.count_for_variety(variety) if order else 0
+            for variety in CookieVariety
+        }
+        for code, count in cases.items():
+            totals[code] += count
+        results.append(
+            {
+                "family": family.pk,
+                "scout_name": family.scout_name,
+                "ordered_at": order.created_at if order else None,
+                "cases": cases,
+                "total_cases": sum(cases.values()),
+            }
+        )
+    return {"results": results, "totals": totals, "total_cases": sum(totals.values())}
+
+
+@method_decorator(token_required, name="dispatch")
+@method_decorator(condition(etag_func=generation_etag(EVENTS, FAMILIES)), name="get")
+class OrdersApiView(ApiView):
+    """Each family's initial order, in cases, with troop totals."""
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        return JsonResponse(orders_summary())
+
+
+@method_decorator(token_required, name="dispatch")
+@method_decorator(condition(etag_func=generation_etag(EVENTS, FAMILIES)), name="get")
+class MoneyApiView(ApiView):
+    """What each family owes, by family and grade, in integer cents."""
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        summary = troop_money()
+        return JsonResponse(
+            {
+                "results": [
+                    {
+                        "family": family.family_id,
+                        "scout_name": family.scout_name,
+                        "grade": family.grade,
+                        "ordered_cents": family.ordered_cents,
+                        "held_cents": family.held_cents,
+                        "owed_cents": family.owed_cents,
+                    }
+                    for family in summary.families
+                ],
+                "grades": [
+                    {
+                        "grade": grade.grade,
+                        "families": grade.families,
+                        "ordered_cents": grade.ordered_cents,
+                        "held_cents": grade.held_cents,
+                        "owed_cents": grade.owed_cents,
+                    }
+                    for grade in summary.grades
+                ],
+                "ordered_cents": summary.ordered_cents,
+                "held_cents": summary.held_cents,
+                "owed_cents": summary.owed_cents,
+            }
+        )
@@ -0,0 +1,124 @@
+from datetime import UTC, datetime
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from .api import encode_cursor
+from .generations import EVENTS, bump_generation, get_generations
+from .models import ApiToken, Event, EventType
+
+
+@pytest.fixture
+def token():
+    api_token = ApiToken(name="Treasurer's spreadsheet")
+    key = api_token.generate_key()
+    api_token.save()
+    return key
+
+
+@pytest.fixture
+def auth(token):
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+@pytest.mark.django_db
+def test_bump_generation():
+    assert get_generations(EVENTS) == {EVENTS: 0}
+    bump_generation(EVENTS)
+    bump_generation(EVENTS)
+    assert get_generations(EVENTS) == {EVENTS: 2}
+
+
+@pytest.mark.django_db
+def test_api_requires_token(client):
+    response = client.get(reverse("api_families"))
+    assert response.status_code == 401
+    response = client.get(
+        reverse("api_families"), HTTP_AUTHORIZATION="Bearer not-a-token"
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_unchanged_poll_is_not_modified_without_reading_events(
+    client, auth, family, django_assert_num_queries
+):
+    Event.objects.create(family=family, event_type=EventType.PICKUP)
+    url = reverse("api_balances")
+    response = client.get(url, **auth)
+    assert response.status_code == 200
+    etag = response["ETag"]
+
+    # One query for the token, one for the generations.
+    with django_assert_num_queries(2):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag, **auth)
+    assert response.status_code == 304
+
+    Event.objects.create(family=family, event_type=EventType.RETURN)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag, **auth)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_events_cursor_pagination(client, auth, family):
+    created = [
+        Event.objects.create(family=family, event_type=EventType.COUNT).pk
+        for _ in range(5)
+    ]
+    url = reverse("api_events")
+    seen = []
+    params = {"limit": 2}
+    while True:
+        data = client.get(url, params, **auth).json()
+        seen.extend(e["id"] for e in data["results"])
+        if data["next"] is None:
+            break
+        params["cursor"] = data["next"]
+    assert seen == created
+
+    response = client.get(url, {"cursor": "garbage!"}, **auth)
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_events_since_returns_only_changes(client, auth, family):
+    first = Event.objects.create(family=family, event_type=EventType.COUNT)
+    url = reverse("api_events")
+    data = client.get(url, {"since": ""}, **auth).json()
+    assert [e["id"] for e in data["results"]] == [first.pk]
+    since = data["since"]
+
+    data = client.get(url, {"since": since}, **auth).json()
+    assert data["results"] == []
+    assert data["since"] == since
+
+    second = Event.objects.create(family=family, event_type=EventType.COUNT)
+    first.save()
+    data = client.get(url, {"since": since}, **auth).json()
+    assert [e["id"] for e in data["results"]] == [second.pk, first.pk]
+
+
+@pytest.mark.django_db
+def test_events_since_ignores_timestamps(client, auth, family):
+    # A write that took its timestamp before a poll but committed after it
+    # must still be delivered: syncs follow commit order, not the clock.
+    first = Event.objects.create(family=family, event_type=EventType.COUNT)
+    url = reverse("api_events")
+    since = client.get(url, {"since": ""}, **auth).json()["since"]
+
+    Event.all_objects.filter(pk=first.pk).update(
+        updated_at=datetime(2000, 1, 1, tzinfo=UTC)
+    )
+    data = client.get(url, {"since": since}, **auth).json()
+    assert [e["id"] for e in data["results"]] == [first.pk]
+    assert Event.all_objects.get(pk=first.pk).sync_seq > 0
+
+
+@pytest.mark.django_db
+def test_events_since_restarts_from_a_timestamp_token(client, auth, family):
+    first = Event.objects.create(family=family, event_type=EventType.COUNT)
+    old_token = encode_cursor(timezone.now(), first.pk)
+    data = client.get(reverse("api_events"), {"since": old_token}, **auth).json()
+    assert [e["id"] for e in data["results"]] == [first.pk]
@@ -5,3 +5,6 @@ class TrailsConfig(AppConfig):
     label = "trails"
     name = "cookie.trails"
     verbose_name = "Trails"
+
+    def ready(self):
+        from . import signals  # noqa: F401
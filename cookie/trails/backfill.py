@@ -0,0 +1,107 @@
+"""
+Bring events written before counts were checked into line with counts.py.
+
+The event table is split into id ranges, and each range is checked and
+fixed in its own short transaction by one of a pool of worker threads:
+every row in the range is locked, normalized, and any that changed are
+written back with one `bulk_update`. Rows whose counts can't be fixed
+automatically (an unknown variety, a negative count, a fraction) are left
+alone and reported, to be corrected by hand.
+
+Ranges finish out of order, but results are collected in order, so the
+checkpoint only moves past a range once every range before it is done.
+A run that stops part-way can pick up from its last checkpoint; starting
+over is also safe, since rows that are already normal aren't written.
+"""
+
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .counts import check_count_data, is_normalized
+from .models import Event
+
+BACKFILL_BATCH_SIZE = 1000
+BACKFILL_WORKERS = 4
+
+
+@dataclass
+class BackfillResult:
+    scanned: int = 0
+    fixed: int = 0
+    # Problems that need a person, by event id.
+    flagged: dict[int, list[str]] = field(default_factory=dict)
+    # Every event with an id up to this one has been checked.
+    checkpoint: int = 0
+
+
+@dataclass(frozen=True)
+class _Batch:
+    scanned: int
+    fixed: int
+    flagged: dict[int, list[str]]
+
+
+def _backfill_range(low: int, high: int, drop_unknown: bool) -> _Batch:
+    try:
+        with transaction.atomic():
+            events = list(
+                Event.all_objects.filter(pk__gt=low, pk__lte=high)
+                .select_for_update()
+                .only("pk", "count_data")
+            )
+            now = timezone.now()
+            fixed = []
+            flagged = {}
+            for event in events:
+                check = check_count_data(event.count_data, drop_unknown=drop_unknown)
+                if check.problems:
+                    flagged[event.pk] = check.problems
+                elif not is_normalized(event.count_data):
+                    event.count_data = check.counts
+                    # So API syncs pick up the normalized counts.
+                    event.updated_at = now
+                    fixed.append(event)
+            Event.all_objects.bulk_update(fixed, ["count_data", "updated_at"])
+            return _Batch(len(events), len(fixed), flagged)
+    finally:
+        # Each worker thread has its own connection; don't leave it open.
+        connection.close()
+
+
+def backfill_counts(
+    *,
+    start_after: int = 0,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    workers: int = BACKFILL_WORKERS,
+    drop_unknown: bool = False,
+    progress: Callable[[BackfillResult], None] | None = None,
+) -> BackfillResult:
+    """Check and fix the counts of every event with an id after `start_after`.
+
+    `progress` is called with the running result after each batch; if the
+    backfill fails, the last result it saw has the checkpoint to resume
+    from.
+    """
+    result = BackfillResult(checkpoint=start_after)
+    last = Event.all_objects.aggregate(last=Max("pk"))["last"] or 0
+    ranges = [
+        (low, min(low + batch_size, last))
+        for low in range(start_after, last, batch_size)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        batches = executor.map(
+            lambda bounds: _backfill_range(*bounds, drop_unknown), ranges
+        )
+        for (_, high), batch in zip(ranges, batches):
+            result.scanned += batch.scanned
+            result.fixed += batch.fixed
+            result.flagged.update(batch.flagged)
+            result.checkpoint = high
+            if progress is not None:
+                progress(result)
+    return result
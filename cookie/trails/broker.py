@@ -0,0 +1,114 @@
+"""
+In-process message broker for the live inventory dashboard.
+
+Messages are rendered to server-sent event bytes once, when published, and
+kept in a bounded buffer that every open stream reads from. An extra
+dashboard therefore costs one more idle waiter, not one more query or
+serialization per event.
+
+Each message id is "<epoch>-<sequence>", where the epoch is random per
+process. A reconnecting client sends back the last id it saw; if that id
+came from this process and is still in the buffer, the stream resumes from
+it, and otherwise the client is sent a fresh snapshot.
+"""
+
+import asyncio
+import json
+import secrets
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+DEFAULT_BUFFER_SIZE = 1000
+
+
+def render_event(event: str, data: Any, message_id: str | None = None) -> bytes:
+    """Render a server-sent event."""
+    lines = []
+    if message_id is not None:
+        lines.append(f"id: {message_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+@dataclass(frozen=True)
+class Message:
+    seq: int
+    id: str
+    payload: bytes
+
+
+class Broker:
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.epoch = secrets.token_hex(4)
+        self._seq = 0
+        self._messages: deque[Message] = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def seq(self) -> int:
+        """The sequence number of the most recently published message."""
+        return self._seq
+
+    def message_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def publish(self, event: str, data: Any) -> Message:
+        """Publish a message to every subscriber. Safe to call from any thread."""
+        with self._lock:
+            self._seq += 1
+            message_id = self.message_id(self._seq)
+            message = Message(
+                seq=self._seq,
+                id=message_id,
+                payload=render_event(event, data, message_id),
+            )
+            self._messages.append(message)
+            waiters = list(self._waiters)
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        return message
+
+    def parse_cursor(self, cursor: str | None) -> int | None:
+        """Return the sequence number for a cursor from this process, if any."""
+        if not cursor:
+            return None
+        epoch, _, seq = cursor.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq: int) -> list[Message] | None:
+        """Messages published after `seq`, or None if some have been dropped."""
+        with self._lock:
+            if seq > self._seq:
+                return None
+            oldest = self._messages[0].seq if self._messages else self._seq + 1
+            if seq + 1 < oldest:
+                return None
+            return [message for message in self._messages if message.seq > seq]
+
+    async def wait(self, seq: int, timeout: float) -> list[Message] | None:
+        """Wait up to `timeout` seconds for messages published after `seq`."""
+        waiter = asyncio.Event()
+        entry = (asyncio.get_running_loop(), waiter)
+        with self._lock:
+            self._waiters.add(entry)
+        try:
+            messages = self.since(seq)
+            if messages == []:
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout)
+                except TimeoutError:
+                    return []
+                messages = self.since(seq)
+            return messages
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+
+inventory_broker = Broker()
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+
+from .broker import Broker
+
+
+def test_publish_renders_server_sent_event():
+    broker = Broker()
+    message = broker.publish("holdings", {"family": 1})
+    assert (
+        message.payload
+        == (f'id: {broker.epoch}-1\nevent: holdings\ndata: {{"family":1}}\n\n').encode()
+    )
+
+
+def test_since_resumes_from_cursor():
+    broker = Broker()
+    first = broker.publish("holdings", 1)
+    broker.publish("holdings", 2)
+    seq = broker.parse_cursor(first.id)
+    assert seq == 1
+    assert [m.seq for m in broker.since(seq)] == [2]
+    assert broker.since(broker.seq) == []
+
+
+def test_unknown_or_stale_cursor_requires_snapshot():
+    broker = Broker(buffer_size=2)
+    for i in range(5):
+        broker.publish("holdings", i)
+    assert broker.parse_cursor("someotherprocess-3") is None
+    assert broker.parse_cursor(None) is None
+    # Messages 1 and 2 have fallen out of the buffer.
+    assert broker.since(1) is None
+    assert [m.seq for m in broker.since(3)] == [4, 5]
+    # A sequence number from the future means the process restarted.
+    assert broker.since(99) is None
+
+
+def test_wait_wakes_on_publish_from_another_thread():
+    broker = Broker()
+
+    async def subscribe():
+        waiting = asyncio.create_task(broker.wait(0, timeout=5))
+        await asyncio.sleep(0.01)
+        threading.Thread(target=broker.publish, args=("holdings", 1)).start()
+        return await waiting
+
+    messages = asyncio.run(subscribe())
+    assert [m.seq for m in messages] == [1]
+
+
+def test_wait_times_out_with_no_messages():
+    broker = Broker()
+    assert asyncio.run(broker.wait(0, timeout=0.01)) == []
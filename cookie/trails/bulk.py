@@ -0,0 +1,120 @@
+"""
+Bulk corrections to events, as set-based writes.
+
+Fixing a bad distribution day can mean hundreds of events: void them, move
+them to the family they really belonged to, or mark counts that were
+entered in cases as cases. Each correction is one UPDATE over the selected
+events, in one transaction that also brings the derived figures along:
+
+- location stock, for pickups and returns whose boxes change;
+- the events generation, so cached reports rebuild (see
+  `GenerationQuerySet`);
+- live inventory dashboards, which get one fresh snapshot once the
+  transaction commits, instead of one message per event;
+- the admin log, which gets one entry for the whole batch.
+
+Voided events stay in the table, with `voided_at` set, but `Event.objects`
+leaves them out, so no page, report or total counts them.
+"""
+
+from collections.abc import Callable
+
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.auth.models import AbstractBaseUser
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.utils import timezone
+
+from .broker import inventory_broker
+from .inventory import holdings_snapshot
+from .models import CountUnit, Event, Family
+from .stock import adjust_stock, stock_changes_between
+
+_LOCKED_FIELDS = ("pk", "family_id", "location_id", "event_type", "unit", "count_data")
+
+
+def _bulk_update(
+    events: models.QuerySet[Event],
+    user: AbstractBaseUser,
+    description: str,
+    after: Callable[[list[Event]], list[Event]] | None = None,
+    **fields,
+) -> int:
+    """Apply `fields` to every event in one UPDATE, with everything it implies.
+
+    `after` is how the events will look once updated, for stock; leave it
+    out when the update takes them out of the count altogether.
+    """
+    with transaction.atomic():
+        locked = list(
+            Event.objects.filter(pk__in=events.values("pk"))
+            .select_for_update()
+            .only(*_LOCKED_FIELDS)
+            .order_by("pk")
+        )
+        if not locked:
+            return 0
+        ids = [event.pk for event in locked]
+        adjust_stock(stock_changes_between(locked, after(locked) if after else []))
+        Event.objects.filter(pk__in=ids).update(updated_at=timezone.now(), **fields)
+        LogEntry.objects.create(
+            user_id=user.pk,
+            content_type=ContentType.objects.get_for_model(Event),
+            object_repr=f"{len(ids)} events",
+            action_flag=CHANGE,
+            change_message=f"{description}: events {', '.join(map(str, ids))}.",
+        )
+        transaction.on_commit(
+            lambda: inventory_broker.publish("snapshot", holdings_snapshot())
+        )
+    return len(ids)
+
+
+def void_events(events: models.QuerySet[Event], user: AbstractBaseUser) -> int:
+    """Void events, returning how many there were.
+
+    Raises StockError if giving back a voided return's boxes would overdraw
+    a location.
+    """
+    return _bulk_update(events, user, "Voided", voided_at=timezone.now())
+
+
+def reattribute_events(
+    events: models.QuerySet[Event], family: Family, user: AbstractBaseUser
+) -> int:
+    """Move events to another family, returning how many moved."""
+    # Stock belongs to locations, not families, so it doesn't change.
+    return _bulk_update(
+        events,
+        user,
+        f"Moved to {family} (#{family.pk})",
+        lambda locked: locked,
+        family=family,
+    )
+
+
+def set_event_unit(
+    events: models.QuerySet[Event], unit: CountUnit, user: AbstractBaseUser
+) -> int:
+    """Mark events' counts as being in `unit`, without changing the numbers.
+
+    For counts entered in cases but recorded as boxes, or the other way
+    around. Pickups and returns at a location move stock by the difference;
+    raises StockError if that would overdraw a location.
+    """
+
+    def relabeled(locked: list[Event]) -> list[Event]:
+        return [
+            Event(
+                pk=event.pk,
+                location_id=event.location_id,
+                event_type=event.event_type,
+                unit=unit,
+                count_data=event.count_data,
+            )
+            for event in locked
+        ]
+
+    return _bulk_update(
+        events, user, f"Marked as {CountUnit(unit).label.lower()}", relabeled, unit=unit
+    )
@@ -0,0 +1,150 @@
+import pytest
+from django.contrib.admin.models import LogEntry
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .broker import inventory_broker
+from .bulk import reattribute_events, set_event_unit, void_events
+from .generations import EVENTS, get_generations
+from .inventory import family_holdings
+from .models import ApiToken, CountUnit, Event, EventType, Family, Location
+from .stock import StockError, stock_at, transfer_stock
+from .sync import record_event
+
+
+@pytest.fixture
+def families():
+    ada = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    bea = Family.objects.create(scout_name="Bea", email="bea@example.com", grade=5)
+    return ada, bea
+
+
+@pytest.fixture
+def staff(admin_user):
+    return admin_user
+
+
+@pytest.mark.django_db(transaction=True)
+def test_void_is_one_update_and_drops_out_of_figures(families, staff):
+    ada, _ = families
+    Event.objects.bulk_create(
+        Event(family=ada, event_type=EventType.PICKUP, count_data={"TMint": 1})
+        for _ in range(300)
+    )
+    generation = get_generations(EVENTS)[EVENTS]
+    published = inventory_broker.seq
+
+    with CaptureQueriesContext(connection) as queries:
+        assert void_events(Event.objects.all(), staff) == 300
+    updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+    assert len([q for q in updates if "trails_event" in q["sql"]]) == 1
+
+    assert Event.objects.count() == 0
+    assert Event.all_objects.filter(voided_at__isnull=False).count() == 300
+    assert family_holdings() == {}
+    assert get_generations(EVENTS)[EVENTS] > generation
+    # One snapshot for the dashboards, not one message per event.
+    assert inventory_broker.seq == published + 1
+    entry = LogEntry.objects.get()
+    assert entry.object_repr == "300 events"
+    assert entry.change_message.startswith("Voided: events ")
+
+
+@pytest.mark.django_db
+def test_voiding_a_pickup_puts_its_boxes_back(families, staff):
+    ada, _ = families
+    cupboard = Location.objects.create(name="Cupboard")
+    transfer_stock(None, cupboard, {"TMint": 10})
+    record_event(
+        None,
+        family=ada,
+        event_type=EventType.PICKUP,
+        location=cupboard,
+        count_data={"TMint": 6},
+    )
+    assert stock_at(cupboard)["TMint"] == 4
+
+    void_events(Event.objects.all(), staff)
+    assert stock_at(cupboard)["TMint"] == 10
+
+
+@pytest.mark.django_db
+def test_unit_change_moves_stock_by_the_difference(families, staff):
+    ada, _ = families
+    cupboard = Location.objects.create(name="Cupboard")
+    transfer_stock(None, cupboard, {"TMint": 30})
+    record_event(
+        None,
+        family=ada,
+        event_type=EventType.PICKUP,
+        location=cupboard,
+        count_data={"TMint": 2},
+    )
+
+    assert set_event_unit(Event.objects.all(), CountUnit.CASE, staff) == 1
+    assert stock_at(cupboard)["TMint"] == 30 - 24
+    assert family_holdings()[ada.pk]["TMint"] == 24
+
+    # Not enough stock for three cases: nothing changes.
+    Event.objects.update(count_data={"TMint": 3}, unit=CountUnit.BOX)
+    with pytest.raises(StockError):
+        set_event_unit(Event.objects.all(), CountUnit.CASE, staff)
+    assert Event.objects.get().unit == CountUnit.BOX
+    assert LogEntry.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_reattribute_moves_holdings(families, staff):
+    ada, bea = families
+    Event.objects.create(family=ada, event_type=EventType.PICKUP, count_data={"Sam": 4})
+    assert reattribute_events(Event.objects.all(), bea, staff) == 1
+    holdings = family_holdings()
+    assert list(holdings) == [bea.pk]
+    assert holdings[bea.pk]["Sam"] == 4
+
+
+@pytest.mark.django_db
+def test_api_sync_sees_voided_events(client, families, staff):
+    ada, _ = families
+    api_token = ApiToken(name="Sheet")
+    key = api_token.generate_key()
+    api_token.save()
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {key}"}
+    event = Event.objects.create(family=ada, event_type=EventType.COUNT)
+    url = reverse("api_events")
+    since = client.get(url, {"since": ""}, **auth).json()["since"]
+
+    void_events(Event.objects.all(), staff)
+
+    data = client.get(url, {"since": since}, **auth).json()
+    assert [e["id"] for e in data["results"]] == [event.pk]
+    assert data["results"][0]["voided_at"] is not None
+    assert client.get(url, **auth).json()["results"] == []
+
+
+@pytest.mark.django_db
+def test_admin_actions_over_hundreds_of_events(admin_client, families, plain_static):
+    ada, bea = families
+    Event.objects.bulk_create(
+        Event(family=ada, event_type=EventType.COUNT, count_data={"Tre": 1})
+        for _ in range(600)
+    )
+    url = reverse("admin:trails_event_changelist")
+    ids = list(Event.objects.values_list("pk", flat=True))
+
+    response = admin_client.post(
+        url,
+        {"action": "move_to_family", "_selected_action": ids, "family": bea.pk},
+    )
+    assert response.status_code == 302
+    assert Event.objects.filter(family=bea).count() == 600
+
+    response = admin_client.post(
+        url, {"action": "move_to_family", "_selected_action": ids}, follow=True
+    )
+    assert "Choose a family" in response.content.decode()
+
+    admin_client.post(url, {"action": "void", "_selected_action": ids})
+    assert Event.objects.count() == 0
+    assert LogEntry.objects.count() == 2
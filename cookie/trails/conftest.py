@@ -0,0 +1,35 @@
+import pytest
+from django.core.cache import cache
+
+from .models import Family
+from .report_cache import report_cache
+
+
+@pytest.fixture(autouse=True)
+def _clear_report_cache():
+    # Generations restart with each test's rolled-back database, so reports
+    # cached by an earlier test could otherwise match a later one's keys.
+    report_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    # Rate-limit buckets would otherwise carry over from one test's sign-ins
+    # to the next.
+    cache.clear()
+
+
+@pytest.fixture
+def family():
+    return Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+
+
+@pytest.fixture
+def plain_static(settings):
+    # Render pages without needing collectstatic's manifest.
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+    }
@@ -0,0 +1,105 @@
+"""
+The shape of `Event.count_data`, checked on every write.
+
+Stored counts have exactly one key per current variety code, and each value
+is a non-negative integer. Writes are normalized on the way in:
+
+- keys are matched to variety codes ignoring case, or by label;
+- varieties that aren't mentioned are filled in with zero;
+- whole numbers sent as strings or floats, and nulls, become ints.
+
+Anything that can't be made to fit (an unknown or retired variety, a
+negative count, a fraction) is refused with a ValidationError. Rows
+written before the check existed are brought into line by the
+`backfill_counts` command, but it can't fix everything, so code that reads
+counts still tolerates missing or odd values.
+"""
+
+from dataclasses import dataclass
+from typing import Any
+
+from django.core.exceptions import ValidationError
+
+from .cookies import CookieVariety
+
+_CODES = {variety.value.lower(): variety.value for variety in CookieVariety} | {
+    variety.label.lower(): variety.value for variety in CookieVariety
+}
+
+
+@dataclass(frozen=True)
+class CountCheck:
+    # The normalized counts: every variety, as far as they could be read.
+    counts: dict[str, int]
+    # Why the counts can't be stored as they are; empty if they can.
+    problems: list[str]
+
+
+def _whole_number(value: Any) -> int | None:
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, str):
+        try:
+            return int(value.strip() or 0)
+        except ValueError:
+            return None
+    return None
+
+
+def check_count_data(data: Any, *, drop_unknown: bool = False) -> CountCheck:
+    """Normalize counts, noting anything that can't be.
+
+    With `drop_unknown`, counts for varieties that no longer exist are
+    discarded instead of being a problem.
+    """
+    counts = {variety.value: 0 for variety in CookieVariety}
+    if not isinstance(data, dict):
+        return CountCheck(counts, [f"Counts must be an object, not {data!r}."])
+
+    problems = []
+    seen = set()
+    for key, value in data.items():
+        code = _CODES.get(str(key).strip().lower())
+        if code is None:
+            if not drop_unknown:
+                problems.append(f"Unknown variety {key!r}.")
+            continue
+        if code in seen:
+            problems.append(f"{code} is counted twice.")
+            continue
+        seen.add(code)
+        count = _whole_number(value)
+        if count is None:
+            problems.append(f"{code}: {value!r} is not a whole number.")
+        elif count < 0:
+            problems.append(f"{code}: {count} is negative.")
+        else:
+            counts[code] = count
+    return CountCheck(counts, problems)
+
+
+def is_normalized(data: Any) -> bool:
+    """Whether counts are already stored exactly as `check_count_data` would."""
+    return (
+        isinstance(data, dict)
+        and data.keys() == {variety.value for variety in CookieVariety}
+        and all(type(value) is int and value >= 0 for value in data.values())
+    )
+
+
+def normalize_count_data(data: Any) -> dict[str, int]:
+    """Normalized counts, or a ValidationError listing what's wrong."""
+    check = check_count_data(data)
+    if check.problems:
+        raise ValidationError(check.problems)
+    return check.counts
+
+
+def validate_count_data(data: Any) -> None:
+    normalize_count_data(data)
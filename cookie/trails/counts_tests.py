@@ -0,0 +1,73 @@
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import models
+
+from .cookies import CookieVariety
+from .counts import check_count_data, is_normalized, normalize_count_data
+from .models import Event, EventType, Family
+
+
+def test_counts_are_normalized():
+    counts = normalize_count_data({"tmint": "3", "Samoas": 2.0, "Tre": None})
+    assert counts["TMint"] == 3
+    assert counts["Sam"] == 2
+    assert counts["Tre"] == 0
+    assert counts["Toff"] == 0
+    assert is_normalized(counts)
+    assert not is_normalized({"TMint": 3})
+    assert not is_normalized({**counts, "TMint": 3.0})
+
+
+def test_bad_counts_are_refused():
+    check = check_count_data({"Thin Mints": -1, "Sam": 1.5, "Savannah": 4})
+    assert check.problems == [
+        "TMint: -1 is negative.",
+        "Sam: 1.5 is not a whole number.",
+        "Unknown variety 'Savannah'.",
+    ]
+    assert check_count_data({"Savannah": 4}, drop_unknown=True).problems == []
+    assert check_count_data({"TMint": 1, "tmint": 2}).problems == [
+        "TMint is counted twice."
+    ]
+    with pytest.raises(ValidationError):
+        normalize_count_data(["TMint"])
+
+
+@pytest.mark.django_db
+def test_every_write_is_checked():
+    family = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    event = Event.objects.create(
+        family=family, event_type=EventType.COUNT, count_data={"tmint": 2}
+    )
+    event.refresh_from_db()
+    assert event.count_data["TMint"] == 2
+    assert event.count_data["Sam"] == 0
+
+    with pytest.raises(ValidationError):
+        Event.objects.create(
+            family=family, event_type=EventType.COUNT, count_data={"TMint": -2}
+        )
+    with pytest.raises(ValidationError):
+        Event.objects.bulk_create(
+            [Event(family=family, event_type=EventType.COUNT, count_data={"X": 1})]
+        )
+    with pytest.raises(ValidationError):
+        Event.objects.update(count_data={"TMint": "lots"})
+    assert Event.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_saving_other_fields_of_a_legacy_row_skips_the_check():
+    family = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    event = Event.objects.create(family=family, event_type=EventType.COUNT)
+    # A row from before the check, with counts the backfill can't fix.
+    models.QuerySet(model=Event).filter(pk=event.pk).update(
+        count_data={"TMint": -1, "Savannah": 2}
+    )
+    event.refresh_from_db()
+
+    event.extra = {"note": "checked"}
+    event.save(update_fields=["extra"])
+    assert event.count_for_variety(CookieVariety.SAMOAS) == 0
+    with pytest.raises(ValidationError):
+        event.save()
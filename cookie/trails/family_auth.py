@@ -9,28 +9,43 @@ from .models import Family
 
 FAMILY_SESSION_KEY = "family_id"
 
+# The current family is looked up by the view, the context processor, and the
+# `requires_family` decorator on every request; remember it on the request so
+# that only the first of them touches the database.
+_FAMILY_CACHE_ATTR = "_cached_current_family"
+
 
 def get_current_family(request: HttpRequest) -> Family | None:
     """Get the currently logged-in family from the session, if any."""
+    if hasattr(request, _FAMILY_CACHE_ATTR):
+        return getattr(request, _FAMILY_CACHE_ATTR)
+
+    family: Family | None = None
     family_id = request.session.get(FAMILY_SESSION_KEY)
-    if family_id is None:
-        return None
-    try:
-        return Family.objects.get(pk=family_id)
-    except Family.DoesNotExist:
-        # Family was deleted; clear stale session
-        del request.session[FAMILY_SESSION_KEY]
-        return None
+    if family_id is not None:
+        try:
+            family = Family.objects.get(pk=family_id)
+        except Family.DoesNotExist:
+            # Family was deleted; clear stale session
+            del request.session[FAMILY_SESSION_KEY]
+    setattr(request, _FAMILY_CACHE_ATTR, family)
+    return family
 
 
 def set_current_family(request: HttpRequest, family: Family) -> None:
     """Set the current family in the session."""
-    request.session[FAMILY_SESSION_KEY] = family.pk
+    # Avoid marking the session as modified (and so re-saving it) when the
+    # same family signs in again.
+    if request.session.get(FAMILY_SESSION_KEY) != family.pk:
+        request.session[FAMILY_SESSION_KEY] = family.pk
+    setattr(request, _FAMILY_CACHE_ATTR, family)
 
 
 def clear_current_family(request: HttpRequest) -> None:
     """Clear the current family from the session."""
-    request.session.pop(FAMILY_SESSION_KEY, None)
+    if FAMILY_SESSION_KEY in request.session:
+        del request.session[FAMILY_SESSION_KEY]
+    setattr(request, _FAMILY_CACHE_ATTR, None)
 
 
 def requires_family(view_func: Any) -> Any:
@@ -0,0 +1,99 @@
+import pytest
+from django.contrib.sessions.backends.cache import SessionStore
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+
+from .family_auth import (
+    FAMILY_SESSION_KEY,
+    clear_current_family,
+    get_current_family,
+    set_current_family,
+)
+from .forms import FamilyLoginForm
+from .models import Family
+
+
+@pytest.fixture
+def request_with_session(rf):
+    request = rf.get("/")
+    request.session = SessionStore()
+    return request
+
+
+@pytest.mark.django_db
+def test_get_current_family_queries_once_per_request(
+    family, request_with_session, django_assert_num_queries
+):
+    request_with_session.session[FAMILY_SESSION_KEY] = family.pk
+    with django_assert_num_queries(1):
+        assert get_current_family(request_with_session) == family
+        assert get_current_family(request_with_session) == family
+
+
+@pytest.mark.django_db
+def test_get_current_family_without_session_skips_database(
+    request_with_session, django_assert_num_queries
+):
+    with django_assert_num_queries(0):
+        assert get_current_family(request_with_session) is None
+
+
+@pytest.mark.django_db
+def test_get_current_family_clears_stale_session(request_with_session):
+    request_with_session.session[FAMILY_SESSION_KEY] = 12345
+    assert get_current_family(request_with_session) is None
+    assert FAMILY_SESSION_KEY not in request_with_session.session
+
+
+@pytest.mark.django_db
+def test_set_current_family_does_not_rewrite_unchanged_session(
+    family, request_with_session
+):
+    request_with_session.session[FAMILY_SESSION_KEY] = family.pk
+    request_with_session.session.modified = False
+    set_current_family(request_with_session, family)
+    assert not request_with_session.session.modified
+
+
+@pytest.mark.django_db
+def test_clear_current_family(family, request_with_session):
+    set_current_family(request_with_session, family)
+    clear_current_family(request_with_session)
+    assert FAMILY_SESSION_KEY not in request_with_session.session
+    assert get_current_family(request_with_session) is None
+
+
+@pytest.mark.django_db
+def test_login_matches_email_case_insensitively_with_lower(family):
+    with CaptureQueriesContext(connection) as queries:
+        form = FamilyLoginForm({"email": " ADA@Example.com "})
+        assert form.is_valid()
+    assert form.family == family
+    # LOWER(), so that the functional unique index can serve the lookup.
+    assert "LOWER(" in queries.captured_queries[0]["sql"].upper()
+
+
+@pytest.mark.django_db
+def test_emails_differing_only_in_case_are_rejected(family):
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Family.objects.create(scout_name="Bea", email="ADA@example.com", grade=2)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migration_reports_existing_email_collisions():
+    before = [("trails", "0004_report")]
+    after = [("trails", "0005_family_email_lower_unique")]
+    executor = MigrationExecutor(connection)
+    executor.migrate(before)
+    OldFamily = executor.loader.project_state(before).apps.get_model("trails", "Family")
+    OldFamily.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    OldFamily.objects.create(scout_name="Bea", email="ADA@example.com", grade=2)
+
+    executor = MigrationExecutor(connection)
+    with pytest.raises(RuntimeError, match="ada@example.com: #"):
+        executor.migrate(after)
+
+    OldFamily.objects.filter(scout_name="Bea").update(email="bea@example.com")
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
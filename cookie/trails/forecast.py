@@ -0,0 +1,167 @@
+"""
+Stock-out forecasting from counts.
+
+A family's sales of a variety are read off its counts: between two counts it
+sold whatever it had on hand (the earlier count, plus pickups, minus
+returns) that the later count no longer shows. That gives each family and
+variety a series of (days since the family's first event, boxes sold so far)
+points, and the slope of a least-squares line through them is the family's
+sell-through rate.
+
+Every series is fitted in the same single pass over the season's ledger, by
+accumulating the handful of sums a least-squares slope needs, so the cost is
+one streamed read of the events however many families there are.
+
+Troop-wide, a variety runs out when the boxes families still have on hand,
+plus the troop's stock at its locations, are sold at their combined rate.
+Whatever the troop is expected to sell over the horizon beyond that stock is
+suggested as a reorder, in cases.
+
+Only the fit is cached, until events change: stock moves without any event
+(a delivery from the bakery, say), and the stock-out dates depend on the
+clock, so both are worked out afresh on every call.
+"""
+
+import itertools
+import math
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.db import models
+from django.utils import timezone
+
+from .cookies import CookieVariety, calculate_cases
+from .generations import EVENTS
+from .ledger import ledger_lines
+from .models import Event, EventType, current_season
+from .report_cache import generation_cached
+from .stock import troop_stock
+
+DEFAULT_HORIZON_DAYS = 14
+MAX_HORIZON_DAYS = 90
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+@dataclass
+class _Fit:
+    """Running sums for a least-squares line through (t, y) points."""
+
+    n: int = 0
+    st: float = 0.0
+    sy: float = 0.0
+    stt: float = 0.0
+    sty: float = 0.0
+
+    def add(self, t: float, y: float) -> None:
+        self.n += 1
+        self.st += t
+        self.sy += y
+        self.stt += t * t
+        self.sty += t * y
+
+    def slope(self) -> float:
+        denominator = self.n * self.stt - self.st * self.st
+        if self.n < 2 or denominator <= 0:
+            return 0.0
+        return (self.n * self.sty - self.st * self.sy) / denominator
+
+
+@dataclass(frozen=True)
+class VarietyForecast:
+    variety: CookieVariety
+    # Boxes families have on hand, as of their latest counts.
+    on_hand: int
+    # Boxes at the troop's locations, not yet picked up.
+    troop_stock: int
+    # Boxes sold per day, troop-wide.
+    rate: float
+    stockout_at: datetime | None
+    # Boxes the troop is expected to sell over the horizon beyond its stock.
+    shortfall: int
+    cases: int
+
+
+@dataclass(frozen=True)
+class Forecast:
+    as_of: datetime
+    horizon_days: int
+    families: int
+    varieties: list[VarietyForecast] = field(default_factory=list)
+
+
+def family_rates(
+    events: models.QuerySet[Event] | None = None,
+) -> tuple[dict[int, dict[str, float]], dict[str, int]]:
+    """Fit every family's sell-through rates, in boxes per day, in one pass.
+
+    Returns the rates by family and variety code, and the boxes on hand
+    across all families by variety code.
+    """
+    codes = [variety.value for variety in CookieVariety]
+    rates: dict[int, dict[str, float]] = {}
+    on_hand_total = dict.fromkeys(codes, 0)
+
+    lines = ledger_lines(events)
+    for family_id, family_lines in itertools.groupby(
+        lines, lambda line: line.family_id
+    ):
+        fits = {code: _Fit() for code in codes}
+        on_hand = dict.fromkeys(codes, 0)
+        sold = dict.fromkeys(codes, 0)
+        start = None
+        for line in family_lines:
+            if start is None:
+                start = line.created_at
+                for fit in fits.values():
+                    fit.add(0.0, 0.0)
+            if line.event_type == EventType.PICKUP:
+                on_hand = {code: on_hand[code] + line.boxes[code] for code in codes}
+            elif line.event_type == EventType.RETURN:
+                on_hand = {code: on_hand[code] - line.boxes[code] for code in codes}
+            elif line.event_type == EventType.COUNT:
+                days = (line.created_at - start).total_seconds() / SECONDS_PER_DAY
+                for code in codes:
+                    sold[code] += max(on_hand[code] - line.boxes[code], 0)
+                    fits[code].add(days, sold[code])
+                on_hand = dict(line.boxes)
+        rates[family_id] = {code: max(fit.slope(), 0.0) for code, fit in fits.items()}
+        for code in codes:
+            on_hand_total[code] += max(on_hand[code], 0)
+    return rates, on_hand_total
+
+
+@generation_cached(EVENTS)
+def season_rates(
+    season: int,
+) -> tuple[dict[int, dict[str, float]], dict[str, int]]:
+    """family_rates for a season's events; cached until the next write to events."""
+    return family_rates(Event.objects.filter(season=season))
+
+
+def troop_forecast(horizon_days: int = DEFAULT_HORIZON_DAYS) -> Forecast:
+    """Projected stock-out and suggested reorders for each variety.
+
+    Fits the current season's events, and counts the troop's stock as of now.
+    """
+    now = timezone.now()
+    rates, on_hand = season_rates(current_season())
+    in_stock = troop_stock()
+    varieties = []
+    for variety in CookieVariety:
+        rate = sum(family[variety.value] for family in rates.values())
+        stock = on_hand[variety.value] + in_stock[variety.value]
+        shortfall = max(math.ceil(rate * horizon_days) - stock, 0)
+        varieties.append(
+            VarietyForecast(
+                variety=variety,
+                on_hand=on_hand[variety.value],
+                troop_stock=in_stock[variety.value],
+                rate=rate,
+                stockout_at=now + timedelta(days=stock / rate) if rate else None,
+                shortfall=shortfall,
+                cases=calculate_cases({variety: shortfall})[variety],
+            )
+        )
+    return Forecast(
+        as_of=now, horizon_days=horizon_days, families=len(rates), varieties=varieties
+    )
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .forecast import family_rates, troop_forecast
+from .models import Event, EventType, Family, Location
+from .stock import transfer_stock
+
+
+def _event(family: Family, event_type: EventType, days_ago: float, **counts):
+    event = Event.objects.create(
+        family=family, event_type=event_type, count_data=counts
+    )
+    created_at = timezone.now() - timedelta(days=days_ago)
+    Event.objects.filter(pk=event.pk).update(created_at=created_at)
+    return event
+
+
+@pytest.fixture
+def selling_families():
+    ada = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    bea = Family.objects.create(scout_name="Bea", email="bea@example.com", grade=5)
+    # Ada sells 5 Thin Mints a day.
+    _event(ada, EventType.PICKUP, 4, TMint=24)
+    _event(ada, EventType.COUNT, 2, TMint=14)
+    _event(ada, EventType.COUNT, 0, TMint=4)
+    # Bea sells 3 a day, and restocks in between.
+    _event(bea, EventType.PICKUP, 4, TMint=12, Sam=6)
+    _event(bea, EventType.COUNT, 2, TMint=6, Sam=6)
+    _event(bea, EventType.PICKUP, 1, TMint=6)
+    _event(bea, EventType.COUNT, 0, TMint=6, Sam=6)
+    return ada, bea
+
+
+@pytest.mark.django_db
+def test_family_rates_fit_every_family_in_one_pass(
+    selling_families, django_assert_num_queries
+):
+    ada, bea = selling_families
+    with django_assert_num_queries(1):
+        rates, on_hand = family_rates()
+
+    assert rates[ada.pk]["TMint"] == pytest.approx(5.0)
+    assert rates[bea.pk]["TMint"] == pytest.approx(3.0)
+    assert rates[bea.pk]["Sam"] == 0
+    assert on_hand["TMint"] == 10
+    assert on_hand["Sam"] == 6
+
+
+@pytest.mark.django_db
+def test_troop_forecast_projects_stockout_and_reorders(selling_families):
+    forecast = troop_forecast(14)
+    by_code = {row.variety.value: row for row in forecast.varieties}
+
+    thin_mints = by_code["TMint"]
+    assert thin_mints.rate == pytest.approx(8.0)
+    days_left = (thin_mints.stockout_at - forecast.as_of) / timedelta(days=1)
+    assert days_left == pytest.approx(10 / 8)
+    # 14 days at 8 a day is 112 boxes; with 10 on hand, 102 more is 9 cases.
+    assert (thin_mints.shortfall, thin_mints.cases) == (102, 9)
+    assert by_code["Sam"].stockout_at is None
+    assert by_code["Sam"].cases == 0
+    assert forecast.families == 2
+
+
+@pytest.mark.django_db
+def test_troop_forecast_counts_troop_stock(selling_families):
+    transfer_stock(None, Location.objects.create(name="Cupboard"), {"TMint": 30})
+    forecast = troop_forecast(14)
+    thin_mints = {row.variety.value: row for row in forecast.varieties}["TMint"]
+
+    assert (thin_mints.on_hand, thin_mints.troop_stock) == (10, 30)
+    days_left = (thin_mints.stockout_at - forecast.as_of) / timedelta(days=1)
+    assert days_left == pytest.approx(40 / 8)
+    # 112 boxes over 14 days, less the 40 the troop has: 72 boxes, 6 cases.
+    assert (thin_mints.shortfall, thin_mints.cases) == (72, 6)
+
+
+@pytest.mark.django_db
+def test_troop_forecast_caches_only_the_fit(selling_families):
+    ada, _ = selling_families
+    troop_forecast(14)
+    cupboard = Location.objects.create(name="Cupboard")
+    transfer_stock(None, cupboard, {"TMint": 30})
+
+    with CaptureQueriesContext(connection) as queries:
+        second = troop_forecast(14)
+    assert not any("trails_event" in q["sql"] for q in queries)
+    # A delivery isn't an event, but still moves the stock-out date.
+    tmint = {row.variety.value: row for row in second.varieties}["TMint"]
+    assert tmint.troop_stock == 30
+
+    _event(ada, EventType.PICKUP, 0, TMint=12)
+    with CaptureQueriesContext(connection) as queries:
+        troop_forecast(14)
+    assert any("trails_event" in q["sql"] for q in queries)
+
+
+@pytest.mark.django_db
+def test_forecast_page(admin_client, selling_families, plain_static):
+    response = admin_client.get(reverse("forecast"), {"days": "7"})
+    assert response.status_code == 200
+    assert response.context["forecast"].horizon_days == 7
+    # 7 days at 8 a day, less the 10 on hand, is 46 boxes: 4 cases.
+    assert response.context["total_cases"] == 4
+    assert "Thin Mints" in response.content.decode()
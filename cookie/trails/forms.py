@@ -1,12 +1,19 @@
+import json
+
 from django import forms
+from django.db.models.functions import Lower
 
 from .cookies import COOKIE_COLORS, CookieVariety
-from .models import EventType, Family
+from .models import EventType, Family, Location
 
 
 class CookieCountForm(forms.Form):
     """Form for submitting cookie counts (used by families)."""
 
+    # Rendered fresh with each form, so that submitting the same form twice
+    # records one event; see `sync.record_event`.
+    idempotency_key = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         for variety in CookieVariety:
@@ -34,6 +41,24 @@ class PickupReturnEventForm(CookieCountForm):
             (EventType.RETURN, "Return (family → troop)"),
         ]
     )
+    location = forms.ModelChoiceField(queryset=Location.objects.all(), required=False)
+
+    def clean_location(self):
+        # Once the troop tracks stock by location, every pickup and return
+        # has to say where it happened.
+        location = self.cleaned_data["location"]
+        if location is None and Location.objects.exists():
+            raise forms.ValidationError("Choose the location for this event.")
+        return location
+
+
+class RosterImportForm(forms.Form):
+    """Form for staff to upload a roster of families."""
+
+    roster = forms.FileField(help_text="CSV, JSON or JSON Lines.")
+    dry_run = forms.BooleanField(
+        required=False, label="Preview the changes without saving them"
+    )
 
 
 class FamilyLoginForm(forms.Form):
@@ -44,9 +69,13 @@ class FamilyLoginForm(forms.Form):
     def clean_email(self):
         email = self.cleaned_data["email"].strip().lower()
         try:
-            self.family = Family.objects.get(email__iexact=email)
+            self.family = Family.objects.alias(email_lower=Lower("email")).get(
+                email_lower=email
+            )
         except Family.DoesNotExist:
-            raise forms.ValidationError("Email not found. Please try again.")
+            raise forms.ValidationError(
+                "Email not found. Please try again.", code="unknown_email"
+            )
         return email
 
 
@@ -59,8 +88,6 @@ class CookieCountWidget(forms.Widget):
         context = super().get_context(name, value, attrs)
         # Parse value if it's a string (from form submission)
         if isinstance(value, str):
-            import json
-
             try:
                 value = json.loads(value)
             except (json.JSONDecodeError, TypeError):
@@ -81,8 +108,6 @@ class CookieCountWidget(forms.Widget):
         return context
 
     def value_from_datadict(self, data, files, name):
-        import json
-
         result = {}
         for variety in CookieVariety:
             field_name = f"{name}_{variety.value}"
@@ -0,0 +1,61 @@
+"""
+Per-table change generations.
+
+Every write to a tracked table bumps that table's generation in the same
+transaction, so a reader can tell whether anything changed by reading one
+tiny row instead of the table itself. Saves and deletes bump it through
+signals; bulk writes, which send no signals, through GenerationQuerySet.
+Events are the exception: every write stamps its rows with next_generation,
+which bumps EVENTS on the way, so the API can sync them in commit order.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import ChangeGeneration, Event, Family
+
+EVENTS = "events"
+FAMILIES = "families"
+
+
+def generation_for(model: type) -> str | None:
+    """The generation a model's writes bump, if any."""
+    return {Event: EVENTS, Family: FAMILIES}.get(model)
+
+
+def bump_generation(name: str) -> None:
+    """Atomically increment a generation, creating it if needed."""
+    if ChangeGeneration.objects.filter(name=name).update(value=F("value") + 1):
+        return
+    try:
+        with transaction.atomic():
+            ChangeGeneration.objects.create(name=name, value=1)
+    except IntegrityError:
+        # Another writer created it first.
+        ChangeGeneration.objects.filter(name=name).update(value=F("value") + 1)
+
+
+def next_generation(name: str) -> int:
+    """Bump a generation and return its new value.
+
+    Call it inside the transaction that writes the rows it stamps. The bump
+    locks the generation's row until that transaction ends, so a later
+    writer waits for it and always gets a larger value: ordering rows by
+    their stamps orders them by commit.
+    """
+    bump_generation(name)
+    return ChangeGeneration.objects.values_list("value", flat=True).get(name=name)
+
+
+def get_generations(*names: str) -> dict[str, int]:
+    """Current generations for the given tables, with one query."""
+    values = dict(
+        ChangeGeneration.objects.filter(name__in=names).values_list("name", "value")
+    )
+    return {name: values.get(name, 0) for name in names}
+
+
+def generation_key(*names: str) -> str:
+    """A compact string that changes whenever any of the tables change."""
+    generations = get_generations(*names)
+    return "-".join(f"{name}.{generations[name]}" for name in names)
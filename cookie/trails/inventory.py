@@ -0,0 +1,103 @@
+"""
+Troop cookie holdings, computed in the database.
+
+A family's holdings are the troop-owned boxes in its custody: everything it
+has picked up from the troop inventory, minus everything it has returned.
+"""
+
+from django.db import models
+from django.db.models import Case, Sum, When
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce
+
+from .cookies import BOXES_PER_CASE, CookieVariety
+from .generations import EVENTS, FAMILIES
+from .models import CountUnit, Event, EventType, Family
+from .report_cache import generation_cached
+
+HOLDINGS_EVENT_TYPES = (EventType.PICKUP, EventType.RETURN)
+
+
+def _alias(variety: CookieVariety) -> str:
+    # Variety codes such as "D-S-D" aren't friendly SQL aliases.
+    return f"boxes_{variety.name.lower()}"
+
+
+def boxes_expression(variety: CookieVariety) -> models.Expression:
+    """The number of boxes of a variety in an event, as a SQL expression."""
+    count = Coalesce(Cast(KT(f"count_data__{variety.value}"), models.IntegerField()), 0)
+    return Case(
+        When(unit=CountUnit.CASE, then=count * BOXES_PER_CASE),
+        default=count,
+    )
+
+
+def _signed_holdings(variety: CookieVariety) -> models.Expression:
+    return Coalesce(
+        Sum(
+            Case(
+                When(event_type=EventType.PICKUP, then=boxes_expression(variety)),
+                When(event_type=EventType.RETURN, then=-boxes_expression(variety)),
+                default=0,
+            )
+        ),
+        0,
+    )
+
+
+def family_holdings(
+    family_ids: list[int] | None = None,
+    season: int | None = None,
+) -> dict[int, dict[str, int]]:
+    """Return troop-owned boxes held by each family, by variety code.
+
+    Families with no pickups or returns are omitted. With a season, only
+    that season's events count.
+    """
+    events = Event.objects.filter(event_type__in=HOLDINGS_EVENT_TYPES)
+    if family_ids is not None:
+        events = events.filter(family_id__in=family_ids)
+    if season is not None:
+        events = events.filter(season=season)
+    rows = (
+        events.order_by()
+        .values("family_id")
+        .annotate(**{_alias(v): _signed_holdings(v) for v in CookieVariety})
+    )
+    return {
+        row["family_id"]: {v.value: row[_alias(v)] for v in CookieVariety}
+        for row in rows
+    }
+
+
+def empty_holdings() -> dict[str, int]:
+    return {variety.value: 0 for variety in CookieVariety}
+
+
+@generation_cached(EVENTS, FAMILIES)
+def holdings_snapshot() -> list[dict]:
+    """Every family with its holdings, ordered by scout name."""
+    holdings = family_holdings()
+    return [
+        {
+            "family": family.pk,
+            "name": family.scout_name,
+            "holdings": holdings.get(family.pk, empty_holdings()),
+        }
+        for family in Family.objects.order_by("scout_name")
+    ]
+
+
+def holdings_for_family(family_id: int) -> dict:
+    """A single family's holdings, in the same shape as a snapshot row.
+
+    A family that no longer exists is reported with no name or holdings.
+    """
+    family = Family.objects.filter(pk=family_id).first()
+    if family is None:
+        return {"family": family_id, "name": None, "holdings": None}
+    return {
+        "family": family.pk,
+        "name": family.scout_name,
+        "holdings": family_holdings([family.pk]).get(family.pk, empty_holdings()),
+    }
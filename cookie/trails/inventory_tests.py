@@ -0,0 +1,40 @@
+import pytest
+
+from .cookies import CookieVariety
+from .inventory import family_holdings, holdings_for_family, holdings_snapshot
+from .models import CountUnit, Event, EventType, Family
+
+
+def _event(family, event_type, unit=CountUnit.BOX, **counts):
+    return Event.objects.create(
+        family=family, event_type=event_type, unit=unit, count_data=counts
+    )
+
+
+@pytest.mark.django_db
+def test_family_holdings_nets_pickups_and_returns(family):
+    _event(family, EventType.PICKUP, TMint=24, Sam=12)
+    _event(family, EventType.RETURN, TMint=6)
+    _event(family, EventType.PICKUP, unit=CountUnit.CASE, Tre=1)
+    # Counts and orders don't move troop inventory.
+    _event(family, EventType.COUNT, TMint=100)
+    _event(family, EventType.COOKIE_ORDER, TMint=100)
+
+    holdings = family_holdings()[family.pk]
+    assert holdings[CookieVariety.THIN_MINTS.value] == 18
+    assert holdings[CookieVariety.SAMOAS.value] == 12
+    assert holdings[CookieVariety.TREFOILS.value] == 12
+    assert holdings[CookieVariety.DO_SI_DOS.value] == 0
+
+
+@pytest.mark.django_db
+def test_holdings_snapshot_includes_families_without_events(family):
+    other = Family.objects.create(scout_name="Bea", email="bea@example.com", grade=2)
+    _event(family, EventType.PICKUP, Sam=3)
+
+    snapshot = holdings_snapshot()
+    assert [row["name"] for row in snapshot] == ["Ada", "Bea"]
+    assert snapshot[0]["holdings"]["Sam"] == 3
+    assert sum(snapshot[1]["holdings"].values()) == 0
+    assert holdings_for_family(other.pk)["holdings"]["Sam"] == 0
+    assert holdings_for_family(12345)["holdings"] is None
@@ -0,0 +1,256 @@
+"""
+Per-family ledger reconciliation.
+
+Walks every event in (family, created_at) order in a single pass, keeping
+only the current family's running totals in memory, and yields one ledger
+line per event. Memory stays flat however many events there are: the
+database streams rows through a server-side cursor where it supports one,
+and nothing is accumulated across families.
+
+For each family the ledger tracks two running balances per variety:
+
+- **holdings**: troop-owned boxes in the family's custody, i.e. pickups
+  minus returns. These should never go negative.
+- **expected**: what the next count should show if nothing were sold: the
+  previous count, plus pickups, minus returns. A count above the expected
+  figure means boxes appeared without a pickup.
+
+A single family's ledger can also be read a page at a time. Pages are
+fetched by keyset on the (family, created_at, id) index, and each page's
+cursor carries the balances as of its last line, so the next page picks up
+the running totals without re-reading anything before it.
+"""
+
+import csv
+import itertools
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.core import signing
+from django.db import models
+from django.db.models import Q
+
+from .cookies import BOXES_PER_CASE, CookieVariety
+from .models import CountUnit, Event, EventType
+
+LEDGER_CHUNK_SIZE = 2000
+LEDGER_PAGE_SIZE = 50
+
+
+class Anomaly(models.TextChoices):
+    NEGATIVE_HOLDINGS = "negative_holdings", "Holdings went negative"
+    NEGATIVE_COUNT = "negative_count", "Count reported a negative number"
+    COUNT_JUMP = "count_jump", "Count rose without a matching pickup"
+
+
+@dataclass
+class LedgerLine:
+    family_id: int
+    scout_name: str
+    event_id: int
+    created_at: datetime
+    event_type: str
+    boxes: dict[str, int]
+    holdings: dict[str, int]
+    # Only set for counts that follow an earlier count.
+    expected: dict[str, int] | None = None
+    gap: dict[str, int] | None = None
+    anomalies: list[Anomaly] = field(default_factory=list)
+
+
+def _no_boxes() -> dict[str, int]:
+    return {variety.value: 0 for variety in CookieVariety}
+
+
+@dataclass
+class LedgerState:
+    """A family's running balances after its latest ledger line."""
+
+    holdings: dict[str, int] = field(default_factory=_no_boxes)
+    expected: dict[str, int] | None = None
+
+
+_LEDGER_FIELDS = (
+    "family_id",
+    "family__scout_name",
+    "pk",
+    "created_at",
+    "event_type",
+    "unit",
+    "count_data",
+)
+
+
+def _boxes(unit: str, count_data: dict) -> dict[str, int]:
+    multiplier = BOXES_PER_CASE if unit == CountUnit.CASE else 1
+    return {
+        variety.value: int(count_data.get(variety.value) or 0) * multiplier
+        for variety in CookieVariety
+    }
+
+
+def reconcile_family(
+    rows: Iterable[tuple], state: LedgerState | None = None
+) -> Iterator[LedgerLine]:
+    """Yield ledger lines for one family's events, oldest first.
+
+    Starts from `state` if given (and keeps it up to date), or from nothing.
+    """
+    if state is None:
+        state = LedgerState()
+
+    for family_id, scout_name, pk, created_at, event_type, unit, count_data in rows:
+        boxes = _boxes(unit, count_data)
+        line = LedgerLine(
+            family_id=family_id,
+            scout_name=scout_name,
+            event_id=pk,
+            created_at=created_at,
+            event_type=event_type,
+            boxes=boxes,
+            holdings=state.holdings,
+        )
+
+        if event_type in (EventType.PICKUP, EventType.RETURN):
+            sign = 1 if event_type == EventType.PICKUP else -1
+            state.holdings = {
+                code: state.holdings[code] + sign * boxes[code] for code in boxes
+            }
+            if state.expected is not None:
+                state.expected = {
+                    code: state.expected[code] + sign * boxes[code] for code in boxes
+                }
+            line.holdings = state.holdings
+            if any(count < 0 for count in state.holdings.values()):
+                line.anomalies.append(Anomaly.NEGATIVE_HOLDINGS)
+
+        elif event_type == EventType.COUNT:
+            if any(count < 0 for count in boxes.values()):
+                line.anomalies.append(Anomaly.NEGATIVE_COUNT)
+            if state.expected is not None:
+                line.expected = state.expected
+                line.gap = {code: boxes[code] - state.expected[code] for code in boxes}
+                if any(gap > 0 for gap in line.gap.values()):
+                    line.anomalies.append(Anomaly.COUNT_JUMP)
+            state.expected = boxes
+
+        yield line
+
+
+def ledger_lines(
+    events: models.QuerySet[Event] | None = None,
+    *,
+    chunk_size: int = LEDGER_CHUNK_SIZE,
+) -> Iterator[LedgerLine]:
+    """Yield ledger lines for every family, one family at a time."""
+    if events is None:
+        events = Event.objects.all()
+    rows = (
+        events.order_by("family_id", "created_at", "pk")
+        .values_list(*_LEDGER_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for _, family_rows in itertools.groupby(rows, key=lambda row: row[0]):
+        yield from reconcile_family(family_rows)
+
+
+@dataclass
+class LedgerPage:
+    lines: list[LedgerLine]
+    # Asks for the following page; None on the last one.
+    next_cursor: str | None = None
+
+
+def _cursor_salt(family_id: int) -> str:
+    # A cursor only works for the family it was issued for.
+    return f"trails.ledger.{family_id}"
+
+
+def family_ledger_page(
+    family_id: int,
+    cursor: str | None = None,
+    *,
+    page_size: int = LEDGER_PAGE_SIZE,
+) -> LedgerPage:
+    """One page of a family's ledger, oldest first.
+
+    Raises signing.BadSignature for a cursor that wasn't issued by this
+    function for this family.
+    """
+    events = Event.objects.filter(family_id=family_id)
+    state = LedgerState()
+    if cursor:
+        data = signing.loads(cursor, salt=_cursor_salt(family_id))
+        created_at = datetime.fromisoformat(data["created_at"])
+        events = events.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=data["pk"])
+        )
+        state = LedgerState(
+            holdings={**_no_boxes(), **data["holdings"]},
+            expected={**_no_boxes(), **data["expected"]} if data["expected"] else None,
+        )
+    rows = list(
+        events.order_by("created_at", "pk").values_list(*_LEDGER_FIELDS)[
+            : page_size + 1
+        ]
+    )
+    page = LedgerPage(lines=list(reconcile_family(rows[:page_size], state)))
+    if len(rows) > page_size:
+        last = page.lines[-1]
+        page.next_cursor = signing.dumps(
+            {
+                "created_at": last.created_at.isoformat(),
+                "pk": last.event_id,
+                "holdings": state.holdings,
+                "expected": state.expected,
+            },
+            salt=_cursor_salt(family_id),
+            compress=True,
+        )
+    return page
+
+
+def ledger_csv_header() -> list[str]:
+    codes = [variety.value for variety in CookieVariety]
+    return [
+        "Family ID",
+        "Scout Name",
+        "Event ID",
+        "Created At",
+        "Event Type",
+        *codes,
+        *(f"Holdings {code}" for code in codes),
+        *(f"Gap {code}" for code in codes),
+        "Anomalies",
+    ]
+
+
+def ledger_csv_row(line: LedgerLine) -> list:
+    codes = [variety.value for variety in CookieVariety]
+    return [
+        line.family_id,
+        line.scout_name,
+        line.event_id,
+        line.created_at.isoformat(),
+        line.event_type,
+        *(line.boxes[code] for code in codes),
+        *(line.holdings[code] for code in codes),
+        *(line.gap[code] if line.gap else "" for code in codes),
+        " ".join(line.anomalies),
+    ]
+
+
+class _Echo:
+    """A file-like object that hands back what is written to it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def ledger_csv(lines: Iterable[LedgerLine]) -> Iterator[str]:
+    """Render ledger lines as CSV, one string per row, for streaming."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ledger_csv_header())
+    for line in lines:
+        yield writer.writerow(ledger_csv_row(line))
@@ -0,0 +1,213 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core import signing
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.urls import reverse
+
+from . import views
+from .ledger import (
+    LEDGER_PAGE_SIZE,
+    Anomaly,
+    family_ledger_page,
+    ledger_csv,
+    ledger_lines,
+)
+from .models import Event, EventType, Family
+
+
+@pytest.fixture
+def families():
+    return [
+        Family.objects.create(scout_name=name, email=f"{name}@example.com", grade=3)
+        for name in ("ada", "bea")
+    ]
+
+
+def _event(family, event_type, **counts):
+    return Event.objects.create(family=family, event_type=event_type, count_data=counts)
+
+
+@pytest.mark.django_db
+def test_ledger_running_balances_and_gaps(families):
+    ada, bea = families
+    _event(ada, EventType.COUNT, TMint=10)
+    _event(bea, EventType.PICKUP, Sam=5)
+    _event(ada, EventType.PICKUP, TMint=12)
+    _event(ada, EventType.RETURN, TMint=2)
+    _event(ada, EventType.COUNT, TMint=15)
+
+    lines = list(ledger_lines())
+    assert [(line.family_id, line.event_type) for line in lines] == [
+        (ada.pk, EventType.COUNT),
+        (ada.pk, EventType.PICKUP),
+        (ada.pk, EventType.RETURN),
+        (ada.pk, EventType.COUNT),
+        (bea.pk, EventType.PICKUP),
+    ]
+    first_count, _, ret, second_count, bea_pickup = lines
+    assert first_count.expected is None
+    assert ret.holdings["TMint"] == 10
+    # 10 counted + 12 picked up - 2 returned = 20 expected; 5 were sold.
+    assert second_count.expected["TMint"] == 20
+    assert second_count.gap["TMint"] == -5
+    assert not any(line.anomalies for line in lines)
+    assert bea_pickup.holdings["Sam"] == 5
+
+
+@pytest.mark.django_db
+def test_ledger_flags_anomalies(families):
+    ada, _ = families
+    _event(ada, EventType.COUNT, Tre=3)
+    _event(ada, EventType.RETURN, Tre=1)
+    _event(ada, EventType.COUNT, Tre=7)
+
+    _, ret, jump = ledger_lines()
+    assert ret.anomalies == [Anomaly.NEGATIVE_HOLDINGS]
+    assert jump.anomalies == [Anomaly.COUNT_JUMP]
+    assert jump.gap["Tre"] == 5
+
+
+@pytest.mark.django_db
+def test_ledger_csv_and_command(families, tmp_path):
+    ada, _ = families
+    _event(ada, EventType.RETURN, Tre=1)
+
+    rows = list(ledger_csv(ledger_lines()))
+    assert rows[0].startswith("Family ID,Scout Name")
+    assert rows[1].rstrip().endswith(Anomaly.NEGATIVE_HOLDINGS)
+
+    output = tmp_path / "ledger.csv"
+    call_command("reconcile", output=str(output), anomalies_only=True)
+    assert output.read_text().splitlines()[1:] == [rows[1].rstrip()]
+
+
+def _walk(family, page_size):
+    lines, cursor = [], None
+    while True:
+        page = family_ledger_page(family.pk, cursor, page_size=page_size)
+        lines += page.lines
+        cursor = page.next_cursor
+        if cursor is None:
+            return lines
+
+
+@pytest.mark.django_db
+def test_family_ledger_pages_carry_running_balances(families):
+    ada, bea = families
+    _event(ada, EventType.PICKUP, TMint=12)
+    _event(bea, EventType.PICKUP, Sam=5)
+    _event(ada, EventType.COUNT, TMint=10)
+    _event(ada, EventType.PICKUP, TMint=6)
+    _event(ada, EventType.RETURN, TMint=2)
+    _event(ada, EventType.COUNT, TMint=17)
+    _event(ada, EventType.RETURN, TMint=20)
+    # Ties on created_at are broken by id.
+    first = Event.objects.filter(family=ada).earliest("created_at")
+    Event.objects.filter(family=ada, event_type=EventType.PICKUP).update(
+        created_at=first.created_at
+    )
+
+    expected = [line for line in ledger_lines() if line.family_id == ada.pk]
+    for page_size in (1, 2, 4, 50):
+        lines = _walk(ada, page_size)
+        assert [line.event_id for line in lines] == [line.event_id for line in expected]
+        assert [line.holdings for line in lines] == [line.holdings for line in expected]
+        assert [line.gap for line in lines] == [line.gap for line in expected]
+        assert [line.anomalies for line in lines] == [
+            line.anomalies for line in expected
+        ]
+
+
+@pytest.mark.django_db
+def test_family_ledger_page_is_one_query(families, django_assert_num_queries):
+    ada, _ = families
+    for _ in range(30):
+        _event(ada, EventType.PICKUP, Tre=1)
+    cursor = family_ledger_page(ada.pk, page_size=25).next_cursor
+    with django_assert_num_queries(1):
+        page = family_ledger_page(ada.pk, cursor, page_size=25)
+    assert len(page.lines) == 5
+    assert page.lines[-1].holdings["Tre"] == 30
+    assert page.next_cursor is None
+
+
+@pytest.mark.django_db
+def test_family_ledger_cursor_only_works_for_its_family(families):
+    ada, bea = families
+    _event(ada, EventType.PICKUP, Tre=1)
+    _event(ada, EventType.PICKUP, Tre=1)
+    cursor = family_ledger_page(ada.pk, page_size=1).next_cursor
+    with pytest.raises(signing.BadSignature):
+        family_ledger_page(bea.pk, cursor)
+
+
+@pytest.mark.django_db
+def test_family_ledger_view(admin_client, families, plain_static):
+    ada, _ = families
+    for _ in range(3):
+        _event(ada, EventType.PICKUP, Tre=2)
+    url = reverse("family_ledger", args=[ada.pk])
+
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    assert len(response.context["rows"]) == 3
+    assert response.context["rows"][-1]["holding"] == 6
+
+    response = admin_client.get(url, HTTP_HX_REQUEST="true")
+    assert "<html" not in response.content.decode()
+
+    assert admin_client.get(url, {"cursor": "bogus"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_family_ledger_view_loads_the_next_page_when_revealed(admin_client, families):
+    ada, _ = families
+    Event.objects.bulk_create(
+        Event(family=ada, event_type=EventType.COUNT, count_data={"Tre": 2})
+        for _ in range(LEDGER_PAGE_SIZE + 1)
+    )
+    url = reverse("family_ledger", args=[ada.pk])
+
+    response = admin_client.get(url, HTTP_HX_REQUEST="true")
+    cursor = response.context["next_cursor"]
+    assert len(response.context["rows"]) == LEDGER_PAGE_SIZE
+    assert 'hx-trigger="revealed"' in response.content.decode()
+
+    response = admin_client.get(url, {"cursor": cursor}, HTTP_HX_REQUEST="true")
+    assert len(response.context["rows"]) == 1
+    assert response.context["next_cursor"] is None
+
+
+@pytest.mark.django_db
+def test_reconciliation_csv_streams_in_batches_under_asgi(
+    admin_user, families, monkeypatch
+):
+    ada, _ = families
+    Event.objects.bulk_create(
+        Event(family=ada, event_type=EventType.COUNT, count_data={"Tre": 1})
+        for _ in range(250)
+    )
+    pulled = []
+
+    def counted_lines():
+        for line in ledger_lines():
+            pulled.append(line)
+            yield line
+
+    monkeypatch.setattr(views, "ledger_lines", counted_lines)
+
+    async def download():
+        client = AsyncClient()
+        await client.aforce_login(admin_user)
+        response = await client.get(reverse("reconciliation_csv"))
+        content = response.streaming_content
+        chunks = [await anext(content)]
+        pulled_at_first_chunk = len(pulled)
+        chunks += [chunk async for chunk in content]
+        return chunks, pulled_at_first_chunk
+
+    chunks, pulled_at_first_chunk = async_to_sync(download)()
+    assert chunks[0].startswith(b"Family ID")
+    assert 0 < pulled_at_first_chunk < 250
+    assert len(chunks) == 251
@@ -0,0 +1,291 @@
+"""
+A distribution-day load test, run against a live server over HTTP.
+
+Simulates the peak we plan for: families logging in and submitting their
+counts, cupboard managers entering pickups and returns, and someone pulling
+the reconciliation export, all at once. Each scenario runs in its own pool of
+threads until time is up; every pass through a scenario is timed end to end,
+and the results are reported per scenario as throughput, error rate and
+latency percentiles.
+
+The server needs the accounts made by `manage.py seed_loadtest`, and
+FAMILY_LOGIN_RATE_LIMIT turned off: every simulated family signs in from
+the same address. Run the harness itself with `manage.py loadtest`.
+"""
+
+import http.cookiejar
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from django.urls import reverse
+
+from .cookies import CookieVariety
+
+LOADTEST_EMAIL_DOMAIN = "loadtest.example.com"
+LOADTEST_STAFF_USERNAME = "loadtest"
+LOADTEST_LOCATION_NAME = "Load Test Cupboard"
+# Boxes of each variety the seeded location starts a run with.
+LOADTEST_STOCK_BOXES = 100_000
+
+_HIDDEN_KEY = re.compile(r'name="idempotency_key" value="([^"]+)"')
+_OPTION = re.compile(r'<option value="(\d+)"')
+
+
+def loadtest_email(number: int) -> str:
+    return f"family{number:03d}@{LOADTEST_EMAIL_DOMAIN}"
+
+
+class ScenarioFailure(Exception):
+    pass
+
+
+class Session:
+    """One simulated browser: a cookie jar and a CSRF token."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies)
+        )
+
+    def _csrf_token(self) -> str:
+        for cookie in self.cookies:
+            if cookie.name == "csrftoken":
+                return cookie.value or ""
+        return ""
+
+    def request(self, path: str, data: dict | None = None) -> tuple[str, str]:
+        """GET (or, with data, POST) a page, following redirects.
+
+        Returns the final URL and the body. Anything but a 2xx is a failure.
+        """
+        url = self.base_url + path
+        body = None
+        headers = {}
+        if data is not None:
+            body = urllib.parse.urlencode(
+                {**data, "csrfmiddlewaretoken": self._csrf_token()}
+            ).encode()
+            headers["Referer"] = url
+        request = urllib.request.Request(url, data=body, headers=headers)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.geturl(), response.read().decode()
+        except urllib.error.HTTPError as e:
+            raise ScenarioFailure(f"{e.code} from {path}") from e
+        except OSError as e:
+            raise ScenarioFailure(f"{type(e).__name__} from {path}: {e}") from e
+
+
+def _random_counts() -> dict[str, int]:
+    return {f"count_{v.value}": random.randint(0, 12) for v in CookieVariety}
+
+
+def family_count(session: Session, email: str) -> None:
+    """A family logs in, submits a count, and lands on its success page."""
+    login = reverse("family_login")
+    session.request(login)
+    session.request(login, {"email": email, "next": reverse("home")})
+    _, page = session.request(reverse("count"))
+    key = _HIDDEN_KEY.search(page)
+    if key is None:
+        raise ScenarioFailure("Count page has no idempotency key (not logged in?)")
+    url, _ = session.request(
+        reverse("count"), {"idempotency_key": key.group(1), **_random_counts()}
+    )
+    if "/success/" not in url:
+        raise ScenarioFailure(f"Count post ended at {url}")
+
+
+def staff_login(session: Session, username: str, password: str) -> None:
+    login = reverse("admin:login")
+    session.request(login)
+    url, _ = session.request(
+        login,
+        {"username": username, "password": password, "next": reverse("admin:index")},
+    )
+    if url.endswith(login):
+        raise ScenarioFailure(f"Staff login failed for {username}")
+
+
+def _options(page: str, name: str) -> list[str]:
+    """The values offered by a page's <select name=...>."""
+    select = re.search(rf'<select name="{name}"[^>]*>(.*?)</select>', page, re.S)
+    return _OPTION.findall(select.group(1)) if select else []
+
+
+def staff_pickup(session: Session) -> None:
+    """A cupboard manager records a pickup or return for some family."""
+    _, page = session.request(reverse("pickup_return_event"))
+    key = _HIDDEN_KEY.search(page)
+    families = _options(page, "family")
+    if key is None or not families:
+        raise ScenarioFailure("Pickup page has no families (not logged in?)")
+    data = {
+        "idempotency_key": key.group(1),
+        "family": random.choice(families),
+        "event_type": random.choice(["pickup", "return"]),
+        **_random_counts(),
+    }
+    # Once a troop tracks stock, every pickup and return names a location.
+    if locations := _options(page, "location"):
+        data["location"] = random.choice(locations)
+    url, _ = session.request(reverse("pickup_return_event"), data)
+    if "/success/" not in url:
+        raise ScenarioFailure(f"Pickup post ended at {url}")
+
+
+def csv_export(session: Session) -> None:
+    """Download the full reconciliation export."""
+    session.request(reverse("reconciliation_csv"))
+
+
+def percentile(values: list[float], p: float) -> float:
+    """The nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    rank = math.ceil(p / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+@dataclass
+class ScenarioReport:
+    name: str
+    # Wall-clock seconds the scenario ran for.
+    elapsed: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def runs(self) -> int:
+        return len(self.latencies) + len(self.errors)
+
+    @property
+    def throughput(self) -> float:
+        """Successful runs per second."""
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def rate_limited(self) -> bool:
+        """Whether the server turned any requests away as too many."""
+        return any(error.startswith("429 ") for error in self.errors)
+
+    @property
+    def error_rate(self) -> float:
+        return len(self.errors) / self.runs if self.runs else 0.0
+
+    def percentile(self, p: float) -> float:
+        return percentile(sorted(self.latencies), p)
+
+    def summary(self) -> str:
+        return (
+            f"{self.name:<14} {self.runs:>6} runs {self.throughput:>7.2f}/s "
+            f"{self.error_rate:>6.1%} errors  "
+            f"p50 {self.percentile(50) * 1000:>6.0f}ms  "
+            f"p95 {self.percentile(95) * 1000:>6.0f}ms  "
+            f"p99 {self.percentile(99) * 1000:>6.0f}ms"
+        )
+
+
+class _Run:
+    """State shared by a run's workers.
+
+    Workers log in first, then wait at a starting line, so the clock only
+    starts once every session is ready and slow logins don't eat into it.
+    """
+
+    def __init__(self, workers: int, duration: float):
+        self.lock = threading.Lock()
+        self.duration = duration
+        self.started = self.deadline = 0.0
+        self.starting_line = threading.Barrier(workers, action=self._start)
+
+    def _start(self) -> None:
+        self.started = time.monotonic()
+        self.deadline = self.started + self.duration
+
+
+def _run_worker(
+    run: _Run,
+    report: ScenarioReport,
+    start: Callable[[], Session],
+    scenario: Callable[[Session], None],
+) -> None:
+    session = None
+    try:
+        session = start()
+    except ScenarioFailure as e:
+        with run.lock:
+            report.errors.append(str(e))
+    finally:
+        run.starting_line.wait()
+    if session is None:
+        return
+    while time.monotonic() < run.deadline:
+        began = time.perf_counter()
+        try:
+            scenario(session)
+        except ScenarioFailure as e:
+            with run.lock:
+                report.errors.append(str(e))
+        else:
+            with run.lock:
+                report.latencies.append(time.perf_counter() - began)
+
+
+def run_load_test(
+    base_url: str,
+    *,
+    duration: float = 60.0,
+    families: int = 50,
+    staff: int = 3,
+    exports: int = 1,
+    staff_password: str,
+) -> list[ScenarioReport]:
+    """Run every scenario concurrently for `duration` seconds."""
+    reports = {
+        name: ScenarioReport(name)
+        for name in ("family count", "staff pickup", "csv export")
+    }
+
+    def staff_session() -> Session:
+        session = Session(base_url)
+        staff_login(session, LOADTEST_STAFF_USERNAME, staff_password)
+        return session
+
+    workers = []
+    for number in range(1, families + 1):
+        email = loadtest_email(number)
+        workers.append(
+            (
+                reports["family count"],
+                lambda: Session(base_url),
+                lambda session, email=email: family_count(session, email),
+            )
+        )
+    workers += [(reports["staff pickup"], staff_session, staff_pickup)] * staff
+    workers += [(reports["csv export"], staff_session, csv_export)] * exports
+
+    run = _Run(len(workers), duration)
+    threads = [
+        threading.Thread(target=_run_worker, args=(run, *work)) for work in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The last runs finish a little after the deadline.
+    elapsed = time.monotonic() - run.started
+    for report in reports.values():
+        report.elapsed = elapsed
+    return [report for report in reports.values() if report.runs]
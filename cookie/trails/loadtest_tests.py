@@ -0,0 +1,82 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from .loadtest import ScenarioReport, percentile, run_load_test
+from .models import Event, EventType, Family
+from .ratelimit import FAMILY_LOGIN_PER_IP
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([0.2], 99) == 0.2
+    assert percentile([], 50) == 0
+
+
+def test_scenario_report_rates():
+    report = ScenarioReport("x", elapsed=2.0, latencies=[0.1, 0.3, 0.2])
+    report.errors.append("500 from /")
+    assert report.runs == 4
+    assert report.throughput == 1.5
+    assert report.error_rate == 0.25
+    assert report.percentile(50) == 0.2
+
+
+@pytest.mark.django_db
+def test_seed_loadtest_requires_debug():
+    with pytest.raises(CommandError):
+        call_command("seed_loadtest")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_runs_every_scenario(live_server, settings, plain_static):
+    settings.DEBUG = True
+    call_command("seed_loadtest", families=3, password="pw", stdout=StringIO())
+    settings.DEBUG = False
+    # Every simulated family signs in from the same address.
+    settings.FAMILY_LOGIN_RATE_LIMIT = False
+    assert Family.objects.count() == 3
+
+    reports = run_load_test(
+        live_server.url,
+        duration=1.0,
+        families=3,
+        staff=1,
+        exports=1,
+        staff_password="pw",
+    )
+
+    by_name = {report.name: report for report in reports}
+    assert set(by_name) == {"family count", "staff pickup", "csv export"}
+    for report in reports:
+        assert report.errors == []
+        assert report.runs > 0
+    assert Event.objects.filter(event_type=EventType.COUNT).exists()
+    # Seeding added a location, so every pickup and return had to name it.
+    assert Event.objects.exclude(event_type=EventType.COUNT).exists()
+    assert not Event.objects.exclude(event_type=EventType.COUNT).filter(location=None)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_refuses_a_rate_limited_server(live_server, settings, plain_static):
+    settings.DEBUG = True
+    call_command("seed_loadtest", families=1, password="pw", stdout=StringIO())
+    settings.DEBUG = False
+    while not FAMILY_LOGIN_PER_IP.take("127.0.0.1"):
+        pass
+
+    with pytest.raises(CommandError, match="FAMILY_LOGIN_RATE_LIMIT=False"):
+        call_command(
+            "loadtest",
+            url=live_server.url,
+            duration=0.5,
+            families=1,
+            staff=0,
+            exports=0,
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
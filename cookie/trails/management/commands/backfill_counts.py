@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cookie.trails.backfill import (
+    BACKFILL_BATCH_SIZE,
+    BACKFILL_WORKERS,
+    BackfillResult,
+    backfill_counts,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every event's counts against the current varieties, fix what "
+        "can be fixed, and list what can't."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--resume-after",
+            type=int,
+            default=0,
+            help="Skip events up to this id, as printed by an interrupted run.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BACKFILL_BATCH_SIZE,
+            help="Event ids per batch.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=BACKFILL_WORKERS,
+            help="Batches to work on at once.",
+        )
+        parser.add_argument(
+            "--drop-unknown",
+            action="store_true",
+            help="Discard counts for varieties that no longer exist.",
+        )
+
+    def handle(self, *args, **options):
+        last = BackfillResult(checkpoint=options["resume_after"])
+
+        def progress(result: BackfillResult) -> None:
+            nonlocal last
+            last = result
+            if options["verbosity"] > 1:
+                self.stderr.write(f"Checked events up to id {result.checkpoint}.")
+
+        try:
+            result = backfill_counts(
+                start_after=options["resume_after"],
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                drop_unknown=options["drop_unknown"],
+                progress=progress,
+            )
+        except Exception as e:
+            raise CommandError(
+                f"Stopped after id {last.checkpoint} ({e}). "
+                f"Resume with --resume-after {last.checkpoint}."
+            ) from e
+
+        for event_id, problems in sorted(result.flagged.items()):
+            self.stdout.write(f"Event {event_id}: {' '.join(problems)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {result.scanned} events: fixed {result.fixed}, "
+                f"{len(result.flagged)} need fixing by hand."
+            )
+        )
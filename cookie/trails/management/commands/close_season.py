@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cookie.trails.seasons import SeasonError, close_season
+
+
+class Command(BaseCommand):
+    help = (
+        "Close out a finished cookie season: snapshot every family's final "
+        "balances, then move the season's events to the archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("season", type=int, help="The season (year) to close.")
+        parser.add_argument(
+            "--compact",
+            action="store_true",
+            help="Drop the season's events instead of archiving them.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = close_season(options["season"], compact=options["compact"])
+        except SeasonError as e:
+            raise CommandError(str(e)) from e
+
+        verb = "Dropped" if result.compacted else "Archived"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Closed season {result.season}: balances for {result.families} "
+                f"families. {verb} {result.events} events."
+            )
+        )
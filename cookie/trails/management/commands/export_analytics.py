@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from cookie.trails.analytics import write_analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a consistent snapshot of a season's families, events, orders "
+        "and balances to a standalone SQLite file for offline analysis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="The file to write, e.g. season.sqlite3.")
+        parser.add_argument(
+            "--season",
+            type=int,
+            help="The season (year) to export. Defaults to the current season.",
+        )
+
+    def handle(self, *args, **options):
+        snapshot = write_analytics(options["output"], season=options["season"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote season {snapshot.season} to {options['output']}: "
+                f"{snapshot.families} families, {snapshot.events} events."
+            )
+        )
@@ -0,0 +1,45 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cookie.trails.roster import import_roster, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Add and update families from a roster CSV, JSON or JSON Lines file, "
+        "matching on email. Families not in the roster are left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The roster file to import.")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without saving anything.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as f:
+                diff = import_roster(read_records(f, path), dry_run=options["dry_run"])
+        except OSError as e:
+            raise CommandError(str(e)) from e
+        except (csv.Error, json.JSONDecodeError, UnicodeDecodeError, TypeError) as e:
+            raise CommandError(f"Couldn't read {path} as a roster: {e}") from e
+
+        for row in diff.added:
+            self.stdout.write(f"+ {row.scout_name} (grade {row.grade}) <{row.email}>")
+        for change in diff.changed:
+            fields = ", ".join(
+                f"{name}: {old!r} -> {new!r}"
+                for name, (old, new) in change.changes.items()
+            )
+            self.stdout.write(f"~ {change.row.scout_name}: {fields}")
+        for error in diff.errors:
+            self.stderr.write(error)
+
+        prefix = "Dry run: " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{diff.summary()}."))
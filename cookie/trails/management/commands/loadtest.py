@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cookie.trails.loadtest import run_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a running server with distribution-day traffic: families "
+        "submitting counts, staff entering pickups, and CSV exports. Seed the "
+        "server's database with seed_loadtest first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://127.0.0.1:8000",
+            help="The server to test (default http://127.0.0.1:8000).",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=60.0, help="Seconds to run for."
+        )
+        parser.add_argument(
+            "--families", type=int, default=50, help="Concurrent families."
+        )
+        parser.add_argument(
+            "--staff", type=int, default=3, help="Concurrent pickup/return entry."
+        )
+        parser.add_argument(
+            "--exports", type=int, default=1, help="Concurrent CSV downloads."
+        )
+        parser.add_argument(
+            "--password",
+            default="loadtest",
+            help="Password of the seeded staff account.",
+        )
+        parser.add_argument(
+            "--max-error-rate",
+            type=float,
+            default=None,
+            help="Fail if any scenario's error rate (0-1) is higher.",
+        )
+        parser.add_argument(
+            "--max-p95",
+            type=float,
+            default=None,
+            help="Fail if any scenario's p95 latency, in seconds, is higher.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Running {options['families']} families, {options['staff']} staff "
+            f"and {options['exports']} exports against {options['url']} "
+            f"for {options['duration']:g}s..."
+        )
+        reports = run_load_test(
+            options["url"],
+            duration=options["duration"],
+            families=options["families"],
+            staff=options["staff"],
+            exports=options["exports"],
+            staff_password=options["password"],
+        )
+
+        failures = []
+        for report in reports:
+            self.stdout.write(report.summary())
+            for error in sorted(set(report.errors))[:5]:
+                self.stderr.write(f"  {error}")
+            max_error_rate = options["max_error_rate"]
+            if max_error_rate is not None and report.error_rate > max_error_rate:
+                failures.append(f"{report.name} error rate {report.error_rate:.1%}")
+            max_p95 = options["max_p95"]
+            if max_p95 is not None and report.percentile(95) > max_p95:
+                failures.append(f"{report.name} p95 {report.percentile(95):.3f}s")
+        if any(report.rate_limited for report in reports):
+            raise CommandError(
+                "The server turned sign-ins away (429), so these figures don't "
+                "mean much. Every simulated family signs in from this one "
+                "address: restart the server with FAMILY_LOGIN_RATE_LIMIT=False "
+                "(just loadtest_server) and run again."
+            )
+        if failures:
+            raise CommandError("Over budget: " + "; ".join(failures))
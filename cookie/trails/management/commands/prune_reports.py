@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cookie.trails.reports import prune_expired_reports
+
+
+class Command(BaseCommand):
+    help = "Delete generated reports that have passed their expiry date."
+
+    def handle(self, *args, **options):
+        deleted = prune_expired_reports()
+        self.stdout.write(f"Deleted {deleted} expired reports.")
@@ -0,0 +1,52 @@
+import sys
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from cookie.trails.ledger import ledger_csv, ledger_lines
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile every family's ledger of pickups, returns and counts, "
+        "writing one CSV row per event."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            "-o",
+            help="Write the report to this file instead of stdout.",
+        )
+        parser.add_argument(
+            "--anomalies-only",
+            action="store_true",
+            help="Only include events that were flagged as anomalies.",
+        )
+
+    def handle(self, *args, **options):
+        families: set[int] = set()
+        events = 0
+        anomalies: Counter[str] = Counter()
+
+        def tally(lines):
+            nonlocal events
+            for line in lines:
+                families.add(line.family_id)
+                events += 1
+                anomalies.update(line.anomalies)
+                if line.anomalies or not options["anomalies_only"]:
+                    yield line
+
+        rows = ledger_csv(tally(ledger_lines()))
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                f.writelines(rows)
+        else:
+            sys.stdout.writelines(rows)
+
+        summary = ", ".join(f"{count} {name}" for name, count in anomalies.items())
+        self.stderr.write(
+            f"Reconciled {events} events for {len(families)} families; "
+            f"anomalies: {summary or 'none'}."
+        )
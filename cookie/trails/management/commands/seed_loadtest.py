@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cookie.trails.cookies import CookieVariety
+from cookie.trails.loadtest import (
+    LOADTEST_LOCATION_NAME,
+    LOADTEST_STAFF_USERNAME,
+    LOADTEST_STOCK_BOXES,
+    loadtest_email,
+)
+from cookie.trails.models import Family, Location
+from cookie.trails.stock import stock_at, transfer_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Add the families and staff account the load test logs in as, and a "
+        "well-stocked location for its pickups. Only for local databases: the "
+        "staff password is not a secret."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--families",
+            type=int,
+            default=60,
+            help="How many load-test families to have (default 60).",
+        )
+        parser.add_argument(
+            "--password",
+            default="loadtest",
+            help="Password for the load-test staff account.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError("Refusing to seed load-test accounts without DEBUG.")
+
+        Family.objects.bulk_create(
+            [
+                Family(
+                    scout_name=f"Load Test {number:03d}",
+                    email=loadtest_email(number),
+                    grade=number % 6,
+                )
+                for number in range(1, options["families"] + 1)
+            ],
+            ignore_conflicts=True,
+        )
+
+        # Pickups and returns are equally likely, so stock wanders rather than
+        # drains; start each run well away from zero.
+        location, _ = Location.objects.get_or_create(name=LOADTEST_LOCATION_NAME)
+        on_hand = stock_at(location)
+        top_up = {
+            variety.value: LOADTEST_STOCK_BOXES - on_hand[variety.value]
+            for variety in CookieVariety
+            if on_hand[variety.value] < LOADTEST_STOCK_BOXES
+        }
+        if top_up:
+            transfer_stock(None, location, top_up, note="Load test")
+
+        user, _ = get_user_model().objects.get_or_create(
+            username=LOADTEST_STAFF_USERNAME
+        )
+        user.is_staff = True
+        user.set_password(options["password"])
+        user.save()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{options['families']} load-test families, staff user "
+                f"{LOADTEST_STAFF_USERNAME!r} and location "
+                f"{LOADTEST_LOCATION_NAME!r} are ready."
+            )
+        )
@@ -0,0 +1,321 @@
+"""
+Metrics for Prometheus, in its text format, at /metrics/.
+
+Scrapes need an API token (as a bearer token) or a staff session. Two kinds
+of figures are exposed:
+
+- Runtime metrics, counted as requests happen: request and database time
+  per route, as histograms, and failed family sign-ins. They're kept in
+  memory, per process, and labelled with the process's pid as `worker`:
+  with several gunicorn workers, each scrape sees whichever worker
+  answered it, and sum(...) by the other labels adds the workers up.
+- Inventory gauges, read from the database: events per type (in all and
+  in the last hour), families overdue for a count, boxes families hold and
+  boxes in troop stock per variety, and the background report backlog.
+  They're computed together at most once a minute, and again only when
+  events or families change, so scraping every 15 seconds costs a read of
+  the generations row.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.db import connections
+from django.db.models import Count, Sum
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+from .cookies import CookieVariety
+from .generations import EVENTS, FAMILIES
+from .inventory import family_holdings
+from .models import Event, EventType, LocationStock, Report, ReportStatus
+from .report_cache import generation_cached, report_cache
+from .routers import reading_from_reports
+
+# Prometheus's default buckets, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# A family holding boxes that hasn't counted in this long is overdue.
+COUNT_OVERDUE_DAYS = 7
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _sample(name: str, value: float, **labels: str) -> str:
+    if labels:
+        pairs = ",".join(f'{key}="{_escape(str(v))}"' for key, v in labels.items())
+        name = f"{name}{{{pairs}}}"
+    return f"{name} {value!r}"
+
+
+def _header(name: str, help: str, kind: str) -> list[str]:
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+
+
+class Histogram:
+    """Observations bucketed by one label, e.g. durations per route."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label: str,
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        # Per label value: cumulative counts for each bucket, then +Inf.
+        self._counts: dict[str, list[int]] = {}
+        self._sums: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(label_value, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[label_value] = self._sums.get(label_value, 0.0) + value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+
+    def render(self, **const_labels: str) -> list[str]:
+        lines = _header(self.name, self.help, "histogram")
+        with self._lock:
+            series = {
+                key: (list(counts), self._sums[key])
+                for key, counts in self._counts.items()
+            }
+        for label_value, (counts, total) in sorted(series.items()):
+            labels = {self.label: label_value, **const_labels}
+            for bound, count in zip(self.buckets, counts):
+                lines.append(
+                    _sample(f"{self.name}_bucket", count, **labels, le=f"{bound:g}")
+                )
+            lines.append(
+                _sample(f"{self.name}_bucket", counts[-1], **labels, le="+Inf")
+            )
+            lines.append(_sample(f"{self.name}_sum", total, **labels))
+            lines.append(_sample(f"{self.name}_count", counts[-1], **labels))
+        return lines
+
+
+class Counter:
+    """A count that only goes up, by one label."""
+
+    def __init__(self, name: str, help: str, label: str):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render(self, **const_labels: str) -> list[str]:
+        lines = _header(self.name, self.help, "counter")
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            labels = {self.label: label_value, **const_labels}
+            lines.append(_sample(self.name, value, **labels))
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "cookietrails_request_duration_seconds",
+    "Time spent answering requests, by route.",
+    "route",
+)
+DB_DURATION = Histogram(
+    "cookietrails_request_db_duration_seconds",
+    "Time each request spent in database queries, by route.",
+    "route",
+)
+LOGIN_FAILURES = Counter(
+    "cookietrails_family_login_failures_total",
+    "Family sign-ins refused, by reason.",
+    "reason",
+)
+RUNTIME_METRICS = (REQUEST_DURATION, DB_DURATION, LOGIN_FAILURES)
+
+
+def _route(request: HttpRequest) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "unmatched"
+
+
+class _QueryTimer:
+    """Adds up the time spent in queries, on every connection."""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def metrics_middleware(get_response: Callable) -> Callable:
+    """Time every request, and the queries it makes, by route.
+
+    Deliberately sync-only: Django then runs the sync views under it (and
+    their queries) back on this thread, where the query timer can see them.
+    """
+
+    def middleware(request: HttpRequest) -> HttpResponse:
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = get_response(request)
+        route = _route(request)
+        REQUEST_DURATION.observe(route, time.perf_counter() - start)
+        DB_DURATION.observe(route, timer.seconds)
+        return response
+
+    return middleware
+
+
+@dataclass(frozen=True)
+class InventoryHealth:
+    events: dict[str, int]
+    events_last_hour: dict[str, int]
+    families_overdue: int
+    family_holdings: dict[str, int]
+    troop_stock: dict[str, int]
+    reports_backlog: int
+
+
+@generation_cached(EVENTS, FAMILIES)
+def inventory_health(minute: datetime) -> InventoryHealth:
+    """Inventory gauges as of `minute`; cached until the next one."""
+    by_type = Event.objects.order_by().values_list("event_type").annotate(Count("pk"))
+    last_hour = by_type.filter(created_at__gte=minute - timedelta(hours=1))
+
+    holdings = family_holdings()
+    holding = {
+        family_id
+        for family_id, boxes in holdings.items()
+        if any(count > 0 for count in boxes.values())
+    }
+    counted = Event.objects.filter(
+        event_type=EventType.COUNT,
+        family_id__in=holding,
+        created_at__gte=minute - timedelta(days=COUNT_OVERDUE_DAYS),
+    ).values_list("family_id", flat=True)
+
+    stock = (
+        LocationStock.objects.order_by().values_list("variety").annotate(Sum("boxes"))
+    )
+    return InventoryHealth(
+        events=dict(by_type),
+        events_last_hour=dict(last_hour),
+        families_overdue=len(holding - set(counted)),
+        family_holdings={
+            variety.value: sum(boxes[variety.value] for boxes in holdings.values())
+            for variety in CookieVariety
+        },
+        troop_stock={variety.value: 0 for variety in CookieVariety} | dict(stock),
+        reports_backlog=Report.objects.filter(
+            status__in=[ReportStatus.PENDING, ReportStatus.RUNNING]
+        ).count(),
+    )
+
+
+def _per_type(counts: dict[str, int]) -> dict[str, int]:
+    return {
+        event_type.value: counts.get(event_type.value, 0) for event_type in EventType
+    }
+
+
+def _gauge(
+    name: str, help: str, values: int | dict[str, int], label: str = ""
+) -> list[str]:
+    lines = _header(name, help, "gauge")
+    if isinstance(values, int):
+        return [*lines, _sample(name, values)]
+    return lines + [
+        _sample(name, value, **{label: key}) for key, value in values.items()
+    ]
+
+
+def render_metrics() -> str:
+    """Every metric, in Prometheus's text exposition format."""
+    minute = timezone.now().replace(second=0, microsecond=0)
+    with reading_from_reports():
+        health = inventory_health(minute)
+
+    lines: list[str] = []
+    # Read per scrape: gunicorn forks workers after this module is imported.
+    worker = str(os.getpid())
+    for metric in RUNTIME_METRICS:
+        lines += metric.render(worker=worker)
+    lines += _gauge(
+        "cookietrails_events",
+        "Events recorded, by type.",
+        _per_type(health.events),
+        "event_type",
+    )
+    lines += _gauge(
+        "cookietrails_events_last_hour",
+        "Events recorded in the last hour, by type.",
+        _per_type(health.events_last_hour),
+        "event_type",
+    )
+    lines += _gauge(
+        "cookietrails_families_overdue_for_count",
+        f"Families holding boxes that haven't counted in {COUNT_OVERDUE_DAYS} days.",
+        health.families_overdue,
+    )
+    lines += _gauge(
+        "cookietrails_family_holdings_boxes",
+        "Boxes held by families, by variety.",
+        health.family_holdings,
+        "variety",
+    )
+    lines += _gauge(
+        "cookietrails_troop_stock_boxes",
+        "Boxes in troop stock across all locations, by variety.",
+        health.troop_stock,
+        "variety",
+    )
+    lines += _gauge(
+        "cookietrails_reports_backlog",
+        "Background reports waiting or running.",
+        health.reports_backlog,
+    )
+    lines += _gauge(
+        "cookietrails_report_cache_entries",
+        "Entries in the report cache.",
+        len(report_cache),
+    )
+    for name, value in (("hits", report_cache.hits), ("misses", report_cache.misses)):
+        metric = f"cookietrails_report_cache_{name}_total"
+        lines += _header(metric, f"Report cache {name}.", "counter")
+        lines.append(_sample(metric, value))
+    return "\n".join(lines) + "\n"
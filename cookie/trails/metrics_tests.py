@@ -0,0 +1,131 @@
+import os
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .metrics import RUNTIME_METRICS, Histogram
+from .models import ApiToken, Event, EventType, Family, Location
+from .stock import transfer_stock
+
+
+@pytest.fixture(autouse=True)
+def _clear_metrics():
+    for metric in RUNTIME_METRICS:
+        metric.clear()
+
+
+@pytest.fixture
+def auth():
+    api_token = ApiToken(name="Prometheus")
+    key = api_token.generate_key()
+    api_token.save()
+    return {"HTTP_AUTHORIZATION": f"Bearer {key}"}
+
+
+def _samples(response) -> dict[str, float]:
+    return {
+        name: float(value)
+        for name, value in (
+            line.rsplit(" ", 1)
+            for line in response.content.decode().splitlines()
+            if not line.startswith("#")
+        )
+    }
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "Help.", "route")
+    for value in (0.001, 0.02, 20):
+        histogram.observe('say "hi"', value)
+    lines = histogram.render()
+    assert 'h_bucket{route="say \\"hi\\"",le="0.005"} 1' in lines
+    assert 'h_bucket{route="say \\"hi\\"",le="0.025"} 2' in lines
+    assert 'h_bucket{route="say \\"hi\\"",le="+Inf"} 3' in lines
+    assert 'h_count{route="say \\"hi\\""} 3' in lines
+
+
+@pytest.mark.django_db
+def test_metrics_need_a_token_or_staff(client, admin_client, auth):
+    assert client.get(reverse("metrics")).status_code == 401
+    assert client.get(reverse("metrics"), **auth).status_code == 200
+    response = admin_client.get(reverse("metrics"))
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+
+
+@pytest.mark.django_db
+def test_inventory_gauges(client, auth):
+    ada = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    bea = Family.objects.create(scout_name="Bea", email="bea@example.com", grade=5)
+    transfer_stock(None, Location.objects.create(name="Cupboard"), {"TMint": 40})
+    Event.objects.create(family=ada, event_type=EventType.PICKUP, count_data={"Sam": 5})
+    Event.objects.create(family=bea, event_type=EventType.PICKUP, count_data={"Sam": 2})
+    Event.objects.create(family=bea, event_type=EventType.COUNT, count_data={"Sam": 1})
+    old = Event.objects.create(family=ada, event_type=EventType.COUNT)
+    Event.objects.filter(pk=old.pk).update(
+        created_at=timezone.now() - timedelta(hours=2)
+    )
+
+    samples = _samples(client.get(reverse("metrics"), **auth))
+    assert samples['cookietrails_events{event_type="pickup"}'] == 2
+    assert samples['cookietrails_events{event_type="count"}'] == 2
+    assert samples['cookietrails_events_last_hour{event_type="count"}'] == 1
+    # Ada's only count was before her pickup, but is still within the week.
+    assert samples["cookietrails_families_overdue_for_count"] == 0
+    assert samples['cookietrails_family_holdings_boxes{variety="Sam"}'] == 7
+    assert samples['cookietrails_troop_stock_boxes{variety="TMint"}'] == 40
+    assert samples['cookietrails_troop_stock_boxes{variety="Sam"}'] == 0
+
+    Event.objects.filter(pk=old.pk).update(
+        created_at=timezone.now() - timedelta(days=8)
+    )
+    samples = _samples(client.get(reverse("metrics"), **auth))
+    assert samples["cookietrails_families_overdue_for_count"] == 1
+
+
+@pytest.mark.django_db
+def test_repeated_scrapes_reuse_cached_gauges(client, auth):
+    ada = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    Event.objects.create(family=ada, event_type=EventType.PICKUP, count_data={"Sam": 5})
+    client.get(reverse("metrics"), **auth)
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(5):
+            client.get(reverse("metrics"), **auth)
+    # Per scrape: the token, and the generations row.
+    assert len(queries) == 5 * 2
+
+
+@pytest.mark.django_db
+def test_requests_and_login_failures_are_counted(client, auth, plain_static):
+    client.post(reverse("family_login"), {"email": "nobody@example.com"})
+    client.post(reverse("family_login"), {"email": "not an email"})
+    client.post(reverse("family_login"), {})
+    client.get(reverse("api_families"), **auth)
+
+    samples = _samples(client.get(reverse("metrics"), **auth))
+    worker = f'worker="{os.getpid()}"'
+    assert (
+        samples[
+            f'cookietrails_request_duration_seconds_count{{route="family_login",{worker}}}'
+        ]
+        == 3
+    )
+    assert (
+        samples[
+            f'cookietrails_request_db_duration_seconds_count{{route="api_families",{worker}}}'
+        ]
+        == 1
+    )
+    assert (
+        samples[
+            f'cookietrails_request_db_duration_seconds_sum{{route="api_families",{worker}}}'
+        ]
+        > 0
+    )
+    failures = "cookietrails_family_login_failures_total"
+    assert samples[f'{failures}{{reason="unknown_email",{worker}}}'] == 1
+    assert samples[f'{failures}{{reason="invalid",{worker}}}'] == 2
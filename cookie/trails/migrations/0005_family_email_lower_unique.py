@@ -0,0 +1,54 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:17
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_email_collisions(apps, schema_editor):
+    """Refuse to migrate, listing the culprits, if emails collide by case."""
+    Family = apps.get_model("trails", "Family")
+    families = Family.objects.using(schema_editor.connection.alias).annotate(
+        email_lower=Lower("email")
+    )
+    collisions = (
+        families.values("email_lower")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+        .order_by("email_lower")
+    )
+    lines = []
+    for collision in collisions:
+        sharing = families.filter(email_lower=collision["email_lower"])
+        names = ", ".join(
+            f"#{family.pk} {family.scout_name} <{family.email}>"
+            for family in sharing.order_by("pk")
+        )
+        lines.append(f"  {collision['email_lower']}: {names}")
+    if lines:
+        raise RuntimeError(
+            "These families share an email (ignoring case). Give each family "
+            "its own email, or merge them and move their events, then migrate "
+            "again:\n" + "\n".join(lines)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trails', '0004_report'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_email_collisions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='family',
+            name='email',
+            field=models.EmailField(max_length=254),
+        ),
+        migrations.AddConstraint(
+            model_name='family',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='family_email_lower_unique', violation_error_message='A family with this email already exists.'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:29
+
+import cookie.trails.models
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def season_for(created_at):
+    # A copy of models.season_for as it stood, so later changes there can't
+    # change what this migration does: seasons start in October and are
+    # named for the year they end in.
+    date = timezone.localdate(created_at)
+    return date.year + 1 if date.month >= 10 else date.year
+
+
+def backfill_seasons(apps, schema_editor):
+    """Give existing events the season they were created in."""
+    Event = apps.get_model("trails", "Event")
+    events = Event.objects.using(schema_editor.connection.alias)
+    by_season = {}
+    for pk, created_at in events.values_list("pk", "created_at").iterator():
+        by_season.setdefault(season_for(created_at), []).append(pk)
+    for season, pks in by_season.items():
+        for start in range(0, len(pks), 1000):
+            events.filter(pk__in=pks[start : start + 1000]).update(season=season)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trails', '0005_family_email_lower_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('season', models.PositiveSmallIntegerField(db_index=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('event_type', models.CharField(choices=[('pickup', 'Pickup'), ('return', 'Return'), ('count', 'Count'), ('cookie_order', 'Cookie Order')], max_length=20)),
+                ('count_data', models.JSONField(default=cookie.trails.models._default_count_data)),
+                ('unit', models.CharField(choices=[('box', 'Box'), ('case', 'Case')], default='box', max_length=10)),
+                ('extra', models.JSONField(default=dict)),
+                ('idempotency_key', models.UUIDField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SeasonBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.PositiveSmallIntegerField()),
+                ('holdings', models.JSONField(default=cookie.trails.models._default_count_data)),
+                ('ordered_cents', models.IntegerField(default=0)),
+                ('held_cents', models.IntegerField(default=0)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['season', 'family'],
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='season',
+            field=models.PositiveSmallIntegerField(default=cookie.trails.models.current_season, editable=False),
+        ),
+        migrations.RunPython(backfill_seasons, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['season', 'created_at'], name='event_season_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedevent',
+            name='family',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_events', to='trails.family'),
+        ),
+        migrations.AddField(
+            model_name='seasonbalance',
+            name='family',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='season_balances', to='trails.family'),
+        ),
+        migrations.AddConstraint(
+            model_name='seasonbalance',
+            constraint=models.UniqueConstraint(fields=('season', 'family'), name='season_balance_unique'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:38
+
+import cookie.trails.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trails', '0006_event_season_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedevent',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_events', to='trails.location'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='events', to='trails.location'),
+        ),
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('count_data', models.JSONField(default=cookie.trails.models._default_count_data)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_in', to='trails.location')),
+                ('source', models.ForeignKey(blank=True, help_text='Leave empty for a delivery from the bakery.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transfers_out', to='trails.location')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variety', models.CharField(choices=[('Advf', 'Adventurefuls'), ('Lmup', 'Lemon-ups'), ('Tre', 'Trefoils'), ('D-S-D', 'Do-si-dos'), ('Sam', 'Samoas'), ('Tags', 'Tagalongs'), ('TMint', 'Thin Mints'), ('Exp', 'Exploremores'), ('Toff', 'Toffee-tastics')], max_length=10)),
+                ('boxes', models.IntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='trails.location')),
+            ],
+            options={
+                'ordering': ['location', 'variety'],
+                'constraints': [models.UniqueConstraint(fields=('location', 'variety'), name='location_stock_unique'), models.CheckConstraint(condition=models.Q(('boxes__gte', 0)), name='location_stock_nonnegative')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trails', '0007_locations_stock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['family', 'created_at', 'id'], name='event_family_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trails', '0008_event_family_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='kind',
+            field=models.CharField(choices=[('initial_orders', 'Initial orders (CSV)'), ('reconciliation', 'Ledger reconciliation (CSV)'), ('analytics', 'Season snapshot for analysis (SQLite)')], max_length=30),
+        ),
+    ]
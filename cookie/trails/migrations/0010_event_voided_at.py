@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trails', '0009_report_kind_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='voided_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
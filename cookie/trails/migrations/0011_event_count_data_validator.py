@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:55
+
+import cookie.trails.counts
+import cookie.trails.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trails', '0010_event_voided_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='count_data',
+            field=models.JSONField(default=cookie.trails.models._default_count_data, validators=[cookie.trails.counts.validate_count_data]),
+        ),
+    ]
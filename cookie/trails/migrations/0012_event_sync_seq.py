@@ -0,0 +1,26 @@
+# Generated by Django 6.1.2 on 2026-10-19 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trails', '0011_event_count_data_validator'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_updated_id_idx',
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='sync_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['sync_seq', 'id'], name='event_sync_seq_id_idx'),
+        ),
+    ]
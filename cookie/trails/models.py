@@ -1,15 +1,112 @@
-from django.db import models
+import hashlib
+import secrets
+from datetime import datetime
 
-from .cookies import CookieVariety
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .cookies import BOXES_PER_CASE, CookieVariety
+from .counts import normalize_count_data, validate_count_data
+
+
+class GenerationQuerySet(models.QuerySet):
+    """Bumps the model's change generation on bulk writes.
+
+    `update` and `bulk_create` (and `bulk_update`, which runs `update`) skip
+    the save signals that normally do it, so cached reports would go stale.
+    """
+
+    def _bump_generation(self) -> None:
+        # Imported here because generations imports this module.
+        from .generations import bump_generation, generation_for
+
+        name = generation_for(self.model)
+        if name is not None:
+            bump_generation(name)
+
+    def update(self, **kwargs) -> int:
+        with transaction.atomic(using=self.db):
+            rows = super().update(**kwargs)
+            if rows:
+                self._bump_generation()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs) -> list:
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            if created:
+                self._bump_generation()
+        return created
+
+
+def _next_sync_seq() -> int:
+    # Imported here because generations imports this module.
+    from .generations import EVENTS, next_generation
+
+    return next_generation(EVENTS)
+
+
+class EventQuerySet(GenerationQuerySet):
+    """Normalizes count_data on bulk writes, as Event.save does; see counts.py.
+
+    Also stamps sync_seq, which bumps the generation on the way.
+    """
+
+    def _bump_generation(self) -> None:
+        pass
+
+    def update(self, **kwargs) -> int:
+        if isinstance(kwargs.get("count_data"), dict):
+            kwargs["count_data"] = normalize_count_data(kwargs["count_data"])
+        with transaction.atomic(using=self.db):
+            savepoint = transaction.savepoint(using=self.db)
+            rows = super().update(sync_seq=_next_sync_seq(), **kwargs)
+            if not rows:
+                # Nothing changed, so leave the generation alone.
+                transaction.savepoint_rollback(savepoint, using=self.db)
+            return rows
+
+    def bulk_create(self, objs, *args, **kwargs) -> list:
+        objs = list(objs)
+        for obj in objs:
+            obj.count_data = normalize_count_data(obj.count_data)
+        if not objs:
+            return super().bulk_create(objs, *args, **kwargs)
+        with transaction.atomic(using=self.db):
+            sync_seq = _next_sync_seq()
+            for obj in objs:
+                obj.sync_seq = sync_seq
+            return super().bulk_create(objs, *args, **kwargs)
+
+
+class LiveEventManager(models.Manager.from_queryset(EventQuerySet)):
+    """Events that haven't been voided: the ones every figure counts."""
+
+    def get_queryset(self) -> models.QuerySet:
+        return super().get_queryset().filter(voided_at__isnull=True)
 
 
 class Family(models.Model):
     scout_name = models.CharField(max_length=100, db_index=True)
-    email = models.EmailField(db_index=True)
+    email = models.EmailField()
     grade = models.PositiveSmallIntegerField()
 
+    objects = GenerationQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "families"
+        constraints = [
+            # Also the index that serves case-insensitive login lookups; query
+            # it with Lower("email"), not email__iexact (which uses UPPER on
+            # Postgres and so can't use this index).
+            models.UniqueConstraint(
+                Lower("email"),
+                name="family_email_lower_unique",
+                violation_error_message="A family with this email already exists.",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.scout_name} (grade {self.grade}) <{self.email}>"
@@ -40,21 +137,148 @@ def _default_count_data() -> dict[str, int]:
     return {variety.value: 0 for variety in CookieVariety}
 
 
+class Location(models.Model):
+    """A place troop cookies are kept: the cupboard, a garage, a car trunk."""
+
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class LocationStock(models.Model):
+    """Troop boxes of one variety at one location.
+
+    Only changed through stock.py, which locks the row and adjusts it with an
+    F() expression, so concurrent writers can't lose or overdraw boxes.
+    """
+
+    location = models.ForeignKey(
+        Location, on_delete=models.CASCADE, related_name="stock"
+    )
+    variety = models.CharField(max_length=10, choices=CookieVariety.choices)
+    boxes = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["location", "variety"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["location", "variety"], name="location_stock_unique"
+            ),
+            models.CheckConstraint(
+                condition=models.Q(boxes__gte=0), name="location_stock_nonnegative"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.location}: {self.boxes} {self.variety}"
+
+
+class StockTransfer(models.Model):
+    """Boxes moved between locations, or delivered by the bakery (no source)."""
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    source = models.ForeignKey(
+        Location,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="transfers_out",
+        help_text="Leave empty for a delivery from the bakery.",
+    )
+    destination = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name="transfers_in"
+    )
+    # Always in boxes.
+    count_data = models.JSONField(default=_default_count_data)
+    note = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.source or 'Bakery'} → {self.destination}"
+
+
+# Cookie sales happen in late winter, but initial orders can open the autumn
+# before; a season is named for the year of its sales and starts in this
+# month of the year before.
+SEASON_START_MONTH = 10
+
+
+def season_for(moment: datetime) -> int:
+    """The cookie season a moment falls in, by local date."""
+    date = timezone.localdate(moment)
+    return date.year + 1 if date.month >= SEASON_START_MONTH else date.year
+
+
+def current_season() -> int:
+    return season_for(timezone.now())
+
+
 class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Closed seasons are moved to ArchivedEvent; see seasons.py.
+    season = models.PositiveSmallIntegerField(default=current_season, editable=False)
     event_type = models.CharField(
         max_length=20, choices=EventType.choices, db_index=True
     )
     family = models.ForeignKey(Family, on_delete=models.PROTECT, related_name="events")
     updated_at = models.DateTimeField(auto_now=True)
-    count_data = models.JSONField(default=_default_count_data)
+    count_data = models.JSONField(
+        default=_default_count_data, validators=[validate_count_data]
+    )
     unit = models.CharField(
         max_length=10, choices=CountUnit.choices, default=CountUnit.BOX
     )
     extra = models.JSONField(default=dict)
+    # Client-generated key for events queued on a device and synced later;
+    # lets a retried sync recognize rows it has already recorded.
+    idempotency_key = models.UUIDField(null=True, blank=True, unique=True)
+    # Where a pickup's boxes came from, or a return's went; see stock.py.
+    location = models.ForeignKey(
+        Location,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="events",
+    )
+    # Set when a bulk correction voids the event; see bulk.py.
+    voided_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Stamped on every write, in commit order, for incremental sync; see
+    # generations.next_generation. Rows from before it was added are 0.
+    sync_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = LiveEventManager()
+    # Includes voided events, for sync clients and idempotency checks.
+    all_objects = EventQuerySet.as_manager()
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # Incremental sync: "everything changed since this cursor".
+            models.Index(fields=["sync_seq", "id"], name="event_sync_seq_id_idx"),
+            models.Index(fields=["season", "created_at"], name="event_season_idx"),
+            # A family's ledger, a page at a time.
+            models.Index(
+                fields=["family", "created_at", "id"], name="event_family_created_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs) -> None:
+        # Only check counts that are being written: saving another field of
+        # a legacy row that the backfill flagged must still work.
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "count_data" in update_fields:
+            self.count_data = normalize_count_data(self.count_data)
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "sync_seq"}
+        with transaction.atomic(using=kwargs.get("using")):
+            self.sync_seq = _next_sync_seq()
+            super().save(*args, **kwargs)
 
     @property
     def counts(self) -> dict[CookieVariety, int]:
@@ -70,8 +294,167 @@ class Event(models.Model):
     def total_count(self) -> int:
         return sum(self.counts.values())
 
+    @property
+    def boxes(self) -> dict[str, int]:
+        """Counts by variety code, converted to boxes."""
+        multiplier = BOXES_PER_CASE if self.unit == CountUnit.CASE else 1
+        return {
+            code: int(count) * multiplier for code, count in self.count_data.items()
+        }
+
     def count_for_variety(self, variety: CookieVariety) -> int:
         return self.count_data.get(variety.value, 0)
 
     def __str__(self):
         return f"{self.event_type} - {self.family}"
+
+
+class ArchivedEvent(models.Model):
+    """An event from a closed season, moved out of the live Event table.
+
+    Keeps the event's original id, so ledgers and exports from the season
+    still line up.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    season = models.PositiveSmallIntegerField(db_index=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    event_type = models.CharField(max_length=20, choices=EventType.choices)
+    family = models.ForeignKey(
+        Family, on_delete=models.PROTECT, related_name="archived_events"
+    )
+    count_data = models.JSONField(default=_default_count_data)
+    unit = models.CharField(
+        max_length=10, choices=CountUnit.choices, default=CountUnit.BOX
+    )
+    extra = models.JSONField(default=dict)
+    idempotency_key = models.UUIDField(null=True, blank=True)
+    location = models.ForeignKey(
+        Location,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="archived_events",
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return f"{self.event_type} - {self.family} ({self.season})"
+
+
+class SeasonBalance(models.Model):
+    """A family's final figures for a closed season, in boxes and cents."""
+
+    season = models.PositiveSmallIntegerField()
+    family = models.ForeignKey(
+        Family, on_delete=models.PROTECT, related_name="season_balances"
+    )
+    # Troop-owned boxes still in the family's custody, by variety code.
+    holdings = models.JSONField(default=_default_count_data)
+    ordered_cents = models.IntegerField(default=0)
+    held_cents = models.IntegerField(default=0)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["season", "family"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["season", "family"], name="season_balance_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.family} ({self.season})"
+
+    @property
+    def owed_cents(self) -> int:
+        return self.ordered_cents + self.held_cents
+
+
+class ChangeGeneration(models.Model):
+    """A counter bumped every time a table changes.
+
+    Readers compare generations instead of querying the table itself, e.g. to
+    answer a conditional GET with 304 Not Modified.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}@{self.value}"
+
+
+class ApiToken(models.Model):
+    """A bearer token for the read-only JSON API. Only a digest is stored."""
+
+    name = models.CharField(max_length=100)
+    key_digest = models.CharField(max_length=64, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def digest(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def generate_key(self) -> str:
+        """Assign a fresh random key, returning it. It can't be recovered later."""
+        key = secrets.token_urlsafe(32)
+        self.key_digest = self.digest(key)
+        return key
+
+
+class ReportKind(models.TextChoices):
+    INITIAL_ORDERS = "initial_orders", "Initial orders (CSV)"
+    RECONCILIATION = "reconciliation", "Ledger reconciliation (CSV)"
+    ANALYTICS = "analytics", "Season snapshot for analysis (SQLite)"
+
+
+class ReportStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    RUNNING = "running", "Running"
+    SUCCEEDED = "succeeded", "Succeeded"
+    FAILED = "failed", "Failed"
+
+
+class Report(models.Model):
+    """A report generated by the background worker, kept until it expires."""
+
+    kind = models.CharField(max_length=30, choices=ReportKind.choices)
+    status = models.CharField(
+        max_length=20, choices=ReportStatus.choices, default=ReportStatus.PENDING
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    task_id = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Rows written so far, out of an estimated total.
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    filename = models.CharField(max_length=100, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    # Stored in the database rather than on disk so the web and worker
+    # processes, which don't share a filesystem, can both reach it.
+    content = models.BinaryField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.get_status_display()})"
+
+    @property
+    def percent_complete(self) -> int | None:
+        if not self.total:
+            return None
+        return min(100, self.progress * 100 // self.total)
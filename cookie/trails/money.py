@@ -0,0 +1,165 @@
+"""
+Money rollups: what each family is responsible for, in integer cents.
+
+Prices come from COOKIE_COSTS, converted once to whole cents, so the
+database can multiply and sum them without any floating point or decimal
+arithmetic. The figures match `calculate_cookie_cost` to the cent.
+
+For each family:
+
+- **ordered**: the value of its initial cookie order (the latest one, as
+  in the initial orders CSV). The family pays for these.
+- **held**: the value of the troop-owned boxes in its custody, i.e. pickups
+  minus returns. The family pays for these or brings them back.
+- **owed**: the two together.
+"""
+
+import functools
+import operator
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import Case, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+
+from .cookies import COOKIE_COSTS, CookieVariety
+from .generations import EVENTS, FAMILIES
+from .inventory import HOLDINGS_EVENT_TYPES, boxes_expression
+from .models import Event, EventType, Family
+from .report_cache import generation_cached
+
+PRICE_CENTS: dict[CookieVariety, int] = {
+    variety: int(cost * 100) for variety, cost in COOKIE_COSTS.items()
+}
+
+assert all(
+    Decimal(cents) / 100 == COOKIE_COSTS[variety]
+    for variety, cents in PRICE_CENTS.items()
+), "Cookie costs must be whole cents"
+
+
+def cents_to_dollars(cents: int) -> Decimal:
+    """Convert cents to dollars, in the form `calculate_cookie_cost` returns."""
+    return (Decimal(cents) / 100).quantize(Decimal("0.01"))
+
+
+def value_expression() -> models.Expression:
+    """The value of an event's boxes in cents, as a SQL expression."""
+    return functools.reduce(
+        operator.add,
+        (
+            boxes_expression(variety) * PRICE_CENTS.get(variety, 0)
+            for variety in CookieVariety
+        ),
+    )
+
+
+@dataclass(frozen=True)
+class FamilyMoney:
+    family_id: int
+    scout_name: str
+    grade: int
+    ordered_cents: int
+    held_cents: int
+
+    @property
+    def owed_cents(self) -> int:
+        return self.ordered_cents + self.held_cents
+
+
+@dataclass(frozen=True)
+class GradeMoney:
+    grade: int
+    families: int
+    ordered_cents: int
+    held_cents: int
+
+    @property
+    def owed_cents(self) -> int:
+        return self.ordered_cents + self.held_cents
+
+
+@dataclass(frozen=True)
+class TroopMoney:
+    families: list[FamilyMoney]
+    grades: list[GradeMoney]
+    ordered_cents: int
+    held_cents: int
+
+    @property
+    def owed_cents(self) -> int:
+        return self.ordered_cents + self.held_cents
+
+
+def family_money(
+    family_ids: list[int] | None = None, season: int | None = None
+) -> list[FamilyMoney]:
+    """Money figures for each family, ordered by scout name, in one query.
+
+    With a season, only that season's events count.
+    """
+    events = Event.objects.filter(family=OuterRef("pk")).order_by()
+    if season is not None:
+        events = events.filter(season=season)
+    held_cents = (
+        events.filter(event_type__in=HOLDINGS_EVENT_TYPES)
+        .values("family")
+        .annotate(
+            cents=Sum(
+                Case(
+                    When(event_type=EventType.PICKUP, then=value_expression()),
+                    default=-value_expression(),
+                )
+            )
+        )
+        .values("cents")
+    )
+    latest_order_cents = (
+        events.filter(event_type=EventType.COOKIE_ORDER)
+        .order_by("-created_at", "-pk")
+        .annotate(cents=value_expression())
+        .values("cents")[:1]
+    )
+    families = Family.objects.all()
+    if family_ids is not None:
+        families = families.filter(pk__in=family_ids)
+    rows = (
+        families.annotate(
+            ordered_cents=Coalesce(
+                Subquery(latest_order_cents, output_field=models.IntegerField()), 0
+            ),
+            held_cents=Coalesce(
+                Subquery(held_cents, output_field=models.IntegerField()), 0
+            ),
+        )
+        .order_by("scout_name", "pk")
+        .values_list("pk", "scout_name", "grade", "ordered_cents", "held_cents")
+    )
+    return [FamilyMoney(*row) for row in rows]
+
+
+@generation_cached(EVENTS, FAMILIES)
+def troop_money() -> TroopMoney:
+    """Troop-wide money figures, by family and by grade.
+
+    Cached until the next write to events or families.
+    """
+    families = family_money()
+    by_grade: dict[int, list[FamilyMoney]] = {}
+    for family in families:
+        by_grade.setdefault(family.grade, []).append(family)
+    return TroopMoney(
+        families=families,
+        grades=[
+            GradeMoney(
+                grade=grade,
+                families=len(members),
+                ordered_cents=sum(member.ordered_cents for member in members),
+                held_cents=sum(member.held_cents for member in members),
+            )
+            for grade, members in sorted(by_grade.items())
+        ],
+        ordered_cents=sum(family.ordered_cents for family in families),
+        held_cents=sum(family.held_cents for family in families),
+    )
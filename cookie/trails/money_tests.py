@@ -0,0 +1,78 @@
+import pytest
+from django.urls import reverse
+
+from .cookies import BOXES_PER_CASE, CookieVariety, calculate_cookie_cost
+from .models import ApiToken, CountUnit, Event, EventType, Family
+from .money import cents_to_dollars, family_money, troop_money
+
+
+def _event(family, event_type, unit=CountUnit.BOX, **counts):
+    return Event.objects.create(
+        family=family, event_type=event_type, unit=unit, count_data=counts
+    )
+
+
+@pytest.mark.django_db
+def test_family_money_matches_calculate_cookie_cost():
+    ada = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    bea = Family.objects.create(scout_name="Bea", email="bea@example.com", grade=2)
+    _event(ada, EventType.COOKIE_ORDER, CountUnit.CASE, TMint=1)
+    _event(ada, EventType.COOKIE_ORDER, CountUnit.CASE, TMint=2, Toff=1)
+    _event(ada, EventType.PICKUP, TMint=24, Toff=5)
+    _event(ada, EventType.RETURN, unit=CountUnit.CASE, TMint=1)
+    _event(ada, EventType.COUNT, TMint=100)
+    _event(bea, EventType.PICKUP, Sam=3)
+
+    ada_money, bea_money = family_money()
+
+    # Only the latest order counts, and orders are in cases.
+    ordered = calculate_cookie_cost(
+        {
+            CookieVariety.THIN_MINTS: 2 * BOXES_PER_CASE,
+            CookieVariety.TOFFEE_TASTICS: BOXES_PER_CASE,
+        }
+    )
+    held = calculate_cookie_cost(
+        {CookieVariety.THIN_MINTS: 12, CookieVariety.TOFFEE_TASTICS: 5}
+    )
+    assert cents_to_dollars(ada_money.ordered_cents) == ordered
+    assert cents_to_dollars(ada_money.held_cents) == held
+    assert cents_to_dollars(ada_money.owed_cents) == ordered + held
+    assert bea_money.ordered_cents == 0
+    assert cents_to_dollars(bea_money.held_cents) == calculate_cookie_cost(
+        {CookieVariety.SAMOAS: 3}
+    )
+
+
+@pytest.mark.django_db
+def test_troop_money_rolls_up_by_grade_and_follows_writes():
+    ada = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    Family.objects.create(scout_name="Bea", email="bea@example.com", grade=4)
+    cal = Family.objects.create(scout_name="Cal", email="cal@example.com", grade=2)
+    _event(ada, EventType.PICKUP, Sam=2)
+    _event(cal, EventType.PICKUP, Sam=1)
+
+    summary = troop_money()
+    assert [(g.grade, g.families, g.held_cents) for g in summary.grades] == [
+        (2, 1, 600),
+        (4, 2, 1200),
+    ]
+    assert summary.owed_cents == 1800
+
+    _event(cal, EventType.RETURN, Sam=1)
+    assert troop_money().held_cents == 1200
+
+
+@pytest.mark.django_db
+def test_money_api(client):
+    api_token = ApiToken(name="Treasurer")
+    key = api_token.generate_key()
+    api_token.save()
+    ada = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    _event(ada, EventType.COOKIE_ORDER, CountUnit.CASE, Toff=1)
+
+    response = client.get(reverse("api_money"), HTTP_AUTHORIZATION=f"Bearer {key}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["results"][0]["ordered_cents"] == 7 * 100 * BOXES_PER_CASE
+    assert data["owed_cents"] == 7 * 100 * BOXES_PER_CASE
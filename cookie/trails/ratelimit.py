@@ -0,0 +1,80 @@
+"""
+Token-bucket rate limiting, kept in the cache.
+
+Each bucket holds up to `capacity` tokens and earns one back every
+`refill_seconds`. A request spends a token; with none left it's refused,
+and told how long until the next one. Buckets live in the default cache, so
+checking one never touches the database. They're shared between processes
+when the cache is (Redis, Memcached); with the default local-memory cache
+each process keeps its own.
+
+Reading and writing a bucket isn't atomic, so two requests racing for the
+last token may both get it. That's fine for keeping bots in check.
+"""
+
+import hashlib
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    name: str
+    # Requests allowed in a burst...
+    capacity: int
+    # ...and the seconds it takes to earn one more.
+    refill_seconds: float
+
+    def _key(self, identity: str) -> str:
+        digest = hashlib.sha256(identity.encode()).hexdigest()
+        return f"ratelimit:{self.name}:{digest}"
+
+    def take(self, identity: str) -> float:
+        """Spend a token for `identity`.
+
+        Returns 0 if there was one, or else the seconds until there will be.
+        """
+        key = self._key(identity)
+        now = time.time()
+        tokens, updated_at = cache.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) / self.refill_seconds)
+        # Once it's had time to refill, a bucket is the same as no bucket.
+        timeout = max(1, int(self.capacity * self.refill_seconds))
+        if tokens < 1:
+            cache.set(key, (tokens, now), timeout)
+            return (1 - tokens) * self.refill_seconds
+        cache.set(key, (tokens - 1, now), timeout)
+        return 0.0
+
+
+# A cupboard's worth of families may sign in from one wifi network at once,
+# and a family on every phone in the house, so both limits allow a burst.
+FAMILY_LOGIN_PER_IP = RateLimit("family-login-ip", capacity=30, refill_seconds=2)
+FAMILY_LOGIN_PER_EMAIL = RateLimit("family-login-email", capacity=10, refill_seconds=30)
+
+
+def client_ip(request: HttpRequest) -> str:
+    """The client's address, from CLIENT_IP_HEADER when behind a proxy."""
+    if settings.CLIENT_IP_HEADER:
+        forwarded = request.headers.get(settings.CLIENT_IP_HEADER, "")
+        if forwarded:
+            return forwarded.strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def family_login_wait(request: HttpRequest, email: str) -> float:
+    """Seconds a family login attempt must wait; 0 if it may go ahead.
+
+    Checked before the email is looked up, so throttled attempts cost no
+    queries. An address that's over its limit doesn't use up the email's.
+    """
+    if not settings.FAMILY_LOGIN_RATE_LIMIT:
+        return 0.0
+    wait = FAMILY_LOGIN_PER_IP.take(client_ip(request))
+    if wait or not email:
+        return wait
+    return FAMILY_LOGIN_PER_EMAIL.take(email.strip().lower())
@@ -0,0 +1,92 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import ratelimit
+from .models import Family
+from .ratelimit import FAMILY_LOGIN_PER_EMAIL, FAMILY_LOGIN_PER_IP, RateLimit
+
+# Failed sign-ins render the login page.
+pytestmark = pytest.mark.usefixtures("plain_static")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    limit = RateLimit("test", capacity=3, refill_seconds=10)
+    assert [limit.take("a") for _ in range(3)] == [0, 0, 0]
+    assert limit.take("a") == pytest.approx(10)
+    # Other identities have their own buckets.
+    assert limit.take("b") == 0
+
+    clock[0] += 5
+    assert limit.take("a") == pytest.approx(5)
+    clock[0] += 5
+    assert limit.take("a") == 0
+    assert limit.take("a") > 0
+
+
+@pytest.mark.django_db
+def test_login_burst_is_throttled_without_queries(client, clock):
+    Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    statuses = []
+    with CaptureQueriesContext(connection) as queries:
+        for n in range(2000):
+            response = client.post(
+                reverse("family_login"), {"email": f"guess{n}@example.com"}
+            )
+            statuses.append(response.status_code)
+
+    assert statuses.count(200) == FAMILY_LOGIN_PER_IP.capacity
+    assert statuses.count(429) == 2000 - FAMILY_LOGIN_PER_IP.capacity
+    # Only the attempts let through look anything up.
+    assert len(queries) <= 2 * FAMILY_LOGIN_PER_IP.capacity
+    assert int(response["Retry-After"]) >= 1
+
+
+@pytest.mark.django_db
+def test_login_is_throttled_per_email_across_addresses(client):
+    Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    statuses = [
+        client.post(
+            reverse("family_login"),
+            {"email": "ADA@example.com"},
+            REMOTE_ADDR=f"10.0.0.{n}",
+        ).status_code
+        for n in range(FAMILY_LOGIN_PER_EMAIL.capacity + 1)
+    ]
+    assert statuses == [302] * FAMILY_LOGIN_PER_EMAIL.capacity + [429]
+
+
+@pytest.mark.django_db
+def test_login_limit_uses_the_client_ip_header(client, settings):
+    settings.CLIENT_IP_HEADER = "CF-Connecting-IP"
+    for _ in range(FAMILY_LOGIN_PER_IP.capacity):
+        client.post(
+            reverse("family_login"),
+            {"email": "nobody@example.com"},
+            HTTP_CF_CONNECTING_IP="203.0.113.9",
+        )
+    # The proxy's own address is shared by everyone, so isn't what's limited.
+    response = client.post(
+        reverse("family_login"),
+        {"email": "someone@example.com"},
+        HTTP_CF_CONNECTING_IP="203.0.113.10",
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_login_limit_can_be_turned_off(client, settings):
+    settings.FAMILY_LOGIN_RATE_LIMIT = False
+    for n in range(FAMILY_LOGIN_PER_IP.capacity + 1):
+        response = client.post(
+            reverse("family_login"), {"email": f"guess{n}@example.com"}
+        )
+    assert response.status_code == 200
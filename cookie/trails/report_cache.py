@@ -0,0 +1,87 @@
+"""
+In-process memoization of reports against change generations.
+
+A function decorated with `generation_cached(EVENTS, FAMILIES)` runs once
+per combination of arguments and table generations. Until a write bumps one
+of those generations, later calls cost a read of the generations row and a
+dictionary lookup. Entries for old generations are never asked for again and
+age out of a size-bounded LRU (REPORT_CACHE_MAX_ENTRIES).
+
+Cached values are shared between callers, so treat them as read-only.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from functools import wraps
+from typing import Any
+
+from django.conf import settings
+
+from .generations import generation_key
+
+_MISSING = object()
+
+
+class LRUCache:
+    """A thread-safe mapping that forgets its least recently used entries."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+report_cache = LRUCache(settings.REPORT_CACHE_MAX_ENTRIES)
+
+
+def generation_cached(*tables: str) -> Callable[[Callable], Callable]:
+    """Memoize a report function until any of the given tables changes.
+
+    Arguments must be hashable; they become part of the cache key.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args: Hashable) -> Any:
+            # Read the generations before building, so a write that lands
+            # mid-build leaves the result under the older key.
+            key = (name, args, generation_key(*tables))
+            value = report_cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = func(*args)
+                report_cache.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
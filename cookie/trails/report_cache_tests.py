@@ -0,0 +1,78 @@
+import pytest
+
+from .generations import EVENTS, FAMILIES, get_generations
+from .inventory import holdings_snapshot
+from .models import Event, EventType, Family
+from .report_cache import LRUCache, generation_cached
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+@pytest.mark.django_db
+def test_cached_report_costs_one_generations_read_until_a_write(
+    family, django_assert_num_queries
+):
+    builds = []
+
+    @generation_cached(EVENTS)
+    def report(kind: str) -> int:
+        builds.append(kind)
+        return Event.objects.filter(event_type=kind).count()
+
+    assert report(EventType.PICKUP) == 0
+    with django_assert_num_queries(1):
+        assert report(EventType.PICKUP) == 0
+    assert builds == [EventType.PICKUP]
+
+    Event.objects.create(family=family, event_type=EventType.PICKUP)
+    assert report(EventType.PICKUP) == 1
+    assert report(EventType.RETURN) == 0
+    assert len(builds) == 3
+
+
+@pytest.mark.django_db
+def test_bulk_writes_bump_generations(family):
+    def generations():
+        return get_generations(EVENTS, FAMILIES)
+
+    before = generations()
+    events = Event.objects.bulk_create(
+        [Event(family=family, event_type=EventType.COUNT) for _ in range(3)]
+    )
+    after_create = generations()
+    assert after_create[EVENTS] == before[EVENTS] + 1
+
+    for event in events:
+        event.count_data = {"TMint": 1}
+    Event.objects.bulk_update(events, ["count_data"])
+    Event.objects.filter(pk=events[0].pk).update(event_type=EventType.PICKUP)
+    assert generations()[EVENTS] == after_create[EVENTS] + 2
+
+    Family.objects.filter(pk=family.pk).update(grade=5)
+    assert generations()[FAMILIES] == after_create[FAMILIES] + 1
+
+    # Nothing matched, so nothing changed.
+    Event.objects.filter(pk=0).update(event_type=EventType.RETURN)
+    assert generations()[EVENTS] == after_create[EVENTS] + 2
+
+
+@pytest.mark.django_db
+def test_cached_snapshot_follows_bulk_updates(family):
+    event = Event.objects.create(
+        family=family, event_type=EventType.PICKUP, count_data={"TMint": 2}
+    )
+    assert holdings_snapshot()[0]["holdings"]["TMint"] == 2
+
+    Event.objects.filter(pk=event.pk).update(count_data={"TMint": 7})
+    assert holdings_snapshot()[0]["holdings"]["TMint"] == 7
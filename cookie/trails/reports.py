@@ -0,0 +1,171 @@
+"""
+Report generation for exports that are too slow to build inside a request.
+
+Most report kinds are generators of CSV rows; others build a whole file at
+once. `build_report` runs one for a `Report` row, recording progress as it
+goes where it can, and stores the finished file on the row until it
+expires.
+"""
+
+import csv
+import io
+import tempfile
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+
+from django.utils import timezone
+
+from .analytics import ANALYTICS_CONTENT_TYPE, write_analytics
+from .cookies import COOKIE_POPULARITY
+from .generations import EVENTS, FAMILIES
+from .ledger import ledger_csv_header, ledger_csv_row, ledger_lines
+from .models import Event, EventType, Family, Report, ReportKind, ReportStatus
+from .report_cache import generation_cached
+from .routers import iterate_from_reports, reading_from_reports
+
+REPORT_RETENTION = timedelta(days=7)
+PROGRESS_EVERY = 500
+
+
+def initial_orders_rows() -> Iterator[list]:
+    """One row per family with their initial order, in cases."""
+    variety_codes = list(COOKIE_POPULARITY.keys())
+    header = ["Scout Name", "Email", "Grade", "Order Date"]
+    header.extend(v.value for v in variety_codes)
+    header.append("Total Cases")
+    yield header
+
+    # Build a map of family_id -> order for quick lookup
+    orders = Event.objects.filter(event_type=EventType.COOKIE_ORDER)
+    orders_by_family = {order.family_id: order for order in orders}
+
+    # Data rows - one per family, ordered by scout_name
+    for family in Family.objects.order_by("scout_name"):
+        order = orders_by_family.get(family.pk)
+        row = [
+            family.scout_name,
+            family.email,
+            family.grade,
+            order.created_at.strftime("%Y-%m-%d %H:%M") if order else "",
+        ]
+        total = 0
+        for variety in variety_codes:
+            count = order.count_data.get(variety.value, 0) if order else 0
+            row.append(count)
+            total += count
+        row.append(total)
+        yield row
+
+
+@generation_cached(EVENTS, FAMILIES)
+def initial_orders_table() -> list[list]:
+    """`initial_orders_rows`, built once per change to events or families."""
+    return list(initial_orders_rows())
+
+
+def reconciliation_rows() -> Iterator[list]:
+    """One row per event with running balances; see `ledger`."""
+    yield ledger_csv_header()
+    for line in ledger_lines():
+        yield ledger_csv_row(line)
+
+
+def analytics_file() -> bytes:
+    """A snapshot of this season; see `analytics`."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "analytics.sqlite3"
+        write_analytics(path)
+        return path.read_bytes()
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    estimate_rows: Callable[[], int]
+    filename: str
+    # Either CSV rows, header first...
+    rows: Callable[[], Iterator[list]] | None = None
+    # ...or the whole file at once, with no progress along the way.
+    build: Callable[[], bytes] | None = None
+    content_type: str = "text/csv"
+
+
+REPORT_SPECS: dict[str, ReportSpec] = {
+    ReportKind.INITIAL_ORDERS: ReportSpec(
+        rows=initial_orders_rows,
+        estimate_rows=lambda: Family.objects.count(),
+        filename="initial_orders.csv",
+    ),
+    ReportKind.RECONCILIATION: ReportSpec(
+        rows=reconciliation_rows,
+        estimate_rows=lambda: Event.objects.count(),
+        filename="reconciliation.csv",
+    ),
+    ReportKind.ANALYTICS: ReportSpec(
+        build=analytics_file,
+        estimate_rows=lambda: Event.objects.count(),
+        filename="analytics.sqlite3",
+        content_type=ANALYTICS_CONTENT_TYPE,
+    ),
+}
+
+
+def _set_progress(report: Report, **fields) -> None:
+    for name, value in fields.items():
+        setattr(report, name, value)
+    Report.objects.filter(pk=report.pk).update(**fields)
+
+
+def _csv_content(report: Report, rows: Iterator[list]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # Progress updates are writes, so they still go to the primary.
+    rows = iterate_from_reports(rows)
+    writer.writerow(next(rows))
+    for written, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if written % PROGRESS_EVERY == 0:
+            _set_progress(report, progress=written)
+    return buffer.getvalue().encode()
+
+
+def build_report(report: Report) -> None:
+    """Generate a report's file, tracking progress on the row as it goes."""
+    spec = REPORT_SPECS[report.kind]
+    with reading_from_reports():
+        total = spec.estimate_rows()
+    _set_progress(report, status=ReportStatus.RUNNING, progress=0, total=total)
+
+    try:
+        if spec.build is not None:
+            content = spec.build()
+        else:
+            content = _csv_content(report, spec.rows())
+    except Exception as e:
+        _set_progress(
+            report,
+            status=ReportStatus.FAILED,
+            error=f"{type(e).__name__}: {e}",
+            finished_at=timezone.now(),
+            expires_at=timezone.now() + REPORT_RETENTION,
+        )
+        raise
+
+    now = timezone.now()
+    _set_progress(
+        report,
+        status=ReportStatus.SUCCEEDED,
+        progress=report.total or 0,
+        filename=spec.filename,
+        content_type=spec.content_type,
+        content=content,
+        finished_at=now,
+        expires_at=now + REPORT_RETENTION,
+    )
+
+
+def prune_expired_reports() -> int:
+    """Delete reports past their expiry, returning how many were removed."""
+    deleted, _ = Report.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Event, EventType, Family, Report, ReportKind, ReportStatus
+from .reports import build_report, prune_expired_reports
+from .tasks import request_report
+
+
+@pytest.fixture
+def family():
+    family = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    Event.objects.create(
+        family=family, event_type=EventType.COOKIE_ORDER, count_data={"TMint": 2}
+    )
+    return family
+
+
+@pytest.mark.django_db
+def test_build_report_stores_content_and_expiry(family):
+    report = Report.objects.create(kind=ReportKind.INITIAL_ORDERS)
+    build_report(report)
+
+    report.refresh_from_db()
+    assert report.status == ReportStatus.SUCCEEDED
+    assert report.progress == report.total == 1
+    assert report.filename == "initial_orders.csv"
+    assert report.expires_at > timezone.now()
+    lines = bytes(report.content).decode().splitlines()
+    assert lines[0].startswith("Scout Name,Email,Grade,Order Date,TMint")
+    assert lines[1].startswith("Ada,ada@example.com,4,")
+    assert lines[1].endswith(",2")
+
+
+@pytest.mark.django_db
+def test_request_report_queues_without_running(family):
+    # The test settings use the database backend with no worker running.
+    report = request_report(ReportKind.RECONCILIATION)
+    report.refresh_from_db()
+    assert report.status == ReportStatus.PENDING
+    assert report.task_id
+
+
+@pytest.mark.django_db
+def test_request_report_and_download(admin_client, family, settings):
+    settings.TASKS = {
+        "default": {"BACKEND": "django.tasks.backends.immediate.ImmediateBackend"}
+    }
+    response = admin_client.post(
+        reverse("reports"), {"kind": ReportKind.RECONCILIATION}
+    )
+    assert response.status_code == 302
+
+    report = Report.objects.get()
+    assert report.status == ReportStatus.SUCCEEDED
+    response = admin_client.get(reverse("report_download", args=[report.pk]))
+    assert response.status_code == 200
+    assert response.content.startswith(b"Family ID,Scout Name")
+
+
+@pytest.mark.django_db
+def test_prune_expired_reports():
+    Report.objects.create(
+        kind=ReportKind.INITIAL_ORDERS,
+        expires_at=timezone.now() - timedelta(minutes=1),
+    )
+    kept = Report.objects.create(kind=ReportKind.INITIAL_ORDERS)
+    assert prune_expired_reports() == 1
+    assert list(Report.objects.all()) == [kept]
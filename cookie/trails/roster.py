@@ -0,0 +1,244 @@
+"""
+Roster import: merge a list of families into the database.
+
+Rows are matched to existing families by normalized (trimmed, lowercased)
+email. New families are added and changed ones updated in batches with a
+single upsert per batch; families missing from the roster are left alone,
+as are all of their events.
+
+CSV rows are streamed. Column names are matched loosely, so both our own
+exports ("Scout Name", "Email", "Grade") and typical council roster exports
+("Girl First Name", "Girl Last Name", "Parent Email", "Grade Level") work.
+JSON input may be a list of objects, a `loaddata` fixture, or JSON Lines
+(one object per line, streamed).
+"""
+
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import IO, Any
+
+from django.db import transaction
+
+from .models import Family
+
+ROSTER_BATCH_SIZE = 1000
+ROSTER_FIELDS = ("scout_name", "email", "grade")
+
+# Normalized header -> roster field. Headers are lowercased and stripped of
+# anything but letters before lookup.
+_HEADER_ALIASES = {
+    "scoutname": "scout_name",
+    "scout": "scout_name",
+    "name": "scout_name",
+    "girlname": "scout_name",
+    "firstname": "first_name",
+    "girlfirstname": "first_name",
+    "lastname": "last_name",
+    "girllastname": "last_name",
+    "email": "email",
+    "parentemail": "email",
+    "caregiveremail": "email",
+    "grade": "grade",
+    "gradelevel": "grade",
+    "girlgrade": "grade",
+}
+
+_KINDERGARTEN = {"k", "kindergarten"}
+
+
+class RosterError(Exception):
+    pass
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+@dataclass(frozen=True)
+class RosterRow:
+    line: int
+    scout_name: str
+    email: str
+    grade: int
+
+
+@dataclass
+class RosterChange:
+    family_id: int
+    row: RosterRow
+    # Field name -> (old value, new value)
+    changes: dict[str, tuple[Any, Any]]
+
+
+@dataclass
+class RosterDiff:
+    added: list[RosterRow] = field(default_factory=list)
+    changed: list[RosterChange] = field(default_factory=list)
+    unchanged: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.changed)} changed, "
+            f"{self.unchanged} unchanged, {len(self.errors)} skipped"
+        )
+
+
+def _normalize_header(header: str) -> str:
+    return "".join(c for c in header.lower() if c.isalpha())
+
+
+def _parse_grade(value: Any) -> int:
+    text = str(value).strip().lower()
+    if text in _KINDERGARTEN:
+        return 0
+    # Accept "4", "4th" or "Grade 4".
+    digits = "".join(c for c in text if c.isdigit())
+    if not digits:
+        raise RosterError(f"Invalid grade {value!r}.")
+    return int(digits)
+
+
+def _parse_row(line: int, record: dict[str, Any]) -> RosterRow:
+    # JSON rosters can hold anything; CSV rows are always dicts.
+    if not isinstance(record, dict):
+        raise RosterError(f"Expected an object of fields, not {record!r}.")
+    values: dict[str, Any] = {}
+    for key, value in record.items():
+        name = _HEADER_ALIASES.get(_normalize_header(str(key)))
+        if name and value not in (None, ""):
+            values.setdefault(name, value)
+
+    scout_name = str(values.get("scout_name", "")).strip()
+    if not scout_name:
+        first = str(values.get("first_name", "")).strip()
+        last = str(values.get("last_name", "")).strip()
+        scout_name = f"{first} {last[:1]}".strip() if last else first
+    email = normalize_email(str(values.get("email", "")))
+    if not scout_name:
+        raise RosterError("Missing scout name.")
+    if "@" not in email:
+        raise RosterError("Missing or invalid email.")
+    if "grade" not in values:
+        raise RosterError("Missing grade.")
+    return RosterRow(
+        line=line,
+        scout_name=scout_name[: Family._meta.get_field("scout_name").max_length],
+        email=email,
+        grade=_parse_grade(values["grade"]),
+    )
+
+
+def read_csv_records(stream: IO[str]) -> Iterator[tuple[int, dict]]:
+    """Yield (line number, record) pairs from a CSV file with a header row."""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_json_records(stream: IO[str]) -> Iterator[tuple[int, dict]]:
+    """Yield (index, record) pairs from a JSON list or `loaddata` fixture."""
+    for index, record in enumerate(json.load(stream), start=1):
+        # A fixture keeps the interesting parts under "fields".
+        if isinstance(record, dict) and "fields" in record:
+            record = record["fields"]
+        yield index, record
+
+
+def read_json_lines_records(stream: IO[str]) -> Iterator[tuple[int, dict]]:
+    """Yield (line number, record) pairs from JSON Lines, one line at a time."""
+    for line, text in enumerate(stream, start=1):
+        if text.strip():
+            yield line, json.loads(text)
+
+
+def read_records(stream: IO[str], name: str) -> Iterator[tuple[int, dict]]:
+    """Pick a reader based on the file name."""
+    lowered = name.lower()
+    if lowered.endswith((".jsonl", ".ndjson")):
+        return read_json_lines_records(stream)
+    if lowered.endswith(".json"):
+        return read_json_records(stream)
+    return read_csv_records(stream)
+
+
+def open_upload(upload: IO[bytes]) -> IO[str]:
+    """Wrap an uploaded (binary) file for reading as text."""
+    return io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+
+
+def _batches(rows: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_roster(
+    records: Iterable[tuple[int, dict]],
+    *,
+    dry_run: bool = False,
+    batch_size: int = ROSTER_BATCH_SIZE,
+) -> RosterDiff:
+    """Merge roster records into the families table, returning what changed."""
+    diff = RosterDiff()
+    with transaction.atomic():
+        existing: dict[str, tuple] = {}
+        for family in Family.objects.values_list("pk", *ROSTER_FIELDS).iterator(
+            chunk_size=batch_size
+        ):
+            existing[normalize_email(family[2])] = family
+
+        def upserts() -> Iterator[Family]:
+            seen: set[str] = set()
+            for line, record in records:
+                try:
+                    row = _parse_row(line, record)
+                except RosterError as e:
+                    diff.errors.append(f"Row {line}: {e}")
+                    continue
+                if row.email in seen:
+                    diff.errors.append(f"Row {line}: duplicate email {row.email}.")
+                    continue
+                seen.add(row.email)
+
+                match = existing.get(row.email)
+                if match is None:
+                    diff.added.append(row)
+                    yield Family(
+                        scout_name=row.scout_name, email=row.email, grade=row.grade
+                    )
+                    continue
+                pk, *old_values = match
+                changes = {
+                    name: (old, getattr(row, name))
+                    for name, old in zip(ROSTER_FIELDS, old_values)
+                    if old != getattr(row, name)
+                }
+                if not changes:
+                    diff.unchanged += 1
+                    continue
+                diff.changed.append(
+                    RosterChange(family_id=pk, row=row, changes=changes)
+                )
+                yield Family(
+                    pk=pk, scout_name=row.scout_name, email=row.email, grade=row.grade
+                )
+
+        for batch in _batches(upserts(), batch_size):
+            if dry_run:
+                continue
+            Family.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=list(ROSTER_FIELDS),
+            )
+    return diff
@@ -0,0 +1,96 @@
+import io
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from .generations import FAMILIES, get_generations
+from .models import Event, EventType, Family
+from .roster import (
+    import_roster,
+    read_csv_records,
+    read_json_lines_records,
+    read_json_records,
+)
+
+ROSTER_CSV = """\
+Girl First Name,Girl Last Name,Parent Email,Grade Level
+Ada,Lovelace,ADA@example.com ,5
+Bea,Arthur,bea@example.com,K
+Cal,Ripken,cal@example.com,3
+,,nobody@example.com,2
+Dup,Licate,cal@example.com,3
+"""
+
+
+@pytest.mark.django_db
+def test_import_roster_adds_updates_and_diffs():
+    ada = Family.objects.create(scout_name="Ada L", email="Ada@Example.com", grade=4)
+    Family.objects.create(scout_name="Bea A", email="bea@example.com", grade=0)
+    gone = Family.objects.create(scout_name="Gil", email="gil@example.com", grade=1)
+    Event.objects.create(family=ada, event_type=EventType.PICKUP)
+    before = get_generations(FAMILIES)[FAMILIES]
+
+    diff = import_roster(read_csv_records(io.StringIO(ROSTER_CSV)), batch_size=2)
+
+    assert [row.scout_name for row in diff.added] == ["Cal R"]
+    assert [change.family_id for change in diff.changed] == [ada.pk]
+    assert diff.changed[0].changes == {
+        "email": ("Ada@Example.com", "ada@example.com"),
+        "grade": (4, 5),
+    }
+    assert diff.unchanged == 1
+    assert len(diff.errors) == 2
+
+    ada.refresh_from_db()
+    assert (ada.email, ada.grade) == ("ada@example.com", 5)
+    assert ada.events.count() == 1
+    assert Family.objects.filter(pk=gone.pk).exists()
+    assert Family.objects.count() == 4
+    assert get_generations(FAMILIES)[FAMILIES] > before
+
+
+@pytest.mark.django_db
+def test_import_roster_dry_run_and_fixtures():
+    fixture = '[{"model": "trails.family", "pk": 7, "fields": {"scout_name": "Ada", "email": "ada@example.com", "grade": 4}}]'
+
+    diff = import_roster(read_json_records(io.StringIO(fixture)), dry_run=True)
+    assert len(diff.added) == 1
+    assert not Family.objects.exists()
+
+    import_roster(read_json_records(io.StringIO(fixture)))
+    diff = import_roster(read_json_records(io.StringIO(fixture)))
+    assert diff.unchanged == 1
+    assert Family.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_import_roster_reports_records_that_arent_objects():
+    lines = '{"name": "Ada", "email": "ada@example.com", "grade": 4}\n["Bea"]\n7\n'
+    diff = import_roster(read_json_lines_records(io.StringIO(lines)))
+    assert diff.errors == [
+        "Row 2: Expected an object of fields, not ['Bea'].",
+        "Row 3: Expected an object of fields, not 7.",
+    ]
+    assert Family.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_roster_upload(admin_client, plain_static):
+    upload = SimpleUploadedFile("roster.csv", ROSTER_CSV.encode(), "text/csv")
+    response = admin_client.post(reverse("roster_import"), {"roster": upload})
+    assert response.status_code == 200
+    assert response.context["diff"].summary() == (
+        "3 added, 0 changed, 0 unchanged, 2 skipped"
+    )
+    assert Family.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_import_roster_command_reports_an_unreadable_file(tmp_path):
+    path = tmp_path / "roster.json"
+    path.write_text('[{"scout_name": "Ada",')
+    with pytest.raises(CommandError, match="as a roster"):
+        call_command("import_roster", str(path), stdout=io.StringIO())
+    assert not Family.objects.exists()
@@ -0,0 +1,149 @@
+"""
+Database routing for read-only reporting traffic.
+
+When a `reports` database is configured (usually a Postgres read replica),
+reads made inside `reading_from_reports()`, or by views decorated with
+`reports_database`, go to it. Everything else, including every write, stays
+on the primary. If the replica falls further behind than
+REPORTS_DATABASE_MAX_LAG seconds, or can't be reached, reads fall back to
+the primary until it catches up.
+"""
+
+import itertools
+import threading
+import time
+from collections.abc import AsyncIterator, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+
+REPORTS_DB_ALIAS = "reports"
+LAG_CHECK_INTERVAL = 5.0
+
+_reading_reports: ContextVar[bool] = ContextVar("reading_reports", default=False)
+_lag_lock = threading.Lock()
+_lag_checked_at = float("-inf")
+_lag_ok = False
+
+# On a streaming replica, 0 when it has replayed everything it has received,
+# otherwise the age of the last replayed transaction. NULL (so 0) when the
+# server isn't a replica at all.
+_PG_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+"""
+
+
+def _replica_lag_seconds() -> float:
+    connection = connections[REPORTS_DB_ALIAS]
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(_PG_LAG_SQL)
+        (lag,) = cursor.fetchone()
+    return float(lag or 0)
+
+
+def reports_database_available() -> bool:
+    """Whether the reports database is configured and close enough to current."""
+    global _lag_checked_at, _lag_ok
+    if REPORTS_DB_ALIAS not in connections.settings:
+        return False
+    with _lag_lock:
+        now = time.monotonic()
+        if now - _lag_checked_at >= LAG_CHECK_INTERVAL:
+            try:
+                lag = _replica_lag_seconds()
+            except DatabaseError:
+                _lag_ok = False
+            else:
+                _lag_ok = lag <= settings.REPORTS_DATABASE_MAX_LAG
+            _lag_checked_at = now
+        return _lag_ok
+
+
+@contextmanager
+def reading_from_reports():
+    """Send reads made inside this block to the reports database."""
+    token = _reading_reports.set(True)
+    try:
+        yield
+    finally:
+        _reading_reports.reset(token)
+
+
+def iterate_from_reports(iterable: Iterable) -> Iterator:
+    """Iterate with reads going to the reports database.
+
+    For streaming responses, whose rows are produced after the view returns.
+    """
+    with reading_from_reports():
+        yield from iterable
+
+
+async def aiterate_from_reports(
+    iterable: Iterable, batch_size: int = GET_ITERATOR_CHUNK_SIZE
+) -> AsyncIterator:
+    """Like `iterate_from_reports`, for streaming responses served over ASGI.
+
+    Django would read a sync iterator into a list before sending anything;
+    this pulls `batch_size` items at a time on the request's sync thread
+    (where its database connection lives) and hands each batch on.
+    """
+    iterator = iter(iterable)
+
+    def next_batch() -> list:
+        with reading_from_reports():
+            return list(itertools.islice(iterator, batch_size))
+
+    def close() -> None:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+    try:
+        while batch := await sync_to_async(next_batch)():
+            for item in batch:
+                yield item
+    finally:
+        await sync_to_async(close)()
+
+
+def reports_database(view_func: Any) -> Any:
+    """Decorator for read-only views that may be served from the reports database."""
+
+    @wraps(view_func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with reading_from_reports():
+            return view_func(*args, **kwargs)
+
+    return wrapper
+
+
+class ReportsRouter:
+    def db_for_read(self, model, **hints) -> str | None:
+        if _reading_reports.get() and reports_database_available():
+            return REPORTS_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints) -> str:
+        # Without this, saving an object that was read from the replica would
+        # try to write it back there.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Both databases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        # The replica gets its schema from the primary.
+        return db != REPORTS_DB_ALIAS
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+
+import pytest
+from django.urls import reverse
+
+from . import admin, routers
+from .models import Event, EventType, Family
+from .routers import ReportsRouter, iterate_from_reports, reading_from_reports
+
+
+@pytest.fixture
+def replica_available(monkeypatch):
+    monkeypatch.setattr(routers, "reports_database_available", lambda: True)
+
+
+def test_reads_stay_on_primary_outside_reports_block(replica_available):
+    assert ReportsRouter().db_for_read(Family) is None
+
+
+def test_reads_go_to_reports_inside_block(replica_available):
+    with reading_from_reports():
+        assert ReportsRouter().db_for_read(Family) == "reports"
+    assert ReportsRouter().db_for_read(Family) is None
+
+
+def test_reads_fall_back_when_replica_unavailable(monkeypatch):
+    monkeypatch.setattr(routers, "reports_database_available", lambda: False)
+    with reading_from_reports():
+        assert ReportsRouter().db_for_read(Family) is None
+
+
+def test_writes_always_go_to_primary(replica_available):
+    with reading_from_reports():
+        assert ReportsRouter().db_for_write(Family) == "default"
+
+
+def test_iterate_from_reports_routes_each_item(replica_available):
+    def databases():
+        for _ in range(2):
+            yield ReportsRouter().db_for_read(Family)
+
+    assert list(iterate_from_reports(databases())) == ["reports", "reports"]
+
+
+def test_unconfigured_reports_database_is_unavailable():
+    assert not routers.reports_database_available()
+
+
+@pytest.mark.django_db
+def test_changelist_after_a_write_reads_the_primary(
+    admin_client, monkeypatch, plain_static
+):
+    pages = []
+
+    @contextmanager
+    def recording():
+        pages.append("reports")
+        yield
+
+    monkeypatch.setattr(admin, "reading_from_reports", recording)
+    family = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    event = Event.objects.create(family=family, event_type=EventType.COUNT)
+    url = reverse("admin:trails_event_changelist")
+
+    admin_client.get(url)
+    assert pages == ["reports"]
+
+    # The redirect back after an action carries its message, and lists the
+    # voided event as gone even if the replica hasn't seen that yet.
+    response = admin_client.post(
+        url, {"action": "void", "_selected_action": [event.pk]}, follow=True
+    )
+    assert list(response.context["messages"])
+    assert pages == ["reports"]
+
+    admin_client.get(url)
+    assert pages == ["reports", "reports"]
@@ -0,0 +1,125 @@
+"""
+Closing out a cookie season.
+
+Every event carries the season it was created in. Once a season is over,
+`close_season` records each family's final figures as SeasonBalance rows and
+then moves the season's events out of the live Event table into
+ArchivedEvent (or, when compacting, drops them), so the queries behind the
+forms, dashboards, exports and API only scan seasons still in play.
+"""
+
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+
+from .generations import EVENTS, bump_generation
+from .inventory import empty_holdings, family_holdings
+from .models import ArchivedEvent, Event, SeasonBalance, current_season
+from .money import family_money
+
+ARCHIVE_BATCH_SIZE = 1000
+
+
+class SeasonError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class SeasonClose:
+    season: int
+    families: int
+    # Events moved to the archive, or dropped when compacting.
+    events: int
+    compacted: bool
+
+
+def snapshot_balances(season: int) -> int:
+    """Record every family's final figures for a season, returning how many."""
+    family_ids = list(
+        Event.objects.filter(season=season)
+        .order_by()
+        .values_list("family_id", flat=True)
+        .distinct()
+    )
+    holdings = family_holdings(family_ids, season=season)
+    balances = [
+        SeasonBalance(
+            season=season,
+            family_id=money.family_id,
+            holdings=holdings.get(money.family_id, empty_holdings()),
+            ordered_cents=money.ordered_cents,
+            held_cents=money.held_cents,
+        )
+        for money in family_money(family_ids, season=season)
+    ]
+    SeasonBalance.objects.bulk_create(balances)
+    return len(balances)
+
+
+def _archived(event: Event) -> ArchivedEvent:
+    return ArchivedEvent(
+        id=event.pk,
+        season=event.season,
+        created_at=event.created_at,
+        updated_at=event.updated_at,
+        event_type=event.event_type,
+        family_id=event.family_id,
+        count_data=event.count_data,
+        unit=event.unit,
+        extra=event.extra,
+        idempotency_key=event.idempotency_key,
+        location_id=event.location_id,
+    )
+
+
+def _delete_events(ids: list[int]) -> None:
+    # A plain DELETE through the cursor. QuerySet.delete() would send a
+    # post_delete signal per row, each republishing a family's holdings to
+    # live dashboards; the caller's one generation bump stands in for them.
+    # Nothing has a foreign key to Event, so there's nothing to cascade.
+    table = connection.ops.quote_name(Event._meta.db_table)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+
+
+def close_season(
+    season: int, *, compact: bool = False, batch_size: int = ARCHIVE_BATCH_SIZE
+) -> SeasonClose:
+    """Snapshot a finished season's balances and clear its events out.
+
+    Safe to run again after an interruption: the snapshot is only taken
+    once, and each batch of events moves in its own transaction.
+    """
+    if season >= current_season():
+        raise SeasonError(f"Season {season} is still open.")
+
+    with transaction.atomic():
+        families = SeasonBalance.objects.filter(season=season).count()
+        if not families:
+            families = snapshot_balances(season)
+
+    # Voided events never counted for anything; they go without archiving.
+    voided = Event.all_objects.filter(season=season, voided_at__isnull=False)
+    while ids := list(voided.order_by("pk").values_list("pk", flat=True)[:batch_size]):
+        with transaction.atomic():
+            _delete_events(ids)
+            bump_generation(EVENTS)
+
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Event.objects.filter(season=season).order_by("pk")[:batch_size]
+            )
+            if not batch:
+                break
+            if not compact:
+                ArchivedEvent.objects.bulk_create(_archived(event) for event in batch)
+            _delete_events([event.pk for event in batch])
+            bump_generation(EVENTS)
+        moved += len(batch)
+
+    return SeasonClose(
+        season=season, families=families, events=moved, compacted=compact
+    )
@@ -0,0 +1,136 @@
+from datetime import datetime
+from io import StringIO
+from zoneinfo import ZoneInfo
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from .generations import EVENTS, get_generations
+from .models import (
+    ArchivedEvent,
+    CountUnit,
+    Event,
+    EventType,
+    SeasonBalance,
+    current_season,
+    season_for,
+)
+from .money import PRICE_CENTS
+from .seasons import SeasonError, close_season
+
+PACIFIC = ZoneInfo("America/Los_Angeles")
+
+
+def test_season_for_rolls_over_in_october():
+    assert season_for(datetime(2026, 3, 1, tzinfo=PACIFIC)) == 2026
+    assert season_for(datetime(2026, 9, 30, 23, tzinfo=PACIFIC)) == 2026
+    assert season_for(datetime(2026, 10, 1, tzinfo=PACIFIC)) == 2027
+
+
+@pytest.mark.django_db
+def test_new_events_belong_to_the_current_season(family):
+    event = Event.objects.create(family=family, event_type=EventType.COUNT)
+    assert event.season == current_season()
+
+
+@pytest.mark.django_db
+def test_close_season_snapshots_balances_and_archives_events(family):
+    last = current_season() - 1
+    order = Event.objects.create(
+        family=family,
+        event_type=EventType.COOKIE_ORDER,
+        unit=CountUnit.CASE,
+        count_data={"TMint": 1},
+        season=last,
+    )
+    Event.objects.create(
+        family=family,
+        event_type=EventType.PICKUP,
+        count_data={"TMint": 5},
+        season=last,
+    )
+    Event.objects.create(
+        family=family,
+        event_type=EventType.RETURN,
+        count_data={"TMint": 2},
+        season=last,
+    )
+    live = Event.objects.create(
+        family=family, event_type=EventType.PICKUP, count_data={"Sam": 4}
+    )
+    before = get_generations(EVENTS)[EVENTS]
+
+    result = close_season(last, batch_size=2)
+
+    assert (result.families, result.events, result.compacted) == (1, 3, False)
+    balance = SeasonBalance.objects.get(season=last, family=family)
+    assert balance.holdings["TMint"] == 3
+    assert balance.holdings["Sam"] == 0
+    assert balance.ordered_cents == 12 * PRICE_CENTS["TMint"]
+    assert balance.held_cents == 3 * PRICE_CENTS["TMint"]
+    assert list(Event.objects.values_list("pk", flat=True)) == [live.pk]
+    archived = ArchivedEvent.objects.get(pk=order.pk)
+    assert archived.created_at == order.created_at
+    assert archived.count_data == order.count_data
+    assert ArchivedEvent.objects.filter(season=last).count() == 3
+    assert get_generations(EVENTS)[EVENTS] > before
+
+
+@pytest.mark.django_db
+def test_close_season_again_keeps_the_first_snapshot(family):
+    last = current_season() - 1
+    Event.objects.create(
+        family=family, event_type=EventType.PICKUP, count_data={"Tre": 6}, season=last
+    )
+    close_season(last)
+    result = close_season(last)
+
+    assert (result.families, result.events) == (1, 0)
+    assert SeasonBalance.objects.get().holdings["Tre"] == 6
+
+
+@pytest.mark.django_db
+def test_close_season_compact_drops_events(family):
+    last = current_season() - 1
+    Event.objects.create(family=family, event_type=EventType.COUNT, season=last)
+    result = close_season(last, compact=True)
+
+    assert result.events == 1
+    assert not Event.objects.exists()
+    assert not ArchivedEvent.objects.exists()
+    assert SeasonBalance.objects.filter(season=last).count() == 1
+
+
+@pytest.mark.django_db
+def test_close_season_drops_voided_events_unarchived(family):
+    last = current_season() - 1
+    kept, voided = Event.objects.bulk_create(
+        Event(family=family, event_type=EventType.COUNT, season=last) for _ in range(2)
+    )
+    Event.objects.filter(pk=voided.pk).update(voided_at=timezone.now())
+    result = close_season(last, batch_size=1)
+
+    assert result.events == 1
+    assert not Event.all_objects.exists()
+    assert list(ArchivedEvent.objects.values_list("pk", flat=True)) == [kept.pk]
+
+
+@pytest.mark.django_db
+def test_close_season_refuses_the_current_season(family):
+    Event.objects.create(family=family, event_type=EventType.COUNT)
+    with pytest.raises(SeasonError):
+        close_season(current_season())
+    with pytest.raises(CommandError):
+        call_command("close_season", str(current_season()))
+    assert Event.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_close_season_command(family):
+    last = current_season() - 1
+    Event.objects.create(family=family, event_type=EventType.COUNT, season=last)
+    out = StringIO()
+    call_command("close_season", str(last), stdout=out)
+    assert f"Closed season {last}" in out.getvalue()
+    assert "Archived 1 events" in out.getvalue()
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .broker import inventory_broker
+from .generations import EVENTS, FAMILIES, bump_generation
+from .inventory import holdings_for_family
+from .models import Event, Family
+
+
+def _publish_holdings(family_id: int) -> None:
+    """Push a family's holdings to live dashboards once the write commits."""
+    transaction.on_commit(
+        lambda: inventory_broker.publish("holdings", holdings_for_family(family_id))
+    )
+
+
+# Saves bump it themselves while stamping sync_seq; see Event.save.
+@receiver(post_delete, sender=Event)
+def bump_event_generation(sender, **kwargs) -> None:
+    bump_generation(EVENTS)
+
+
+@receiver(post_save, sender=Family)
+@receiver(post_delete, sender=Family)
+def bump_family_generation(sender, **kwargs) -> None:
+    bump_generation(FAMILIES)
+
+
+@receiver(pre_save, sender=Event)
+def remember_previous_family(sender, instance: Event, **kwargs) -> None:
+    # An edit that moves an event to another family changes two families'
+    # holdings; note the old one so it can be republished too.
+    if not instance._state.adding:
+        instance._previous_family_id = (
+            Event.objects.filter(pk=instance.pk)
+            .values_list("family_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def publish_event_holdings(sender, instance: Event, **kwargs) -> None:
+    _publish_holdings(instance.family_id)
+    previous_family_id = getattr(instance, "_previous_family_id", None)
+    if previous_family_id not in (None, instance.family_id):
+        _publish_holdings(previous_family_id)
+
+
+@receiver(post_save, sender=Family)
+@receiver(post_delete, sender=Family)
+def publish_family_holdings(sender, instance: Family, **kwargs) -> None:
+    _publish_holdings(instance.pk)
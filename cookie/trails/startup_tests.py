@@ -0,0 +1,73 @@
+"""
+Worker boot benchmark.
+
+Boots the ASGI application that production serves (and its URLconf, which
+the first request would otherwise load) in a fresh interpreter under
+`python -X importtime`, and fails if it pulls in development tooling or
+grows well past today's size.
+Run `just startup` to see where the time goes.
+"""
+
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+BOOT = (
+    "import cookie.asgi; "
+    "from django.urls import get_resolver; "
+    "get_resolver().url_patterns"
+)
+
+DEV_ONLY_MODULES = ("django_browser_reload", "servestatic.runserver_nostatic")
+
+# About 700 modules and 0.4 seconds at the time of writing; the budgets
+# leave room for slow CI machines but catch a heavy new import.
+MAX_BOOT_MODULES = 850
+MAX_BOOT_SECONDS = 2.0
+
+
+def _import_profile(*, debug: bool) -> tuple[dict[str, int], int]:
+    """Modules imported during boot, with cumulative microseconds, and the total."""
+    env = {
+        **os.environ,
+        "DEBUG": str(debug),
+        "DJANGO_SETTINGS_MODULE": "cookie.settings",
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules: dict[str, int] = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        modules[name.strip()] = int(cumulative)
+        # Top-level imports aren't indented; their times include everything else.
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return modules, total
+
+
+def test_production_boot_skips_dev_tooling_and_stays_in_budget():
+    modules, total = _import_profile(debug=False)
+    dev_only = [m for m in modules if m.startswith(DEV_ONLY_MODULES)]
+    assert not dev_only, f"Production boot imported dev tooling: {dev_only}"
+    assert len(modules) <= MAX_BOOT_MODULES, (
+        f"Boot imported {len(modules)} modules (budget {MAX_BOOT_MODULES})"
+    )
+    assert total / 1_000_000 <= MAX_BOOT_SECONDS, (
+        f"Boot imports took {total / 1_000_000:.2f}s (budget {MAX_BOOT_SECONDS}s)"
+    )
+
+
+def test_debug_boot_loads_dev_tooling():
+    modules, _ = _import_profile(debug=True)
+    assert any(m.startswith("django_browser_reload") for m in modules)
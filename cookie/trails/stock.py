@@ -0,0 +1,178 @@
+"""
+Troop stock at each location.
+
+Stock counters change only here. Each change locks the LocationStock rows it
+touches, in a fixed order so two writers can't deadlock, checks that no
+counter would drop below zero, and applies the change with an F() expression
+so the database does the arithmetic. Two managers entering pickups at the
+same moment queue up on the row lock; the second sees what the first left
+and is refused if there isn't enough.
+
+Pickups and returns at a location move boxes out of and into its stock in
+the same transaction that records the event (see `sync.record_event`), or
+that edits or voids it (see the event admin and `bulk.py`).
+Transfers move boxes between locations; a transfer with no source is a
+delivery from the bakery.
+"""
+
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .cookies import CookieVariety
+from .models import Event, EventType, Location, LocationStock, StockTransfer
+
+# location id -> variety code -> change in boxes
+StockChanges = dict[int, dict[str, int]]
+
+
+class StockError(Exception):
+    """A change would take more boxes from a location than it holds."""
+
+
+def _lock(changes: StockChanges) -> dict[tuple[int, str], LocationStock]:
+    keys = [
+        (location_id, code)
+        for location_id, deltas in changes.items()
+        for code in deltas
+    ]
+    # Counters spring into being at zero the first time they're touched.
+    LocationStock.objects.bulk_create(
+        [
+            LocationStock(location_id=location_id, variety=code)
+            for location_id, code in keys
+        ],
+        ignore_conflicts=True,
+    )
+    rows = (
+        LocationStock.objects.select_for_update()
+        .filter(location_id__in=changes, variety__in={code for _, code in keys})
+        .order_by("location_id", "variety")
+    )
+    return {(row.location_id, row.variety): row for row in rows}
+
+
+def _nonzero(changes: StockChanges) -> StockChanges:
+    changes = {
+        location_id: {code: delta for code, delta in deltas.items() if delta}
+        for location_id, deltas in changes.items()
+    }
+    return {location_id: deltas for location_id, deltas in changes.items() if deltas}
+
+
+def _check(changes: StockChanges, on_hand: dict[tuple[int, str], int]) -> None:
+    shortages = [
+        (location_id, code, on_hand.get((location_id, code), 0))
+        for location_id, deltas in changes.items()
+        for code, delta in deltas.items()
+        if on_hand.get((location_id, code), 0) + delta < 0
+    ]
+    if shortages:
+        names = dict(Location.objects.filter(pk__in=changes).values_list("pk", "name"))
+        raise StockError(
+            "Not enough stock: "
+            + "; ".join(
+                f"{names[location_id]} has {boxes} {CookieVariety(code).label}"
+                for location_id, code, boxes in shortages
+            )
+            + "."
+        )
+
+
+def check_stock(changes: StockChanges) -> None:
+    """Raise StockError if changes would overdraw a counter, as of this moment.
+
+    Nothing is locked or applied; `adjust_stock` checks again under lock.
+    """
+    changes = _nonzero(changes)
+    on_hand = LocationStock.objects.filter(location_id__in=changes).values_list(
+        "location_id", "variety", "boxes"
+    )
+    _check(
+        changes, {(location_id, code): boxes for location_id, code, boxes in on_hand}
+    )
+
+
+def adjust_stock(changes: StockChanges) -> None:
+    """Apply changes to any number of counters: all of them, or none.
+
+    Raises StockError if any counter would go negative.
+    """
+    changes = _nonzero(changes)
+    if not changes:
+        return
+    with transaction.atomic():
+        rows = _lock(changes)
+        _check(changes, {key: row.boxes for key, row in rows.items()})
+        for location_id, deltas in changes.items():
+            for code, delta in deltas.items():
+                LocationStock.objects.filter(pk=rows[location_id, code].pk).update(
+                    boxes=F("boxes") + delta
+                )
+
+
+def stock_at(location: Location) -> dict[str, int]:
+    """Boxes of each variety at a location, as of this moment."""
+    boxes = dict.fromkeys((variety.value for variety in CookieVariety), 0)
+    boxes.update(location.stock.values_list("variety", "boxes"))
+    return boxes
+
+
+def troop_stock() -> dict[str, int]:
+    """Boxes of each variety across every location, as of this moment."""
+    boxes = dict.fromkeys((variety.value for variety in CookieVariety), 0)
+    boxes.update(
+        LocationStock.objects.order_by().values_list("variety").annotate(Sum("boxes"))
+    )
+    return boxes
+
+
+def event_stock_changes(event: Event) -> StockChanges:
+    """How recording an event changes stock: pickups take, returns give back."""
+    if event.location_id is None or event.voided_at is not None:
+        return {}
+    if event.event_type == EventType.PICKUP:
+        sign = -1
+    elif event.event_type == EventType.RETURN:
+        sign = 1
+    else:
+        return {}
+    return {
+        event.location_id: {code: sign * boxes for code, boxes in event.boxes.items()}
+    }
+
+
+def stock_changes_between(
+    before: Iterable[Event], after: Iterable[Event]
+) -> StockChanges:
+    """What replacing `before` with `after` does to location stock."""
+    total: StockChanges = {}
+    for events, sign in ((before, -1), (after, 1)):
+        for event in events:
+            for location_id, deltas in event_stock_changes(event).items():
+                location = total.setdefault(location_id, {})
+                for code, delta in deltas.items():
+                    location[code] = location.get(code, 0) + sign * delta
+    return total
+
+
+def transfer_stock(
+    source: Location | None,
+    destination: Location,
+    boxes: dict[str, int],
+    note: str = "",
+) -> StockTransfer:
+    """Move boxes between locations, or receive them from the bakery."""
+    if any(count < 0 for count in boxes.values()):
+        raise StockError("A transfer can't move a negative number of boxes.")
+    changes: StockChanges = {destination.pk: dict(boxes)}
+    if source is not None:
+        if source.pk == destination.pk:
+            raise StockError("A transfer needs two different locations.")
+        changes[source.pk] = {code: -count for code, count in boxes.items()}
+    with transaction.atomic():
+        adjust_stock(changes)
+        return StockTransfer.objects.create(
+            source=source, destination=destination, count_data=boxes, note=note
+        )
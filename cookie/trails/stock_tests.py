@@ -0,0 +1,237 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+
+from .models import (
+    CountUnit,
+    Event,
+    EventType,
+    Family,
+    Location,
+    LocationStock,
+    StockTransfer,
+)
+from .stock import StockError, stock_at, transfer_stock
+from .sync import SyncStatus, record_event, record_event_batch
+
+
+@pytest.fixture
+def cupboard():
+    location = Location.objects.create(name="Cupboard")
+    transfer_stock(None, location, {"TMint": 10, "Sam": 4})
+    return location
+
+
+@pytest.mark.django_db
+def test_bakery_delivery_stocks_a_location(cupboard):
+    assert stock_at(cupboard)["TMint"] == 10
+    assert stock_at(cupboard)["Sam"] == 4
+    assert stock_at(cupboard)["Tre"] == 0
+    assert StockTransfer.objects.get().source is None
+
+
+@pytest.mark.django_db
+def test_pickups_take_stock_and_returns_give_it_back(family, cupboard):
+    record_event(
+        uuid.uuid4(),
+        family=family,
+        event_type=EventType.PICKUP,
+        location=cupboard,
+        count_data={"TMint": 6},
+    )
+    record_event(
+        uuid.uuid4(),
+        family=family,
+        event_type=EventType.RETURN,
+        location=cupboard,
+        count_data={"TMint": 2},
+    )
+    assert stock_at(cupboard)["TMint"] == 6
+
+
+@pytest.mark.django_db
+def test_case_pickups_take_boxes(family, cupboard):
+    transfer_stock(None, cupboard, {"Sam": 12})
+    record_event(
+        None,
+        family=family,
+        event_type=EventType.PICKUP,
+        location=cupboard,
+        unit=CountUnit.CASE,
+        count_data={"Sam": 1},
+    )
+    assert stock_at(cupboard)["Sam"] == 4
+
+
+@pytest.mark.django_db
+def test_overdrawing_pickup_records_nothing(family, cupboard):
+    with pytest.raises(StockError, match="Cupboard has 4 Samoas"):
+        record_event(
+            uuid.uuid4(),
+            family=family,
+            event_type=EventType.PICKUP,
+            location=cupboard,
+            count_data={"TMint": 1, "Sam": 5},
+        )
+    assert not Event.objects.exists()
+    assert stock_at(cupboard)["TMint"] == 10
+
+
+@pytest.mark.django_db
+def test_duplicate_key_adjusts_stock_once(family, cupboard):
+    key = uuid.uuid4()
+    for _ in range(2):
+        record_event(
+            key,
+            family=family,
+            event_type=EventType.PICKUP,
+            location=cupboard,
+            count_data={"TMint": 3},
+        )
+    assert stock_at(cupboard)["TMint"] == 7
+
+
+@pytest.mark.django_db
+def test_transfer_moves_boxes_between_locations(cupboard):
+    garage = Location.objects.create(name="Garage")
+    transfer_stock(cupboard, garage, {"TMint": 4}, note="Overflow")
+    assert stock_at(cupboard)["TMint"] == 6
+    assert stock_at(garage)["TMint"] == 4
+
+    with pytest.raises(StockError):
+        transfer_stock(garage, cupboard, {"TMint": 5})
+    with pytest.raises(StockError):
+        transfer_stock(garage, garage, {"TMint": 1})
+    assert StockTransfer.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_batch_sync_reports_shortages_as_errors(family, cupboard):
+    results = record_event_batch(
+        [
+            {
+                "key": str(uuid.uuid4()),
+                "family": family.pk,
+                "event_type": "pickup",
+                "location": cupboard.pk,
+                "counts": {"Sam": 9},
+            }
+        ]
+    )
+    assert results[0]["status"] == SyncStatus.ERROR
+    assert results[0]["errors"]["__all__"][0]["code"] == "stock"
+    assert not Event.objects.exists()
+
+
+@pytest.mark.django_db
+def test_pickup_page_refuses_an_overdraw(admin_client, family, cupboard, plain_static):
+    response = admin_client.post(
+        reverse("pickup_return_event"),
+        {
+            "idempotency_key": str(uuid.uuid4()),
+            "family": family.pk,
+            "event_type": "pickup",
+            "location": cupboard.pk,
+            "count_Sam": "5",
+        },
+    )
+    assert response.status_code == 200
+    assert "Not enough stock" in response.content.decode()
+    assert not Event.objects.exists()
+
+
+@pytest.mark.django_db
+def test_pickup_page_requires_a_location_once_there_are_any(
+    admin_client, family, cupboard, plain_static
+):
+    response = admin_client.post(
+        reverse("pickup_return_event"),
+        {
+            "idempotency_key": str(uuid.uuid4()),
+            "family": family.pk,
+            "event_type": "pickup",
+            "count_TMint": "1",
+        },
+    )
+    assert response.status_code == 200
+    assert "Choose the location" in response.content.decode()
+    assert not Event.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_pickups_and_transfers_never_overdraw():
+    family = Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    cupboard = Location.objects.create(name="Cupboard")
+    garage = Location.objects.create(name="Garage")
+    transfer_stock(None, cupboard, {"TMint": 20})
+
+    # 24 one-box pickups and 8 two-box transfers race for 20 boxes.
+    jobs = ["pickup"] * 24 + ["transfer"] * 8
+    barrier = threading.Barrier(len(jobs))
+
+    def run(job: str) -> int:
+        try:
+            barrier.wait()
+            if job == "pickup":
+                record_event(
+                    uuid.uuid4(),
+                    family=family,
+                    event_type=EventType.PICKUP,
+                    location=cupboard,
+                    count_data={"TMint": 1},
+                )
+                return 1
+            transfer_stock(cupboard, garage, {"TMint": 2})
+            return 2
+        except StockError:
+            return 0
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        taken = list(pool.map(run, jobs))
+
+    picked_up = Event.objects.filter(event_type=EventType.PICKUP).count()
+    moved = 2 * StockTransfer.objects.filter(source=cupboard).count()
+    assert sum(taken) == picked_up + moved
+    assert stock_at(cupboard)["TMint"] == 20 - picked_up - moved
+    assert stock_at(garage)["TMint"] == moved
+    # There were more pickups than boxes, so the cupboard ran dry, and no
+    # counter ever went below zero.
+    assert stock_at(cupboard)["TMint"] == 0
+    assert not LocationStock.objects.filter(boxes__lt=0).exists()
+
+
+@pytest.mark.django_db
+def test_admin_edits_move_stock(admin_client, family, cupboard, plain_static):
+    def post(url, **counts):
+        data = {
+            "event_type": EventType.PICKUP,
+            "family": family.pk,
+            "unit": CountUnit.BOX,
+            "extra": '{"by": "admin"}',
+            "location": cupboard.pk,
+        }
+        data |= {f"count_data_{code}": count for code, count in counts.items()}
+        return admin_client.post(url, data)
+
+    assert post(reverse("admin:trails_event_add"), TMint=6).status_code == 302
+    event = Event.objects.get()
+    assert stock_at(cupboard)["TMint"] == 4
+
+    change = reverse("admin:trails_event_change", args=[event.pk])
+    assert post(change, TMint=2, Sam=1).status_code == 302
+    assert stock_at(cupboard)["TMint"] == 8
+    assert stock_at(cupboard)["Sam"] == 3
+
+    response = post(change, TMint=20)
+    assert "Not enough stock: Cupboard has 8 Thin Mints" in response.content.decode()
+    assert Event.objects.get().count_data["TMint"] == 2
+    assert stock_at(cupboard)["TMint"] == 8
+
+    delete = reverse("admin:trails_event_delete", args=[event.pk])
+    assert admin_client.post(delete, {"post": "yes"}).status_code == 403
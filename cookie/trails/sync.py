@@ -0,0 +1,209 @@
+"""
+Idempotent event recording.
+
+Forms that create events carry a fresh idempotency key in a hidden field,
+so a double-tapped or re-posted submission finds the event the first one
+recorded instead of creating another.
+
+The staff entry page can also queue events locally while a cupboard has no
+signal, then sync them here in batches. Every queued event carries a
+client-generated key, so a batch that is re-sent after a timeout reports the
+rows it already recorded as duplicates instead of creating them twice.
+
+Closing a season moves its events to ArchivedEvent, out of reach of the
+unique key on Event, so keys are looked up there too: a queue replayed
+after the season closed still finds what it recorded.
+"""
+
+import uuid
+from typing import Any
+
+from django.db import IntegrityError, models, transaction
+
+from .cookies import CookieVariety
+from .forms import PickupReturnEventForm
+from .models import ArchivedEvent, Event
+from .stock import StockError, adjust_stock, event_stock_changes
+
+MAX_BATCH_SIZE = 200
+
+
+class SyncStatus(models.TextChoices):
+    CREATED = "created", "Created"
+    DUPLICATE = "duplicate", "Duplicate"
+    ERROR = "error", "Error"
+
+
+def _parse_key(value: Any) -> uuid.UUID | None:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+class IdempotencyKeyError(Exception):
+    """The key was already used, for a different event or a closed season."""
+
+
+# A resent submission must agree with the recorded event on these.
+_MATCHED_FIELDS = ("family", "event_type", "location")
+
+
+def _check_same_event(event: Event, fields: dict[str, Any]) -> Event:
+    for name in _MATCHED_FIELDS:
+        if name not in fields:
+            continue
+        value = fields[name]
+        if isinstance(value, models.Model):
+            value = value.pk
+        if getattr(event, Event._meta.get_field(name).attname) != value:
+            raise IdempotencyKeyError(
+                "This submission's key was already used for a different event; "
+                "please submit again."
+            )
+    return event
+
+
+def record_event(
+    idempotency_key: uuid.UUID | None, **fields: Any
+) -> tuple[Event, bool]:
+    """Create an event unless one with this idempotency key already exists.
+
+    Returns the event and whether it was created. Without a key, the event is
+    always created. If the key already recorded an event for another family,
+    type or location, or for an event since archived with its season,
+    IdempotencyKeyError is raised rather than handing that event back or
+    recording it again. A new pickup or return at a location moves its boxes
+    out of or into that location's stock in the same transaction; if there
+    isn't enough stock, StockError is raised and nothing is recorded.
+    """
+    if idempotency_key is not None:
+        # A voided event still holds its key, and is still the one recorded.
+        existing = Event.all_objects.filter(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return _check_same_event(existing, fields), False
+        if ArchivedEvent.objects.filter(idempotency_key=idempotency_key).exists():
+            raise IdempotencyKeyError(
+                "This submission was recorded in a season that has since closed."
+            )
+    try:
+        with transaction.atomic():
+            event = Event.objects.create(idempotency_key=idempotency_key, **fields)
+            adjust_stock(event_stock_changes(event))
+            return event, True
+    except IntegrityError:
+        if idempotency_key is None:
+            raise
+        # Another request recorded the same key between our lookup and our
+        # insert; the winner's row is the one to report.
+        existing = Event.all_objects.get(idempotency_key=idempotency_key)
+        return _check_same_event(existing, fields), False
+
+
+def _form_for_row(row: dict[str, Any]) -> PickupReturnEventForm:
+    counts = row.get("counts") or {}
+    data = {
+        "family": row.get("family"),
+        "event_type": row.get("event_type"),
+        "location": row.get("location"),
+    }
+    for variety in CookieVariety:
+        data[f"count_{variety.value}"] = counts.get(variety.value, 0)
+    return PickupReturnEventForm(data)
+
+
+def _row_matches(row: dict[str, Any], event: Event) -> bool:
+    return (
+        str(row.get("family")) == str(event.family_id)
+        and row.get("event_type") == event.event_type
+        and str(row.get("location") or "") == str(event.location_id or "")
+    )
+
+
+def record_event_batch(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Record a batch of queued pickup/return rows, one result per row.
+
+    Each row looks like::
+
+        {"key": "<uuid>", "family": 12, "event_type": "pickup",
+         "location": 3, "counts": {"TMint": 12, "Sam": 6},
+         "recorded_at": "<iso datetime>"}
+
+    Results are returned in the same order, each with the row's key, a
+    status of "created", "duplicate" or "error", and either the event id or
+    the validation errors.
+    """
+    keys = [_parse_key(row.get("key")) for row in rows]
+    valid_keys = [key for key in keys if key is not None]
+    fields = ("idempotency_key", "family_id", "event_type", "location_id")
+    # Rows from a closed season are duplicates too; their events keep their ids.
+    recorded: dict[uuid.UUID, Event | ArchivedEvent] = {
+        event.idempotency_key: event
+        for events in (
+            ArchivedEvent.objects.filter(idempotency_key__in=valid_keys),
+            Event.objects.filter(idempotency_key__in=valid_keys),
+        )
+        for event in events.only(*fields)
+    }
+
+    results: list[dict[str, Any]] = []
+    for row, key in zip(rows, keys, strict=True):
+        result: dict[str, Any] = {"key": row.get("key")}
+        results.append(result)
+
+        if key is None:
+            result["status"] = SyncStatus.ERROR
+            result["errors"] = {"key": ["A valid UUID idempotency key is required."]}
+            continue
+
+        # A resent row skips validation; anything else with a recorded key
+        # goes on to record_event, which refuses it.
+        if key in recorded and _row_matches(row, recorded[key]):
+            result["status"] = SyncStatus.DUPLICATE
+            result["event_id"] = recorded[key].pk
+            continue
+
+        if not isinstance(row.get("counts") or {}, dict):
+            result["status"] = SyncStatus.ERROR
+            result["errors"] = {
+                "counts": [
+                    {
+                        "message": "Counts must be an object of variety codes.",
+                        "code": "invalid",
+                    }
+                ]
+            }
+            continue
+
+        form = _form_for_row(row)
+        if not form.is_valid():
+            result["status"] = SyncStatus.ERROR
+            result["errors"] = form.errors.get_json_data()
+            continue
+
+        extra: dict[str, Any] = {}
+        if row.get("recorded_at"):
+            extra["recorded_at"] = str(row["recorded_at"])
+
+        try:
+            event, created = record_event(
+                key,
+                family=form.cleaned_data["family"],
+                event_type=form.cleaned_data["event_type"],
+                location=form.cleaned_data["location"],
+                count_data=form.get_count_data(),
+                extra=extra,
+            )
+        except StockError as e:
+            result["status"] = SyncStatus.ERROR
+            result["errors"] = {"__all__": [{"message": str(e), "code": "stock"}]}
+            continue
+        except IdempotencyKeyError as e:
+            result["status"] = SyncStatus.ERROR
+            result["errors"] = {"key": [{"message": str(e), "code": "reused"}]}
+            continue
+        result["status"] = SyncStatus.CREATED if created else SyncStatus.DUPLICATE
+        result["event_id"] = event.pk
+        recorded[key] = event
+
+    return results
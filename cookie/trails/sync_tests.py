@@ -0,0 +1,128 @@
+import json
+import uuid
+
+import pytest
+from django.urls import reverse
+
+from .models import Event, EventType, Family, current_season
+from .seasons import close_season
+from .sync import IdempotencyKeyError, SyncStatus, record_event, record_event_batch
+
+
+def _row(family: Family, **overrides):
+    row = {
+        "key": str(uuid.uuid4()),
+        "family": family.pk,
+        "event_type": EventType.PICKUP.value,
+        "counts": {"TMint": 12, "Sam": 6},
+        "recorded_at": "2026-02-01T10:00:00Z",
+    }
+    row.update(overrides)
+    return row
+
+
+@pytest.mark.django_db
+def test_record_event_batch_creates_events(family):
+    rows = [_row(family), _row(family, event_type=EventType.RETURN.value)]
+    results = record_event_batch(rows)
+
+    assert [r["status"] for r in results] == [SyncStatus.CREATED] * 2
+    event = Event.objects.get(pk=results[0]["event_id"])
+    assert event.count_data["TMint"] == 12
+    assert event.count_data["Tre"] == 0
+    assert event.extra["recorded_at"] == "2026-02-01T10:00:00Z"
+
+
+@pytest.mark.django_db
+def test_record_event_batch_resend_is_deduplicated(family):
+    rows = [_row(family), _row(family)]
+    first = record_event_batch(rows)
+    second = record_event_batch(rows)
+
+    assert [r["status"] for r in second] == [SyncStatus.DUPLICATE] * 2
+    assert [r["event_id"] for r in second] == [r["event_id"] for r in first]
+    assert Event.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_record_event_batch_duplicate_key_within_batch(family):
+    row = _row(family)
+    results = record_event_batch([row, dict(row)])
+
+    assert [r["status"] for r in results] == [
+        SyncStatus.CREATED,
+        SyncStatus.DUPLICATE,
+    ]
+    assert Event.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_record_event_batch_reports_row_errors(family):
+    results = record_event_batch(
+        [
+            _row(family, key="not-a-uuid"),
+            _row(family, event_type=EventType.COUNT.value),
+            _row(family, counts={"TMint": -1}),
+            _row(family, counts=["TMint", 12]),
+            _row(family),
+        ]
+    )
+
+    assert [r["status"] for r in results] == [
+        SyncStatus.ERROR,
+        SyncStatus.ERROR,
+        SyncStatus.ERROR,
+        SyncStatus.ERROR,
+        SyncStatus.CREATED,
+    ]
+    assert "event_type" in results[1]["errors"]
+    assert "counts" in results[3]["errors"]
+    assert Event.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_view(admin_client, family):
+    url = reverse("pickup_return_event_bulk")
+    response = admin_client.post(
+        url, json.dumps({"events": [_row(family)]}), content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert response.json()["results"][0]["status"] == SyncStatus.CREATED
+
+    response = admin_client.post(url, "{}", content_type="application/json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_key_reused_for_another_family_is_refused(family):
+    other = Family.objects.create(scout_name="Bea", email="bea@example.com", grade=5)
+    key = uuid.uuid4()
+    record_event(key, family=family, event_type=EventType.COUNT)
+
+    with pytest.raises(IdempotencyKeyError):
+        record_event(key, family=other, event_type=EventType.COUNT)
+    with pytest.raises(IdempotencyKeyError):
+        record_event(key, family=family, event_type=EventType.COOKIE_ORDER)
+
+    (result,) = record_event_batch([_row(other, key=str(key))])
+    assert result["status"] == SyncStatus.ERROR
+    assert "key" in result["errors"]
+    assert Event.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_replay_after_the_season_closed_is_not_recorded_again(family):
+    rows = [_row(family)]
+    (first,) = record_event_batch(rows)
+    last = current_season() - 1
+    Event.objects.filter(pk=first["event_id"]).update(season=last)
+    close_season(last)
+
+    (replayed,) = record_event_batch(rows)
+    assert replayed["status"] == SyncStatus.DUPLICATE
+    assert replayed["event_id"] == first["event_id"]
+    with pytest.raises(IdempotencyKeyError):
+        record_event(
+            uuid.UUID(rows[0]["key"]), family=family, event_type=EventType.PICKUP
+        )
+    assert not Event.objects.exists()
@@ -0,0 +1,75 @@
+import re
+from pathlib import Path
+
+from django.conf import settings
+
+TEMPLATES_DIR = settings.BASE_DIR / "cookie" / "templates"
+STYLESHEET = settings.BASE_DIR / "cookie" / "static" / "trails" / "tailwind.css"
+
+# Django admin templates and the admin widget bring their own CSS.
+UNSTYLED_DIRS = ("admin", "trails/widgets", "trails/offline")
+
+# Classes used as hooks rather than for styling.
+NOT_TAILWIND = {"pointer"}
+
+_CLASS_ATTR = re.compile(r'\bclass="([^"]*)"', re.DOTALL)
+_SCRIPT_CLASSES = re.compile(r"(?:className\s*=|classList\.\w+\().*")
+_STRING = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+# Django tags and variables, and JavaScript template literal placeholders.
+_TEMPLATE_TAG = re.compile(r"{%.*?%}|{{.*?}}|\$\{.*?\}", re.DOTALL)
+
+
+def _template_classes(source: str) -> set[str]:
+    chunks = _CLASS_ATTR.findall(source)
+    for line in _SCRIPT_CLASSES.findall(source):
+        chunks.extend(a or b for a, b in _STRING.findall(line))
+    classes = set()
+    for chunk in chunks:
+        classes.update(_TEMPLATE_TAG.sub(" ", chunk).split())
+    return classes
+
+
+def _stylesheet_classes(css: str) -> set[str]:
+    # Class selectors, with Tailwind's backslash escapes undone.
+    return {
+        re.sub(r"\\(.)", r"\1", name) for name in re.findall(r"\.((?:\\.|[\w-])+)", css)
+    }
+
+
+def _styled_templates() -> list[Path]:
+    return [
+        path
+        for path in sorted(TEMPLATES_DIR.rglob("*.html"))
+        if not path.relative_to(TEMPLATES_DIR).as_posix().startswith(UNSTYLED_DIRS)
+    ]
+
+
+def test_template_class_extraction():
+    source = """
+      <div class="p-2 sm:p-4 ${extra}
+                  {% if dark %}text-white{% else %}text-gray-800{% endif %}">
+      td.className = 'p-2 text-right' + (n < 0 ? ' text-red-600' : '');
+    """
+    assert _template_classes(source) == {
+        "p-2",
+        "sm:p-4",
+        "text-white",
+        "text-gray-800",
+        "text-right",
+        "text-red-600",
+    }
+    assert _stylesheet_classes(r".sm\:py-1\.5:hover{}.p-20{}") == {"sm:py-1.5", "p-20"}
+
+
+def test_built_stylesheet_covers_template_classes():
+    built = _stylesheet_classes(STYLESHEET.read_text())
+    missing = {
+        f"{path.relative_to(TEMPLATES_DIR)}: {name}"
+        for path in _styled_templates()
+        for name in _template_classes(path.read_text())
+        if name not in NOT_TAILWIND and name not in built
+    }
+    assert not missing, (
+        "cookie/static/trails/tailwind.css is missing classes used in "
+        "templates; run `just css` to rebuild it.\n" + "\n".join(sorted(missing))
+    )
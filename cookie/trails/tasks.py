@@ -0,0 +1,24 @@
+from django.contrib.auth.models import AbstractBaseUser, AnonymousUser
+from django.tasks import task
+
+from .models import Report, ReportKind
+from .reports import build_report
+
+
+@task
+def generate_report(report_id: int) -> None:
+    build_report(Report.objects.get(pk=report_id))
+
+
+def request_report(
+    kind: ReportKind, user: AbstractBaseUser | AnonymousUser | None = None
+) -> Report:
+    """Create a report and queue it for the background worker."""
+    report = Report.objects.create(
+        kind=kind,
+        requested_by=user if user is not None and user.is_authenticated else None,
+    )
+    result = generate_report.enqueue(report.pk)
+    report.task_id = result.id
+    report.save(update_fields=["task_id"])
+    return report
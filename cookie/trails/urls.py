@@ -1,19 +1,38 @@
 from django.urls import path
 
+from .api import (
+    BalancesApiView,
+    EventsApiView,
+    FamiliesApiView,
+    MoneyApiView,
+    OrdersApiView,
+)
 from .views import (
     CalculatorView,
     CasesView,
     CountSuccessView,
     CountView,
+    FamilyLedgerView,
     FamilyLoginView,
     FamilyLogoutView,
+    ForecastView,
     HomeView,
     InitialOrdersCsvView,
     InitialOrderSuccessView,
     InitialOrderView,
+    InventoryDashboardView,
+    MetricsView,
     OrderHelperView,
+    PickupReturnEventBulkView,
     PickupReturnEventSuccessView,
     PickupReturnEventView,
+    ReconciliationCsvView,
+    ReportDownloadView,
+    ReportsView,
+    RosterImportView,
+    StaffManifestView,
+    StaffServiceWorkerView,
+    inventory_stream,
 )
 
 urlpatterns = [
@@ -37,6 +56,11 @@ urlpatterns = [
     path("family/logout/", FamilyLogoutView.as_view(), name="family_logout"),
     # Admin-only views (staff_member_required)
     path("staff/event/", PickupReturnEventView.as_view(), name="pickup_return_event"),
+    path(
+        "staff/event/bulk/",
+        PickupReturnEventBulkView.as_view(),
+        name="pickup_return_event_bulk",
+    ),
     path(
         "staff/event/<int:event_id>/success/",
         PickupReturnEventSuccessView.as_view(),
@@ -47,4 +71,42 @@ urlpatterns = [
         InitialOrdersCsvView.as_view(),
         name="initial_orders_csv",
     ),
+    path(
+        "staff/reconciliation.csv",
+        ReconciliationCsvView.as_view(),
+        name="reconciliation_csv",
+    ),
+    path("staff/reports/", ReportsView.as_view(), name="reports"),
+    path("staff/roster/", RosterImportView.as_view(), name="roster_import"),
+    path(
+        "staff/reports/<int:report_id>/download/",
+        ReportDownloadView.as_view(),
+        name="report_download",
+    ),
+    path(
+        "staff/inventory/",
+        InventoryDashboardView.as_view(),
+        name="inventory_dashboard",
+    ),
+    path("staff/inventory/stream/", inventory_stream, name="inventory_stream"),
+    path("staff/forecast/", ForecastView.as_view(), name="forecast"),
+    path(
+        "staff/families/<int:family_id>/ledger/",
+        FamilyLedgerView.as_view(),
+        name="family_ledger",
+    ),
+    path("staff/sw.js", StaffServiceWorkerView.as_view(), name="staff_service_worker"),
+    path(
+        "staff/manifest.webmanifest",
+        StaffManifestView.as_view(),
+        name="staff_manifest",
+    ),
+    # Prometheus scrapes (bearer token or staff)
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    # Read-only JSON API (bearer token)
+    path("api/families/", FamiliesApiView.as_view(), name="api_families"),
+    path("api/events/", EventsApiView.as_view(), name="api_events"),
+    path("api/balances/", BalancesApiView.as_view(), name="api_balances"),
+    path("api/orders/", OrdersApiView.as_view(), name="api_orders"),
+    path("api/money/", MoneyApiView.as_view(), name="api_money"),
 ]
@@ -1,10 +1,34 @@
+import csv
+import hashlib
+import json
+import math
+import uuid
+
+from asgiref.sync import sync_to_async
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import redirect
+from django.core import signing
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.cache import never_cache
 from django.views.generic import TemplateView
+from django_htmx.http import push_url
 
+from .api import has_api_token
+from .broker import inventory_broker, render_event
 from .cookies import COOKIE_COLORS, COOKIE_POPULARITY, CookieVariety
 from .family_auth import (
     clear_current_family,
@@ -12,8 +36,38 @@ from .family_auth import (
     requires_family,
     set_current_family,
 )
-from .forms import CookieCountForm, FamilyLoginForm, PickupReturnEventForm
-from .models import CountUnit, Event, EventType, Family
+from .forecast import DEFAULT_HORIZON_DAYS, MAX_HORIZON_DAYS, troop_forecast
+from .forms import (
+    CookieCountForm,
+    FamilyLoginForm,
+    PickupReturnEventForm,
+    RosterImportForm,
+)
+from .inventory import holdings_snapshot
+from .ledger import Anomaly, family_ledger_page, ledger_csv, ledger_lines
+from .metrics import LOGIN_FAILURES, METRICS_CONTENT_TYPE, render_metrics
+from .models import (
+    CountUnit,
+    Event,
+    EventType,
+    Family,
+    Location,
+    Report,
+    ReportKind,
+    ReportStatus,
+)
+from .ratelimit import family_login_wait
+from .reports import initial_orders_table
+from .roster import import_roster, open_upload, read_records
+from .routers import aiterate_from_reports, iterate_from_reports, reports_database
+from .stock import StockError
+from .sync import (
+    MAX_BATCH_SIZE,
+    IdempotencyKeyError,
+    record_event,
+    record_event_batch,
+)
+from .tasks import request_report
 
 
 def _build_varieties_list(
@@ -68,7 +122,23 @@ class OrderHelperView(TemplateView):
     template_name = "order_helper.html"
 
 
+def _retry_key(form: CookieCountForm, fresh_key: uuid.UUID) -> uuid.UUID:
+    """The idempotency key to re-render a rejected form with.
+
+    Nothing was recorded, so the submitted key is still good for the retry,
+    unless it was refused for belonging to another event.
+    """
+    if form.has_error(NON_FIELD_ERRORS, code="reused_key"):
+        return fresh_key
+    return form.cleaned_data.get("idempotency_key") or fresh_key
+
+
+def _refuse_reused_key(form: CookieCountForm, error: IdempotencyKeyError) -> None:
+    form.add_error(None, ValidationError(str(error), code="reused_key"))
+
+
 @method_decorator(requires_family, name="dispatch")
+@method_decorator(never_cache, name="get")
 class CountView(TemplateView):
     template_name = "count.html"
 
@@ -86,6 +156,7 @@ class CountView(TemplateView):
         last_data = last_count.count_data if last_count else None
         context["varieties"] = _build_varieties_list(last_data, "last_value")
         context["has_previous"] = last_count is not None
+        context["idempotency_key"] = uuid.uuid4()
         return context
 
     def post(self, request: HttpRequest) -> HttpResponse:
@@ -95,19 +166,64 @@ class CountView(TemplateView):
 
         form = CookieCountForm(request.POST)
         if form.is_valid():
-            event = Event.objects.create(
-                family=family,
-                event_type=EventType.COUNT,
-                count_data=form.get_count_data(),
-            )
-            return redirect("count_success", event_id=event.pk)
+            try:
+                event, _ = record_event(
+                    form.cleaned_data["idempotency_key"],
+                    family=family,
+                    event_type=EventType.COUNT,
+                    count_data=form.get_count_data(),
+                )
+            except IdempotencyKeyError as e:
+                _refuse_reused_key(form, e)
+            else:
+                if request.htmx:
+                    return _success_fragment(
+                        request,
+                        "trails/partials/count_success.html",
+                        _event_summary_context(event),
+                        reverse("count_success", kwargs={"event_id": event.pk}),
+                    )
+                return redirect("count_success", event_id=event.pk)
 
         # Re-render with errors (though unlikely with optional int fields)
         context = self.get_context_data()
         context["form"] = form
+        context["idempotency_key"] = _retry_key(form, context["idempotency_key"])
         return self.render_to_response(context)
 
 
+def _event_summary_context(event: Event | None) -> dict:
+    """Context for the success pages (and their HTMX fragments)."""
+    if event is None:
+        return {"event": None}
+    varieties = _build_varieties_list(event.count_data)
+    return {
+        "event": event,
+        "varieties": varieties,
+        "total": sum(v["count"] for v in varieties),
+    }
+
+
+def _family_event(
+    family: Family | None, event_id: int, event_type: EventType
+) -> Event | None:
+    """The event, if it exists and belongs to this family."""
+    return Event.objects.filter(
+        pk=event_id, family=family, event_type=event_type
+    ).first()
+
+
+def _success_fragment(
+    request: HttpRequest, template_name: str, context: dict, url: str
+) -> HttpResponse:
+    """Answer an HTMX form post with just the success fragment.
+
+    The browser's address bar is moved to the success page, so a reload or
+    a shared link shows the same thing a non-HTMX client is redirected to.
+    """
+    return push_url(render(request, template_name, context), url)
+
+
 @method_decorator(requires_family, name="dispatch")
 class CountSuccessView(TemplateView):
     template_name = "count_success.html"
@@ -115,25 +231,13 @@ class CountSuccessView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         family = get_current_family(self.request)
-        event_id = self.kwargs.get("event_id")
-
-        # Get the event and verify it belongs to this family
-        try:
-            event = Event.objects.get(
-                pk=event_id, family=family, event_type=EventType.COUNT
-            )
-        except Event.DoesNotExist:
-            context["event"] = None
-            return context
-
-        varieties = _build_varieties_list(event.count_data)
-        context["event"] = event
-        context["varieties"] = varieties
-        context["total"] = sum(v["count"] for v in varieties)
+        event = _family_event(family, self.kwargs["event_id"], EventType.COUNT)
+        context.update(_event_summary_context(event))
         return context
 
 
 @method_decorator(requires_family, name="dispatch")
+@method_decorator(never_cache, name="get")
 class InitialOrderView(TemplateView):
     template_name = "initial_order.html"
 
@@ -153,11 +257,10 @@ class InitialOrderView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["varieties"] = _build_varieties_list()
+        context["idempotency_key"] = uuid.uuid4()
         return context
 
     def post(self, request: HttpRequest) -> HttpResponse:
-        import json
-
         family = get_current_family(request)
         if not family:
             return redirect("family_login")
@@ -173,23 +276,35 @@ class InitialOrderView(TemplateView):
                 except json.JSONDecodeError:
                     pass  # Ignore malformed JSON
 
-            event = Event.objects.create(
-                family=family,
-                event_type=EventType.COOKIE_ORDER,
-                unit=CountUnit.CASE,
-                count_data=form.get_count_data(),
-                extra=extra_data,
-            )
-            from django.urls import reverse
-
-            return redirect(
-                reverse("initial_order_success", kwargs={"event_id": event.pk})
-                + "?new=1"
-            )
+            try:
+                event, _ = record_event(
+                    form.cleaned_data["idempotency_key"],
+                    family=family,
+                    event_type=EventType.COOKIE_ORDER,
+                    unit=CountUnit.CASE,
+                    count_data=form.get_count_data(),
+                    extra=extra_data,
+                )
+            except IdempotencyKeyError as e:
+                _refuse_reused_key(form, e)
+            else:
+                success_url = (
+                    reverse("initial_order_success", kwargs={"event_id": event.pk})
+                    + "?new=1"
+                )
+                if request.htmx:
+                    return _success_fragment(
+                        request,
+                        "trails/partials/initial_order_success.html",
+                        {**_event_summary_context(event), "is_new_submission": True},
+                        success_url,
+                    )
+                return redirect(success_url)
 
         # Re-render with errors
         context = self.get_context_data()
         context["form"] = form
+        context["idempotency_key"] = _retry_key(form, context["idempotency_key"])
         return self.render_to_response(context)
 
 
@@ -205,19 +320,8 @@ class InitialOrderSuccessView(TemplateView):
         # Check if this is a new submission or viewing a previous one
         context["is_new_submission"] = self.request.GET.get("new") == "1"
 
-        # Get the event and verify it belongs to this family
-        try:
-            event = Event.objects.get(
-                pk=event_id, family=family, event_type=EventType.COOKIE_ORDER
-            )
-        except Event.DoesNotExist:
-            context["event"] = None
-            return context
-
-        varieties = _build_varieties_list(event.count_data)
-        context["event"] = event
-        context["varieties"] = varieties
-        context["total"] = sum(v["count"] for v in varieties)
+        event = _family_event(family, event_id, EventType.COOKIE_ORDER)
+        context.update(_event_summary_context(event))
         return context
 
 
@@ -231,6 +335,17 @@ class FamilyLoginView(TemplateView):
         return context
 
     def post(self, request: HttpRequest) -> HttpResponse:
+        wait = family_login_wait(request, request.POST.get("email", ""))
+        if wait:
+            LOGIN_FAILURES.inc("throttled")
+            # Answered before anything touches the database or the session.
+            return HttpResponse(
+                "Too many sign-in attempts. Please wait a minute and try again.",
+                content_type="text/plain",
+                status=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
         form = FamilyLoginForm(request.POST)
         next_url = request.POST.get("next", "") or "/"
 
@@ -238,6 +353,11 @@ class FamilyLoginView(TemplateView):
             set_current_family(request, form.family)
             return redirect(next_url)
 
+        # A well-formed address that matches no family, or anything else.
+        if form.has_error("email", code="unknown_email"):
+            LOGIN_FAILURES.inc("unknown_email")
+        else:
+            LOGIN_FAILURES.inc("invalid")
         return self.render_to_response(self.get_context_data(form=form))
 
 
@@ -255,6 +375,7 @@ class PickupReturnEventView(TemplateView):
         context = super().get_context_data(**kwargs)
         context["varieties"] = _build_varieties_list()
         context["families"] = Family.objects.all().order_by("scout_name")
+        context["locations"] = Location.objects.all()
         context["event_types"] = [
             {
                 "value": EventType.PICKUP,
@@ -267,24 +388,181 @@ class PickupReturnEventView(TemplateView):
                 "description": "Family returns cookies to troop inventory",
             },
         ]
+        context["idempotency_key"] = uuid.uuid4()
         return context
 
     def post(self, request: HttpRequest) -> HttpResponse:
         form = PickupReturnEventForm(request.POST)
         if form.is_valid():
-            event = Event.objects.create(
-                family=form.cleaned_data["family"],
-                event_type=form.cleaned_data["event_type"],
-                count_data=form.get_count_data(),
-            )
-            return redirect("pickup_return_event_success", event_id=event.pk)
+            try:
+                event, _ = record_event(
+                    form.cleaned_data["idempotency_key"],
+                    family=form.cleaned_data["family"],
+                    event_type=form.cleaned_data["event_type"],
+                    location=form.cleaned_data["location"],
+                    count_data=form.get_count_data(),
+                )
+            except StockError as e:
+                form.add_error(None, str(e))
+            except IdempotencyKeyError as e:
+                _refuse_reused_key(form, e)
+            else:
+                return redirect("pickup_return_event_success", event_id=event.pk)
 
         # Re-render with errors
         context = self.get_context_data()
         context["form"] = form
+        context["idempotency_key"] = _retry_key(form, context["idempotency_key"])
         return self.render_to_response(context)
 
 
+@method_decorator(staff_member_required, name="dispatch")
+class PickupReturnEventBulkView(View):
+    """Record pickups and returns queued by the offline entry page."""
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        try:
+            rows = json.loads(request.body)["events"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            rows = None
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            return JsonResponse(
+                {"error": "Expected a JSON object with a list of events."}, status=400
+            )
+        if len(rows) > MAX_BATCH_SIZE:
+            return JsonResponse(
+                {"error": f"Send at most {MAX_BATCH_SIZE} events per batch."},
+                status=400,
+            )
+        return JsonResponse({"results": record_event_batch(rows)})
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class StaffServiceWorkerView(TemplateView):
+    """Service worker that keeps the staff entry page usable offline.
+
+    It is served from /staff/ rather than /static/ so that its scope covers
+    the staff pages.
+    """
+
+    template_name = "trails/offline/service_worker.js"
+    content_type = "text/javascript"
+    precached_static = (
+        "trails/tailwind.css",
+        "trails/vendor/htmx.min.js",
+        "trails/cookietrails.js",
+        "trails/cupboard.js",
+    )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Static names are content-hashed in production, so a new deploy
+        # yields a new cache name and the old cache is dropped on activate.
+        urls = [static(path) for path in self.precached_static]
+        context["static_urls"] = urls
+        context["cache_version"] = hashlib.sha256("|".join(urls).encode()).hexdigest()[
+            :12
+        ]
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class StaffManifestView(TemplateView):
+    template_name = "trails/offline/manifest.webmanifest"
+    content_type = "application/manifest+json"
+
+
+class MetricsView(View):
+    """Prometheus metrics, for a scraper with an API token or for staff."""
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        if not request.user.is_staff and not has_api_token(request):
+            return HttpResponse(
+                "A valid API token is required.",
+                content_type="text/plain",
+                status=401,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class InventoryDashboardView(TemplateView):
+    template_name = "inventory_dashboard.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["varieties"] = _build_varieties_list()
+        return context
+
+
+@method_decorator(staff_member_required, name="dispatch")
+@method_decorator(reports_database, name="get")
+class ForecastView(TemplateView):
+    """Projected stock-out by variety, with suggested case reorders."""
+
+    template_name = "forecast.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            days = int(self.request.GET.get("days", DEFAULT_HORIZON_DAYS))
+        except ValueError:
+            days = DEFAULT_HORIZON_DAYS
+        forecast = troop_forecast(max(1, min(days, MAX_HORIZON_DAYS)))
+        by_code = {row.variety.value: row for row in forecast.varieties}
+        context["forecast"] = forecast
+        context["rows"] = [
+            {**variety, "forecast": by_code[variety["code"]]}
+            for variety in _build_varieties_list()
+        ]
+        context["total_cases"] = sum(row.cases for row in forecast.varieties)
+        return context
+
+
+INVENTORY_STREAM_KEEPALIVE_SECONDS = 15
+
+
+async def _inventory_stream_events(cursor: str | None):
+    broker = inventory_broker
+    seq = broker.parse_cursor(cursor)
+    messages = broker.since(seq) if seq is not None else None
+    while True:
+        if messages is None:
+            # New client, a cursor from another process, or a client that
+            # fell too far behind: start over from a full snapshot. Anything
+            # published while the snapshot is built is replayed afterwards.
+            seq = broker.seq
+            snapshot = await sync_to_async(holdings_snapshot)()
+            yield render_event("snapshot", snapshot, broker.message_id(seq))
+        elif not messages:
+            yield b": keepalive\n\n"
+        for message in messages or ():
+            yield message.payload
+            seq = message.seq
+        messages = await broker.wait(seq, INVENTORY_STREAM_KEEPALIVE_SECONDS)
+
+
+@staff_member_required
+async def inventory_stream(request: HttpRequest) -> HttpResponse:
+    """Server-sent event stream of per-family holdings for the dashboard.
+
+    Sends a snapshot on connect, then one small "holdings" message for each
+    family whose holdings change. EventSource reconnects send the last id
+    back as Last-Event-ID, and the stream resumes from there when it can.
+    """
+    return StreamingHttpResponse(
+        _inventory_stream_events(request.headers.get("Last-Event-ID")),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @method_decorator(staff_member_required, name="dispatch")
 class PickupReturnEventSuccessView(TemplateView):
     template_name = "pickup_return_event_success.html"
@@ -307,41 +585,150 @@ class PickupReturnEventSuccessView(TemplateView):
 
 
 @method_decorator(staff_member_required, name="dispatch")
+@method_decorator(reports_database, name="get")
+class FamilyLedgerView(TemplateView):
+    """A family's events with running holdings, loaded a page at a time.
+
+    The full page shows the first page of events; HTMX requests (from the
+    page itself, or the family's admin page) get just the rows of the page
+    after `cursor`, ending in a row that loads the next page once it scrolls
+    into view.
+    """
+
+    template_name = "family_ledger.html"
+
+    def get(self, request: HttpRequest, family_id: int) -> HttpResponse:
+        family = get_object_or_404(Family, pk=family_id)
+        try:
+            page = family_ledger_page(family.pk, request.GET.get("cursor"))
+        except signing.BadSignature:
+            return HttpResponseBadRequest("Invalid cursor.")
+        context = {
+            "family": family,
+            "next_cursor": page.next_cursor,
+            "rows": [
+                {
+                    "line": line,
+                    "event_type": EventType(line.event_type).label,
+                    "boxes": [line.boxes[variety.value] for variety in CookieVariety],
+                    "total": sum(line.boxes.values()),
+                    "holding": sum(line.holdings.values()),
+                    "anomalies": [Anomaly(a).label for a in line.anomalies],
+                }
+                for line in page.lines
+            ],
+        }
+        if request.htmx:
+            return render(request, "trails/partials/family_ledger_rows.html", context)
+        context["varieties"] = [
+            {"code": variety.value, "color": COOKIE_COLORS[variety]}
+            for variety in CookieVariety
+        ]
+        return self.render_to_response(self.get_context_data(**context))
+
+
+@method_decorator(staff_member_required, name="dispatch")
+@method_decorator(reports_database, name="get")
 class InitialOrdersCsvView(View):
     def get(self, request: HttpRequest) -> HttpResponse:
-        import csv
-
         response = HttpResponse(content_type="text/csv")
         response["Content-Disposition"] = 'attachment; filename="initial_orders.csv"'
 
         writer = csv.writer(response)
+        writer.writerows(initial_orders_table())
+        return response
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ReconciliationCsvView(View):
+    """Stream every family's reconciled ledger as CSV.
+
+    Rows are produced as the response is sent, so memory stays flat no
+    matter how many events there are. Pass ?anomalies=1 to only include
+    flagged events.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        lines = ledger_lines()
+        if request.GET.get("anomalies") == "1":
+            lines = (line for line in lines if line.anomalies)
+        rows = ledger_csv(lines)
+        # Under ASGI, a sync iterator would be read whole before sending.
+        if isinstance(request, ASGIRequest):
+            content = aiterate_from_reports(rows)
+        else:
+            content = iterate_from_reports(rows)
+        response = StreamingHttpResponse(content, content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="reconciliation.csv"'
+        return response
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ReportsView(TemplateView):
+    """Request background reports and download the finished ones."""
+
+    template_name = "reports.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        reports = list(
+            Report.objects.filter(
+                Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+            ).defer("content")[:50]
+        )
+        context["reports"] = reports
+        context["report_kinds"] = ReportKind.choices
+        context["has_pending"] = any(
+            r.status in (ReportStatus.PENDING, ReportStatus.RUNNING) for r in reports
+        )
+        return context
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        kind = request.POST.get("kind")
+        if kind in ReportKind.values:
+            request_report(ReportKind(kind), request.user)
+        return redirect("reports")
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class RosterImportView(TemplateView):
+    """Upload a roster to add and update families."""
+
+    template_name = "roster_import.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.setdefault("form", RosterImportForm())
+        return context
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        form = RosterImportForm(request.POST, request.FILES)
+        diff = None
+        if form.is_valid():
+            upload = form.cleaned_data["roster"]
+            try:
+                diff = import_roster(
+                    read_records(open_upload(upload), upload.name),
+                    dry_run=form.cleaned_data["dry_run"],
+                )
+            except (csv.Error, json.JSONDecodeError, UnicodeDecodeError, TypeError):
+                form.add_error("roster", "That file couldn't be read as a roster.")
+        return self.render_to_response(
+            self.get_context_data(
+                form=form, diff=diff, dry_run=form.cleaned_data.get("dry_run")
+            )
+        )
 
-        # Header row
-        variety_codes = list(COOKIE_POPULARITY.keys())
-        header = ["Scout Name", "Email", "Grade", "Order Date"]
-        header.extend(v.value for v in variety_codes)
-        header.append("Total Cases")
-        writer.writerow(header)
-
-        # Build a map of family_id -> order for quick lookup
-        orders = Event.objects.filter(event_type=EventType.COOKIE_ORDER)
-        orders_by_family = {order.family.pk: order for order in orders}
-
-        # Data rows - one per family, ordered by scout_name
-        for family in Family.objects.order_by("scout_name"):
-            order = orders_by_family.get(family.pk)
-            row = [
-                family.scout_name,
-                family.email,
-                family.grade,
-                order.created_at.strftime("%Y-%m-%d %H:%M") if order else "",
-            ]
-            total = 0
-            for variety in variety_codes:
-                count = order.count_data.get(variety.value, 0) if order else 0
-                row.append(count)
-                total += count
-            row.append(total)
-            writer.writerow(row)
 
+@method_decorator(staff_member_required, name="dispatch")
+class ReportDownloadView(View):
+    def get(self, request: HttpRequest, report_id: int) -> HttpResponse:
+        report = get_object_or_404(
+            Report,
+            pk=report_id,
+            status=ReportStatus.SUCCEEDED,
+            expires_at__gt=timezone.now(),
+        )
+        response = HttpResponse(bytes(report.content), content_type=report.content_type)
+        response["Content-Disposition"] = f'attachment; filename="{report.filename}"'
         return response
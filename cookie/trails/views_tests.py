@@ -0,0 +1,143 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from .models import CountUnit, Event, EventType, Family
+
+
+@pytest.fixture
+def family_client(client):
+    Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    client.post(reverse("family_login"), {"email": "ada@example.com"})
+    return client
+
+
+@pytest.mark.django_db
+def test_count_post_without_htmx_redirects(family_client):
+    response = family_client.post(reverse("count"), {"count_TMint": "3"})
+    event = Event.objects.get(event_type=EventType.COUNT)
+    assert response.status_code == 302
+    assert response["Location"] == reverse(
+        "count_success", kwargs={"event_id": event.pk}
+    )
+
+
+@pytest.mark.django_db
+def test_count_post_with_htmx_returns_fragment(family_client):
+    response = family_client.post(
+        reverse("count"), {"count_TMint": "3"}, HTTP_HX_REQUEST="true"
+    )
+    event = Event.objects.get(event_type=EventType.COUNT)
+    assert response.status_code == 200
+    assert response["HX-Push-Url"] == reverse(
+        "count_success", kwargs={"event_id": event.pk}
+    )
+    content = response.content.decode()
+    assert content.lstrip().startswith('<div id="count-flow"')
+    assert "<html" not in content
+    assert "Inventory Submitted!" in content
+    assert response.context["total"] == 3
+
+
+@pytest.mark.django_db
+def test_initial_order_post_with_htmx_returns_fragment(family_client):
+    response = family_client.post(
+        reverse("initial_order"), {"count_Sam": "2"}, HTTP_HX_REQUEST="true"
+    )
+    event = Event.objects.get(event_type=EventType.COOKIE_ORDER)
+    assert event.unit == CountUnit.CASE
+    assert response["HX-Push-Url"] == (
+        reverse("initial_order_success", kwargs={"event_id": event.pk}) + "?new=1"
+    )
+    content = response.content.decode()
+    assert "<html" not in content
+    assert "Order Submitted!" in content
+
+
+@pytest.mark.django_db
+def test_count_form_renders_a_fresh_idempotency_key(family_client, plain_static):
+    first = family_client.get(reverse("count"))
+    second = family_client.get(reverse("count"))
+
+    key = first.context["idempotency_key"]
+    assert key != second.context["idempotency_key"]
+    assert f'name="idempotency_key" value="{key}"' in first.content.decode()
+    # A page restored from the back/forward cache would resubmit an old key.
+    assert "no-store" in first["Cache-Control"]
+
+
+@pytest.mark.django_db
+def test_count_post_resubmitted_returns_the_original_event(family_client):
+    data = {"count_TMint": "3", "idempotency_key": str(uuid.uuid4())}
+    first = family_client.post(reverse("count"), data)
+    second = family_client.post(reverse("count"), {**data, "count_TMint": "4"})
+
+    event = Event.objects.get(event_type=EventType.COUNT)
+    assert event.count_data["TMint"] == 3
+    assert first["Location"] == second["Location"]
+
+
+@pytest.mark.django_db
+def test_initial_order_resubmitted_over_htmx_returns_the_original_event(
+    family_client,
+):
+    data = {"count_Sam": "2", "idempotency_key": str(uuid.uuid4())}
+    family_client.post(reverse("initial_order"), data, HTTP_HX_REQUEST="true")
+    response = family_client.post(
+        reverse("initial_order"), data, HTTP_HX_REQUEST="true"
+    )
+
+    event = Event.objects.get(event_type=EventType.COOKIE_ORDER)
+    assert response.context["event"] == event
+    assert "Order Submitted!" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_key_reused_across_families_is_refused(family_client, plain_static):
+    other = Family.objects.create(scout_name="Bea", email="bea@example.com", grade=5)
+    key = uuid.uuid4()
+    Event.objects.create(family=other, event_type=EventType.COUNT, idempotency_key=key)
+
+    for url in (reverse("count"), reverse("initial_order")):
+        response = family_client.post(
+            url,
+            {"count_Sam": "2", "idempotency_key": str(key)},
+            HTTP_HX_REQUEST="true",
+        )
+        assert "already used for a different event" in response.content.decode()
+        assert "event" not in response.context
+        assert response.context["idempotency_key"] != key
+    assert Event.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_count_posts_with_one_key_record_one_event():
+    Family.objects.create(scout_name="Ada", email="ada@example.com", grade=4)
+    clients = []
+    for _ in range(8):
+        client = Client()
+        client.post(reverse("family_login"), {"email": "ada@example.com"})
+        clients.append(client)
+
+    data = {"count_TMint": "3", "idempotency_key": str(uuid.uuid4())}
+    barrier = threading.Barrier(len(clients))
+
+    def submit(client: Client) -> str:
+        try:
+            barrier.wait()
+            return client.post(reverse("count"), data)["Location"]
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        locations = list(pool.map(submit, clients))
+
+    event = Event.objects.get()
+    assert locations == [reverse("count_success", kwargs={"event_id": event.pk})] * len(
+        clients
+    )